@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for tennisweb_backend.
+
+Serves wsgi.py with threaded (gthread) workers by default:
+
+    gunicorn -c gunicorn.conf.py
+
+Set TENNISWEB_SERVER=asgi to serve asgi.py through uvicorn workers instead.
+That is slower for now: the async views' ORM calls and DRF's auth/throttle
+step all queue on one sync thread per worker (compare with
+``manage.py bench_concurrency``).
+Other knobs: GUNICORN_BIND, GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_TIMEOUT.
+
+More than one worker needs a presence store they all share (PRESENCE_STORE
+"cache" on a cache that is not per process); otherwise start-up fails.
+"""
+
+import multiprocessing
+import os
+
+server_mode = os.environ.get("TENNISWEB_SERVER", "wsgi").lower()
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+
+if server_mode == "asgi":
+    wsgi_app = "tennisweb_backend.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "tennisweb_backend.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+accesslog = "-"
+
+
+def on_starting(server):
+    if server.cfg.workers > 1:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tennisweb_backend.settings")
+        from tennisweb_backend.api import presence
+
+        if not presence.is_shared():
+            raise RuntimeError(
+                f"{server.cfg.workers} workers would each see only their own presence heartbeats; "
+                "set PRESENCE_STORE = 'cache' with a shared PRESENCE_CACHE_ALIAS cache, or GUNICORN_WORKERS=1"
+            )
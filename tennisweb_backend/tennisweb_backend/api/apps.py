@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tennisweb_backend.api"
+
+    def ready(self):
+        # Register model signal receivers
+        from . import signals  # noqa: F401
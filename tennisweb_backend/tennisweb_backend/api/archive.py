@@ -0,0 +1,152 @@
+"""
+Chat retention: move old messages out of the hot ChatMessage table.
+
+``archive_thread`` packs a thread's messages older than the cutoff into
+ChatArchive rows, each a compressed NDJSON blob of at most
+CHAT_ARCHIVE_BLOB_MESSAGES consecutive messages, and deletes the originals in
+the same transaction. ChatThread.archived_through_id records how far a
+thread has been archived, so readers only look at archives once a cursor
+goes below it. Archived messages are no longer in the full-text index.
+Archives stay in the default database when messages are sharded.
+
+Blobs use zstd when the ``zstandard`` package is installed, else gzip; the
+codec is stored per row so both can be read back.
+"""
+
+from calendar import monthrange
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .models import ChatArchive, ChatMessage, ChatThread
+from .routing import PRIMARY
+from . import sharding
+import gzip
+import json
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+
+def months_ago(now, months):
+    month = now.month - months
+    year = now.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    day = min(now.day, monthrange(year, month)[1])
+    return now.replace(year=year, month=month, day=day)
+
+
+def default_codec():
+    wanted = getattr(settings, "CHAT_ARCHIVE_CODEC", ChatArchive.CODEC_ZSTD)
+    if wanted == ChatArchive.CODEC_ZSTD and zstandard is None:
+        return ChatArchive.CODEC_GZIP
+    return wanted
+
+
+def _compress(raw: bytes, codec: str) -> bytes:
+    if codec == ChatArchive.CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return gzip.compress(raw, compresslevel=6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == ChatArchive.CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def pack(rows) -> bytes:
+    """NDJSON of (id, sender_id, content, created_at) rows."""
+    return b"".join(
+        json.dumps(
+            {"id": mid, "sender_id": sender_id, "content": content, "created_at": created_at.isoformat()},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8") + b"\n"
+        for mid, sender_id, content, created_at in rows
+    )
+
+
+def unpack(archive: ChatArchive):
+    for line in _decompress(bytes(archive.data), archive.codec).splitlines():
+        yield json.loads(line)
+
+
+def archive_thread(thread_id: int, cutoff, blob_messages=None, codec=None) -> int:
+    """Archive messages of one thread created before ``cutoff``; returns how many were moved."""
+    blob_messages = blob_messages or getattr(settings, "CHAT_ARCHIVE_BLOB_MESSAGES", 1000)
+    codec = codec or default_codec()
+    source = sharding.alias_for(ChatThread.objects.using(PRIMARY).get(id=thread_id))
+    moved = 0
+    while True:
+        # Archives live in the default database; it commits first, so a failure in between leaves
+        # messages in both places rather than in neither
+        with transaction.atomic(using=source), transaction.atomic(using=PRIMARY):
+            rows = list(
+                ChatMessage.objects.using(source).filter(thread_id=thread_id, created_at__lt=cutoff)
+                .order_by("id")
+                .values_list("id", "sender_id", "content", "created_at")[:blob_messages]
+            )
+            if not rows:
+                return moved
+            ChatArchive.objects.create(
+                thread_id=thread_id,
+                first_message_id=rows[0][0],
+                last_message_id=rows[-1][0],
+                first_created_at=rows[0][3],
+                last_created_at=rows[-1][3],
+                message_count=len(rows),
+                codec=codec,
+                data=_compress(pack(rows), codec),
+            )
+            ChatMessage.objects.using(source).filter(id__in=[r[0] for r in rows]).delete()
+            ChatThread.objects.filter(id=thread_id, archived_through_id__lt=rows[-1][0]).update(archived_through_id=rows[-1][0])
+        moved += len(rows)
+        if len(rows) < blob_messages:
+            return moved
+
+
+def threads_with_messages_before(cutoff):
+    for alias in dict.fromkeys([PRIMARY, *sharding.shards()]):
+        yield from ChatMessage.objects.using(alias).filter(created_at__lt=cutoff).order_by().values_list("thread_id", flat=True).distinct()
+
+
+def archived_messages(thread: ChatThread, before_id: int, limit: int):
+    """Up to ``limit`` archived messages with id < before_id, newest first, as unsaved ChatMessage
+    instances with their senders (and profiles) attached for ChatMessageSerializer."""
+    if thread.archived_through_id == 0 or limit <= 0:
+        return []
+    rows = []
+    archives = ChatArchive.objects.filter(thread=thread, first_message_id__lt=before_id).order_by("-last_message_id")
+    for archive in archives.iterator(chunk_size=4):
+        rows.extend(reversed([r for r in unpack(archive) if r["id"] < before_id]))
+        if len(rows) >= limit:
+            break
+    rows = rows[:limit]
+    senders = User.objects.select_related("profile").in_bulk({r["sender_id"] for r in rows})
+    out = []
+    for r in rows:
+        sender = senders.get(r["sender_id"])
+        if sender is None:
+            # Deleting a user cascades to their hot messages; hide their archived ones too
+            continue
+        msg = ChatMessage(id=r["id"], thread=thread, sender=sender, content=r["content"])
+        msg.created_at = datetime.fromisoformat(r["created_at"]).astimezone(dt_timezone.utc)
+        out.append(msg)
+    return out
+
+
+def archived_rows(thread_ids):
+    """(id, thread_id, sender_id, content, created_at) for every archived message, one blob in memory at a time."""
+    archives = ChatArchive.objects.filter(thread_id__in=thread_ids).order_by("thread_id", "first_message_id")
+    for archive in archives.iterator(chunk_size=4):
+        for r in unpack(archive):
+            yield r["id"], archive.thread_id, r["sender_id"], r["content"], r["created_at"]
+
+
+def default_cutoff():
+    months = getattr(settings, "CHAT_RETENTION_MONTHS", None)
+    return months_ago(timezone.now(), months) if months else None
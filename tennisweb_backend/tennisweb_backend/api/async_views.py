@@ -0,0 +1,50 @@
+from asgiref.sync import sync_to_async
+from inspect import isawaitable
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """APIView whose HTTP handlers are coroutines.
+
+    Django serves a view natively on the event loop when every handler is
+    ``async def``; subclasses should therefore define only async handlers.
+    DRF's authentication, permission and throttle hooks are synchronous, so
+    ``initial()`` runs through ``sync_to_async`` once per request and the
+    handler body is free to use the async ORM (``aget``, ``async for`` ...).
+
+    This buys no concurrency yet: ``initial()`` and every async ORM call go
+    through ``sync_to_async(thread_sensitive=True)``, so a worker's requests
+    queue on one thread for their database work. Under ASGI these views are
+    slower than the same code under threaded WSGI workers (the default in
+    gunicorn.conf.py; see ``manage.py bench_concurrency``).
+
+    Serializers resolve related objects lazily, which is not allowed on the
+    event loop: handlers must ``select_related`` everything a serializer
+    touches, or serialize through ``sync_to_async``.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # OPTIONS is DRF's built-in sync handler
+            if isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
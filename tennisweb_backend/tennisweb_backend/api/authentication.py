@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from . import routing
+from .models import Profile
+import threading
+import time
+
+TOKEN_VERSION_CLAIM = "ver"
+
+# Concrete User columns kept in the cache; request.user is rebuilt from these on every hit
+_USER_FIELDS = [f.attname for f in User._meta.concrete_fields]
+
+
+class UserRecordCache:
+    """Short-TTL, in-process cache of user rows keyed by user id.
+
+    Keys are normalized to strings because simplejwt stores the id claim as a
+    string while signal handlers see integer primary keys.
+
+    Stores plain column values rather than model instances so that per-request
+    state (cached relations such as ``user.profile``) never leaks between
+    requests. Entries are evicted through the invalidation bus whenever any
+    worker saves the user or profile; the TTL bounds staleness if the bus is down.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._data.get(str(user_id))
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at < time.monotonic():
+            self.invalidate(user_id)
+            return None
+        return record
+
+    def set(self, user_id, record):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._data = {k: v for k, v in self._data.items() if v[0] >= now}
+                if len(self._data) >= self.max_entries:
+                    self._data.clear()
+            self._data[str(user_id)] = (now + self.ttl, record)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_record_cache = UserRecordCache(ttl=getattr(settings, "AUTH_USER_CACHE_TTL", 10))
+
+
+def load_user_record(user_id, using=None):
+    """Fetch the columns needed to authenticate ``user_id`` in a single query."""
+    row = (
+        User.objects.db_manager(using).filter(pk=user_id)
+        .values_list(*_USER_FIELDS, "profile__token_version")
+        .first()
+    )
+    if row is None:
+        return None
+    return {"values": row[:-1], "token_version": row[-1] or 0}
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves ``request.user`` from ``user_record_cache``.
+
+    A cache hit authenticates with zero queries. Tokens carry the issuing
+    profile's ``token_version``; bumping that counter (see ``revoke_tokens``)
+    rejects every older token, and deactivated users are refused once their
+    cached record expires (``AUTH_USER_CACHE_TTL`` seconds at most).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        routing.set_user(user_id)
+        record = user_record_cache.get(user_id)
+        if record is None:
+            record = load_user_record(user_id)
+            if record is None and routing.reading_replica():
+                # Accounts created moments ago may not have reached the replica yet
+                record = load_user_record(user_id, using=routing.PRIMARY)
+            if record is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_record_cache.set(user_id, record)
+
+        user = User.from_db("default", _USER_FIELDS, record["values"])
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # Tokens issued before versioning existed carry no claim and count as version 0
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != record["token_version"]:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        return user
+
+
+def revoke_tokens(user: User) -> int:
+    """Invalidate all outstanding tokens of ``user`` and return the new version."""
+    profile, _created = Profile.objects.get_or_create(user=user)
+    Profile.objects.filter(pk=profile.pk).update(token_version=F("token_version") + 1)
+    user_record_cache.invalidate(user.pk)
+    profile.refresh_from_db(fields=["token_version"])
+    return profile.token_version
+
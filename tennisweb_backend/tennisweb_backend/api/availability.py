@@ -0,0 +1,112 @@
+"""
+Weekly availability as a slot bitmap.
+
+The week is cut into 30-minute slots (7 x 48 = 336); bit ``weekday * 48 +
+slot`` is set when the player is usually free then. A user's mask is the
+union of their declared AvailabilityWindow rows and the slots they have
+repeatedly played in according to CheckIn start/end times. Masks are stored
+on Profile.availability_mask so candidate scans get them with the profile
+row, and overlap between two players is one AND plus a popcount on a 6-word
+Python int.
+"""
+
+from datetime import time, timedelta
+from django.conf import settings
+from django.utils import timezone
+from .invalidation import bus
+from .models import AvailabilityWindow, CheckIn, Profile
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+MASK_BYTES = WEEK_SLOTS // 8
+
+
+def _slot(t: time, round_up=False) -> int:
+    minutes = t.hour * 60 + t.minute
+    return -(-minutes // SLOT_MINUTES) if round_up else minutes // SLOT_MINUTES
+
+
+def window_mask(weekday: int, start: time, end: time) -> int:
+    """Bits for the slots of ``weekday`` that [start, end) touches."""
+    first, last = _slot(start), _slot(end, round_up=True)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << (weekday * SLOTS_PER_DAY + first)
+
+
+def overlap_slots(a: int, b: int) -> int:
+    return (a & b).bit_count()
+
+
+def mask_to_bytes(mask: int) -> bytes:
+    return mask.to_bytes(MASK_BYTES, "big") if mask else b""
+
+
+def mask_to_windows(mask: int):
+    """Merge set bits back into [{weekday, start_time, end_time}] runs."""
+    out = []
+    for weekday in range(7):
+        day = (mask >> (weekday * SLOTS_PER_DAY)) & ((1 << SLOTS_PER_DAY) - 1)
+        slot = 0
+        while day:
+            if day & 1:
+                start = slot
+                while day & 1:
+                    day >>= 1
+                    slot += 1
+                out.append({
+                    "weekday": weekday,
+                    "start_time": _format_slot(start),
+                    "end_time": _format_slot(slot),
+                })
+            else:
+                day >>= 1
+                slot += 1
+    return out
+
+
+def _format_slot(slot: int) -> str:
+    minutes = slot * SLOT_MINUTES
+    return "24:00" if minutes == 24 * 60 else f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def history_mask(user_id: int) -> int:
+    """Slots the user has played in at least AVAILABILITY_HISTORY_MIN_COUNT times recently."""
+    since = timezone.now().date() - timedelta(days=getattr(settings, "AVAILABILITY_HISTORY_DAYS", 90))
+    min_count = getattr(settings, "AVAILABILITY_HISTORY_MIN_COUNT", 2)
+    rows = CheckIn.objects.filter(
+        user_id=user_id, date__gte=since, start_time__isnull=False, end_time__isnull=False
+    ).values_list("date", "start_time", "end_time")
+    counts = [0] * WEEK_SLOTS
+    for day, start, end in rows:
+        first = day.weekday() * SLOTS_PER_DAY
+        for slot in range(_slot(start), _slot(end, round_up=True)):
+            counts[first + slot] += 1
+    mask = 0
+    for i, n in enumerate(counts):
+        if n >= min_count:
+            mask |= 1 << i
+    return mask
+
+
+def declared_mask(user_id: int) -> int:
+    mask = 0
+    for weekday, start, end in AvailabilityWindow.objects.filter(user_id=user_id).values_list("weekday", "start_time", "end_time"):
+        mask |= window_mask(weekday, start, end)
+    return mask
+
+
+def refresh_user_mask(user_id: int) -> int:
+    mask = declared_mask(user_id) | history_mask(user_id)
+    stored = mask_to_bytes(mask)
+    # update() skips auto_now and post_save: bump updated_at by hand, since profile ETags and
+    # cached match prompts are keyed on it, and only when the mask actually changed
+    changed = (
+        Profile.objects.filter(user_id=user_id)
+        .exclude(availability_mask=stored)
+        .update(availability_mask=stored, updated_at=timezone.now())
+    )
+    if changed:
+        bus.publish("user", user_id)
+    return mask
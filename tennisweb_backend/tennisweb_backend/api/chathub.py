@@ -0,0 +1,53 @@
+from collections import defaultdict
+import asyncio
+import threading
+
+
+class ChatHub:
+    """Wakes long-polling readers of a thread when a message is posted.
+
+    Each waiting request registers one future under its thread id; ``publish``
+    resolves and drops the futures of that thread, so fan-out costs one wakeup
+    per connected reader and nothing is stored per member. Readers then load
+    the new rows themselves. State is per process: readers connected to other
+    workers notice new messages at the end of their poll timeout.
+    """
+
+    def __init__(self):
+        self._waiters = defaultdict(set)
+        self._lock = threading.Lock()
+
+    async def wait(self, thread_id, timeout):
+        """Wait up to ``timeout`` seconds for a message in ``thread_id``; returns its id or None."""
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._waiters[thread_id].add(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(thread_id)
+                if waiters is not None:
+                    waiters.discard(future)
+                    if not waiters:
+                        del self._waiters[thread_id]
+
+    def publish(self, thread_id, message_id):
+        """Safe to call from any thread, sync or async code."""
+        with self._lock:
+            waiters = self._waiters.pop(thread_id, ())
+        for future in waiters:
+            future.get_loop().call_soon_threadsafe(_resolve, future, message_id)
+
+    def waiting(self, thread_id) -> int:
+        return len(self._waiters.get(thread_id, ()))
+
+
+def _resolve(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+chat_hub = ChatHub()
@@ -0,0 +1,36 @@
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+import hashlib
+
+
+class Validators:
+    """ETag / Last-Modified pair for one representation of a resource.
+
+    Views build these from cheap version data (``updated_at`` maxima, row
+    counts, ids) fetched in one aggregate query, before touching the
+    serializer. ``not_modified`` short-circuits matching requests with a 304;
+    ``apply`` stamps the same validators onto the full response.
+    """
+
+    def __init__(self, *parts, last_modified=None):
+        digest = hashlib.blake2b("|".join(str(p) for p in parts).encode(), digest_size=12).hexdigest()
+        # Weak: compressed and uncompressed bodies share the validator
+        self.etag = f'W/"{digest}"'
+        self.last_modified = int(last_modified.timestamp()) if last_modified else None
+
+    def not_modified(self, request):
+        response = get_conditional_response(
+            getattr(request, "_request", request), etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response.headers["ETag"] = self.etag
+        if self.last_modified is not None:
+            response.headers["Last-Modified"] = http_date(self.last_modified)
+        # Per-user data: shared caches must not reuse it, browsers must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Authorization"])
+        return response
@@ -0,0 +1,172 @@
+"""
+Streaming export of everything stored about a user.
+
+``ndjson_chunks`` and ``csv_zip_chunks`` are generators for
+StreamingHttpResponse: each section is read with ``.iterator(chunk_size=...)``
+and encoded as it arrives, so memory stays flat however many chat messages a
+user has and the first bytes go out before the large sections are read.
+Archived chat messages are included, one archive blob in memory at a time,
+and messages on chat shards are read from each shard in turn.
+"""
+
+from datetime import date, datetime, time
+from itertools import chain
+from django.db.models import Q
+from rest_framework.utils import encoders
+from zipfile import ZipFile, ZIP_DEFLATED
+from .archive import archived_rows
+from . import sharding
+from .models import (
+    Profile, CheckIn, AvailabilityWindow, FriendRequest, Friendship, SessionParticipant, MatchResult, ChatThread, ChatMessage,
+)
+import csv
+import io
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+CHUNK_SIZE = 2000
+_encoder = encoders.JSONEncoder()
+
+_PROFILE_FIELDS = [
+    "user__username", "user__email", "user__first_name", "user__last_name", "user__date_joined",
+    "display_name", "bio", "skill_level", "location", "gender", "age", "years_playing",
+    "dominant_hand", "backhand_type", "preferred_court_types", "preferred_match_types",
+    "play_intentions", "preferred_languages", "avatar", "rating", "rating_deviation", "rated_matches",
+]
+
+
+def sections(user):
+    """(name, columns, row iterator) for every exported table, smallest first."""
+    by_alias = sharding.threads_by_alias(ChatThread.objects.filter(members__user=user))
+    thread_ids = [tid for ids in by_alias.values() for tid in ids]
+    return [
+        ("profile", [f.replace("user__", "") for f in _PROFILE_FIELDS], _rows(
+            Profile.objects.filter(user=user).values_list(*_PROFILE_FIELDS)
+        )),
+        ("checkins", ["date", "start_time", "end_time", "duration_minutes", "created_at"], _rows(
+            CheckIn.objects.filter(user=user).order_by("date")
+            .values_list("date", "start_time", "end_time", "duration_minutes", "created_at")
+        )),
+        ("availability", ["weekday", "start_time", "end_time"], _rows(
+            AvailabilityWindow.objects.filter(user=user).order_by("weekday", "start_time")
+            .values_list("weekday", "start_time", "end_time")
+        )),
+        ("friends", ["friend_id", "friend_username", "created_at"], _friend_rows(user)),
+        ("friend_requests", ["from_user_id", "to_user_id", "status", "created_at", "responded_at"], _rows(
+            FriendRequest.objects.filter(Q(from_user=user) | Q(to_user=user)).order_by("created_at")
+            .values_list("from_user_id", "to_user_id", "status", "created_at", "responded_at")
+        )),
+        ("sessions", ["session_id", "court", "start_at", "end_at", "session_status", "my_status"], _rows(
+            SessionParticipant.objects.filter(user=user).order_by("start_at")
+            .values_list("session_id", "session__court__name", "start_at", "end_at", "session__status", "status")
+        )),
+        ("match_results", ["winner_id", "loser_id", "played_at", "score", "status"], _rows(
+            MatchResult.objects.filter(Q(winner=user) | Q(loser=user)).order_by("played_at")
+            .values_list("winner_id", "loser_id", "played_at", "score", "status")
+        )),
+        ("chat_threads", ["thread_id", "kind", "title", "other_user_id", "other_username", "created_at"], _thread_rows(user)),
+        ("chat_messages", ["message_id", "thread_id", "sender_id", "content", "created_at"], chain(
+            archived_rows(thread_ids),
+            *(_rows(
+                ChatMessage.objects.using(alias).filter(thread_id__in=ids).order_by("thread_id", "id")
+                .values_list("id", "thread_id", "sender_id", "content", "created_at")
+            ) for alias, ids in by_alias.items()),
+        )),
+    ]
+
+
+def _rows(qs):
+    return qs.iterator(chunk_size=CHUNK_SIZE)
+
+
+def _friend_rows(user):
+    qs = Friendship.objects.filter(Q(user1=user) | Q(user2=user)).order_by("created_at").values_list(
+        "user1_id", "user1__username", "user2_id", "user2__username", "created_at"
+    )
+    for u1, name1, u2, name2, created_at in _rows(qs):
+        yield (u2, name2, created_at) if u1 == user.id else (u1, name1, created_at)
+
+
+def _thread_rows(user):
+    qs = ChatThread.objects.filter(members__user=user).order_by("id").values_list(
+        "id", "kind", "title", "user1_id", "user1__username", "user2_id", "user2__username", "created_at"
+    )
+    for tid, kind, title, u1, name1, u2, name2, created_at in _rows(qs):
+        other = (u2, name2) if u1 == user.id else (u1, name1)
+        yield (tid, kind, title, *other, created_at)
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_encoder.default)
+    return json.dumps(obj, default=_encoder.default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def ndjson_chunks(user, flush_bytes=64 * 1024):
+    """One {"type": section, ...columns} object per line."""
+    buf = []
+    size = 0
+    for name, columns, rows in sections(user):
+        for row in rows:
+            line = _dumps({"type": name, **dict(zip(columns, row))}) + b"\n"
+            buf.append(line)
+            size += len(line)
+            if size >= flush_bytes:
+                yield b"".join(buf)
+                buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class _Pipe(io.RawIOBase):
+    """Write-only, unseekable sink; ZipFile then streams entries with data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def csv_zip_chunks(user, flush_rows=1000):
+    """A zip archive with one <section>.csv per section, emitted as it is compressed."""
+    pipe = _Pipe()
+    with ZipFile(pipe, "w", compression=ZIP_DEFLATED) as archive:
+        for name, columns, rows in sections(user):
+            with archive.open(f"{name}.csv", "w", force_zip64=True) as entry:
+                text = io.StringIO()
+                writer = csv.writer(text)
+                writer.writerow(columns)
+                for i, row in enumerate(rows, 1):
+                    writer.writerow([_csv_value(v) for v in row])
+                    if i % flush_rows == 0:
+                        entry.write(text.getvalue().encode("utf-8"))
+                        text.seek(0)
+                        text.truncate()
+                        chunk = pipe.drain()
+                        if chunk:
+                            yield chunk
+                entry.write(text.getvalue().encode("utf-8"))
+            yield pipe.drain()
+    yield pipe.drain()
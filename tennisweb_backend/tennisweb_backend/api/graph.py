@@ -0,0 +1,103 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from django.db.models import Q
+from .models import Friendship
+import threading
+
+
+class FriendGraph:
+    """In-process adjacency cache of the friend graph.
+
+    Each user's friends (from the undirected ``Friendship`` table) are kept as
+    a sorted ``array('q')`` of user ids, loaded lazily in bulk and kept
+    current by the ``Friendship`` save/delete signals, and dropped for reload
+    when another worker publishes a "friends" change (see invalidation.py).
+    Second-degree counts then become a walk over cached arrays instead of
+    self-joins on the edge table.
+    """
+
+    def __init__(self):
+        self._adj = {}
+        self._lock = threading.Lock()
+
+    def _load(self, user_ids):
+        missing = [uid for uid in user_ids if uid not in self._adj]
+        if not missing:
+            return
+        found = {uid: set() for uid in missing}
+        edges = Friendship.objects.filter(Q(user1_id__in=missing) | Q(user2_id__in=missing)).values_list("user1_id", "user2_id")
+        for a, b in edges:
+            if a in found:
+                found[a].add(b)
+            if b in found:
+                found[b].add(a)
+        with self._lock:
+            for uid, ids in found.items():
+                self._adj.setdefault(uid, array("q", sorted(ids)))
+
+    def neighbors(self, user_id):
+        self._load([user_id])
+        return self._adj[user_id]
+
+    def neighbors_many(self, user_ids):
+        self._load(list(user_ids))
+        return {uid: self._adj[uid] for uid in user_ids}
+
+    def friends_among(self, user_id, candidate_ids):
+        """The ids in ``candidate_ids`` that are friends of ``user_id``, in their order."""
+        ids = self.neighbors(user_id)
+        out = []
+        for uid in candidate_ids:
+            i = bisect_left(ids, uid)
+            if i < len(ids) and ids[i] == uid:
+                out.append(uid)
+        return out
+
+    def mutual_count(self, a, b):
+        na, nb = self.neighbors_many([a, b]).values()
+        small, large = (na, nb) if len(na) <= len(nb) else (nb, na)
+        return len(set(small).intersection(large))
+
+    def second_degree(self, user_id):
+        """Counter of {candidate_id: mutual neighbour count}, excluding direct neighbours."""
+        direct = self.neighbors(user_id)
+        counts = Counter()
+        for neighbours in self.neighbors_many(direct).values():
+            counts.update(neighbours)
+        counts.pop(user_id, None)
+        for uid in direct:
+            counts.pop(uid, None)
+        return counts
+
+    def add_edge(self, a, b):
+        with self._lock:
+            for x, y in ((a, b), (b, a)):
+                ids = self._adj.get(x)
+                if ids is None:
+                    continue
+                i = bisect_left(ids, y)
+                if i == len(ids) or ids[i] != y:
+                    ids.insert(i, y)
+
+    def remove_edge(self, a, b):
+        with self._lock:
+            for x, y in ((a, b), (b, a)):
+                ids = self._adj.get(x)
+                if ids is None:
+                    continue
+                i = bisect_left(ids, y)
+                if i < len(ids) and ids[i] == y:
+                    del ids[i]
+
+    def forget(self, user_id):
+        """Drop one user's cached neighbours; they are reloaded on next use."""
+        with self._lock:
+            self._adj.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._adj.clear()
+
+
+friend_graph = FriendGraph()
@@ -0,0 +1,216 @@
+"""
+Cross-process cache invalidation.
+
+Model signals ``publish(topic, key)`` change events (e.g. ``("user", 42)``).
+The publishing process applies them at once; every other worker picks them
+up when it next tails the shared log, at most every
+INVALIDATION_POLL_INTERVAL seconds (``InvalidationMiddleware`` polls at the
+start of each request). Applying an event runs the callbacks subscribed to
+its topic, which evict local cache entries, and advances the key's version:
+``versioned_key(topic, key)`` embeds it, so entries written under an older
+version are simply never read again, including in shared caches. Versions
+are kept for the INVALIDATION_MAX_VERSIONS most recently changed keys; the
+others report the highest version dropped so far, which never goes back.
+
+Log backends, selected by ``INVALIDATION_BACKEND``:
+- "database": ``api.ChangeEvent`` rows, written in the publisher's transaction
+- "redis": a Redis stream at INVALIDATION_REDIS_URL (needs the ``redis`` package)
+- "local": an in-memory log shared by buses in one process (tests)
+"""
+
+from collections import OrderedDict, defaultdict, deque
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.utils import timezone
+from .models import ChangeEvent
+from .routing import PRIMARY
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLog:
+    def __init__(self):
+        self._events = []
+        self._lock = threading.Lock()
+
+    def append(self, topic, key):
+        with self._lock:
+            self._events.append((topic, key))
+            return len(self._events)
+
+    def head(self):
+        return len(self._events)
+
+    def since(self, cursor):
+        events = self._events[cursor:]
+        return [(cursor + i + 1, topic, key) for i, (topic, key) in enumerate(events)], cursor + len(events)
+
+
+class DatabaseLog:
+    """ChangeEvent rows, always read from the primary (replicas may lag behind
+    the very changes being announced). Ids from concurrent transactions can
+    commit out of order, so each poll also re-reads events from the last
+    ``lag`` seconds and skips ids it has already applied."""
+
+    def __init__(self, lag=2.0, retention=3600):
+        self.lag = lag
+        self.retention = retention
+        self._applied = deque(maxlen=4096)
+        self._applied_set = set()
+        self._pruned_at = 0.0
+
+    def append(self, topic, key):
+        return ChangeEvent.objects.create(topic=topic, key=key).id
+
+    def head(self):
+        return (ChangeEvent.objects.using(PRIMARY).order_by("-id").values_list("id", flat=True).first() or 0, timezone.now())
+
+    def since(self, cursor):
+        last_id, polled_at = cursor
+        now = timezone.now()
+        rows = ChangeEvent.objects.using(PRIMARY).filter(
+            Q(id__gt=last_id) | Q(created_at__gte=polled_at - timedelta(seconds=self.lag))
+        ).order_by("id").values_list("id", "topic", "key")
+        events = []
+        for eid, topic, key in rows:
+            if eid in self._applied_set:
+                continue
+            if len(self._applied) == self._applied.maxlen:
+                self._applied_set.discard(self._applied[0])
+            self._applied.append(eid)
+            self._applied_set.add(eid)
+            events.append((eid, topic, key))
+            last_id = max(last_id, eid)
+        self._prune()
+        return events, (last_id, now)
+
+    def _prune(self):
+        if time.monotonic() - self._pruned_at < 60:
+            return
+        self._pruned_at = time.monotonic()
+        ChangeEvent.objects.using(PRIMARY).filter(created_at__lt=timezone.now() - timedelta(seconds=self.retention)).delete()
+
+
+class RedisLog:
+    """A capped Redis stream; stream ids are ordered, so no re-reads are needed."""
+
+    def __init__(self, url, stream="tennisweb:invalidation", maxlen=100000):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("INVALIDATION_BACKEND = 'redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.maxlen = maxlen
+
+    @staticmethod
+    def _version(stream_id):
+        ms, seq = (stream_id.decode() if isinstance(stream_id, bytes) else stream_id).split("-")
+        return int(ms) * 1000 + int(seq)
+
+    def append(self, topic, key):
+        return self._version(self.client.xadd(self.stream, {"t": topic, "k": key}, maxlen=self.maxlen, approximate=True))
+
+    def head(self):
+        last = self.client.xrevrange(self.stream, count=1)
+        return last[0][0] if last else "0-0"
+
+    def since(self, cursor):
+        events = []
+        for _, entries in self.client.xread({self.stream: cursor}, count=1000) or ():
+            for stream_id, fields in entries:
+                events.append((self._version(stream_id), fields[b"t"].decode(), fields[b"k"].decode()))
+                cursor = stream_id
+        return events, cursor
+
+
+class InvalidationBus:
+    def __init__(self, log, poll_interval=1.0, max_versions=50000):
+        self.log = log
+        self.poll_interval = poll_interval
+        self.max_versions = max_versions
+        self._versions = OrderedDict()
+        self._version_floor = 0
+        self._versions_lock = threading.Lock()
+        self._subscribers = defaultdict(list)
+        self._cursor = None
+        self._polled_at = 0.0
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, callback):
+        """Call ``callback(key)`` (key as a string) for every change event on ``topic``."""
+        self._subscribers[topic].append(callback)
+
+    def publish(self, topic, key):
+        key = str(key)
+        try:
+            version = self.log.append(topic, key)
+        except Exception:
+            # Still evict locally; other workers fall back to their cache TTLs
+            logger.exception("Could not publish invalidation %s:%s", topic, key)
+            version = None
+        self._apply(version, topic, key)
+
+    def version(self, topic, key) -> int:
+        self.poll()
+        return self._versions.get((topic, str(key)), self._version_floor)
+
+    def versioned_key(self, topic, key) -> str:
+        return f"{topic}:{key}:v{self.version(topic, key)}"
+
+    def poll(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._polled_at < self.poll_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # another thread of this worker is already tailing
+        try:
+            self._polled_at = now
+            if self._cursor is None:
+                # Nothing is cached yet, so history before start-up is irrelevant
+                self._cursor = self.log.head()
+                return
+            events, self._cursor = self.log.since(self._cursor)
+        except Exception:
+            logger.exception("Could not read invalidation log")
+            return
+        finally:
+            self._lock.release()
+        for version, topic, key in events:
+            self._apply(version, topic, key)
+
+    def _apply(self, version, topic, key):
+        # Log ids make versions agree across workers; replaying an event leaves its version alone
+        with self._versions_lock:
+            current = self._versions.get((topic, key), self._version_floor)
+            self._versions[(topic, key)] = max(current, version) if version is not None else current + 1
+            self._versions.move_to_end((topic, key))
+            while len(self._versions) > self.max_versions:
+                _, dropped = self._versions.popitem(last=False)
+                self._version_floor = max(self._version_floor, dropped)
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback(key)
+            except Exception:
+                logger.exception("Invalidation subscriber failed for %s:%s", topic, key)
+
+
+def _make_log():
+    kind = getattr(settings, "INVALIDATION_BACKEND", "database")
+    if kind == "local":
+        return LocalLog()
+    if kind == "redis":
+        return RedisLog(getattr(settings, "INVALIDATION_REDIS_URL", "redis://localhost:6379/0"))
+    return DatabaseLog(retention=getattr(settings, "INVALIDATION_LOG_RETENTION", 3600))
+
+
+bus = InvalidationBus(
+    _make_log(),
+    poll_interval=getattr(settings, "INVALIDATION_POLL_INTERVAL", 1.0),
+    max_versions=getattr(settings, "INVALIDATION_MAX_VERSIONS", 50000),
+)
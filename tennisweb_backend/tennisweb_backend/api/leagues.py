@@ -0,0 +1,345 @@
+"""
+League fixtures, scheduling and standings.
+
+``round_robin`` is the circle method: the first player stays put while the
+others rotate, so every pair meets exactly once in n - 1 rounds (n rounds,
+each with one bye, when n is odd). ``swiss_pairs`` pairs a single Swiss
+round from the current table with ``pairing.max_weight_matching`` over a
+sparse graph: each player is only linked to the next LEAGUE_SWISS_WINDOW
+players below them, weighted by how close they stand, and rematches are
+only possible between neighbours at weight 0. A perfect pairing therefore
+always exists, and a 500-player ladder pairs in well under a second.
+
+``schedule`` puts each fixture on the earliest start in its round where both
+players are usually free (Profile.availability_mask) for
+LEAGUE_MATCH_MINUTES, with LEAGUE_MIN_REST_HOURS clear of their accepted
+sessions and other scheduled fixtures, so nobody is booked back to back.
+Fixtures without such a slot keep starts_at empty for the players to agree.
+
+Only members who accepted their invitation are paired and ranked. A
+reported result (``record_result``) waits on the fixture for the opponent;
+``confirm_result`` then rates it, bumps the two standings rows with F()
+updates instead of recounting the fixtures (a Swiss bye does the same), and
+books both players' check-ins.
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .availability import SLOT_MINUTES, SLOTS_PER_DAY
+from .models import CheckIn, Fixture, League, LeagueMember, MatchResult, Profile, Session, SessionParticipant
+from .tasks import refresh_availability_mask, refresh_checkin_rollup
+from . import pairing, rating
+
+_DAY_BITS = (1 << SLOTS_PER_DAY) - 1
+# Longest interval in a busy list: anything within reach of a start begins after start - rest - this
+_MAX_BOOKING = Session.MAX_LENGTH.total_seconds()
+
+
+def match_length() -> timedelta:
+    return timedelta(minutes=getattr(settings, "LEAGUE_MATCH_MINUTES", 90))
+
+
+def round_dates(league, number):
+    """(first day, due day) of round ``number`` (1-based)."""
+    first = league.starts_on + timedelta(days=(number - 1) * league.round_days)
+    return first, first + timedelta(days=league.round_days - 1)
+
+
+def round_robin(player_ids) -> list:
+    """Every round of a single round robin as lists of (a, b); b is None for the bye."""
+    players = list(player_ids)
+    if len(players) % 2:
+        players.append(None)
+    n = len(players)
+    rounds = []
+    for r in range(n - 1):
+        pairs = []
+        for k in range(n // 2):
+            a, b = players[k], players[n - 1 - k]
+            # Swap sides every other round so the fixed player is not always player1
+            if a is None or (b is not None and (r + k) % 2):
+                a, b = b, a
+            pairs.append((a, b))
+        rounds.append(pairs)
+        players.insert(1, players.pop())
+    return rounds
+
+
+def swiss_pairs(ranked, met, had_bye=(), window=24):
+    """(pairs, bye) for one Swiss round.
+
+    ``ranked`` is user ids best first; ``met`` holds frozenset({a, b}) for
+    pairs that already have a fixture. The bye goes to the lowest-ranked
+    player who has not had one.
+    """
+    players = list(ranked)
+    bye = None
+    if len(players) % 2:
+        bye = next((uid for uid in reversed(players) if uid not in had_bye), players[-1])
+        players.remove(bye)
+    n = len(players)
+    top = (window + 1) ** 2
+    edges = []
+    for i in range(n):
+        a = players[i]
+        for j in range(i + 1, min(n, i + 1 + window)):
+            if frozenset((a, players[j])) not in met:
+                edges.append((i, j, top - (j - i) ** 2))
+            elif j == i + 1:
+                # Keeps (0, 1), (2, 3), ... available, so a perfect pairing exists
+                edges.append((i, j, 0))
+    mate = pairing.max_weight_matching(n, edges, perfect=True)
+    return [(players[i], players[j]) for i, j in enumerate(mate) if i < j], bye
+
+
+def _clear(booked, start, end, rest):
+    """Whether [start, end) keeps ``rest`` away from every (start, end) in the sorted ``booked`` (timestamps)."""
+    i = bisect_left(booked, (start - rest - _MAX_BOOKING,))
+    until = end + rest
+    while i < len(booked) and booked[i][0] < until:
+        if booked[i][1] > start - rest:
+            return False
+        i += 1
+    return True
+
+
+def _first_start(shared, days, slots, length, rest, booked_a, booked_b, not_before):
+    for day in days:
+        free = (shared >> (day.weekday() * SLOTS_PER_DAY)) & _DAY_BITS
+        # Bits where a run of ``slots`` free slots begins
+        runs = free
+        for k in range(1, slots):
+            runs &= free >> k
+        while runs:
+            low = runs & -runs
+            runs ^= low
+            minutes = (low.bit_length() - 1) * SLOT_MINUTES
+            start = timezone.make_aware(datetime.combine(day, time(minutes // 60, minutes % 60)))
+            ts = start.timestamp()
+            if ts < not_before:
+                continue
+            if _clear(booked_a, ts, ts + length, rest) and _clear(booked_b, ts, ts + length, rest):
+                return start
+    return None
+
+
+def schedule(pairs, first_day, last_day, masks, busy, not_before):
+    """Suggested start (or None) for each pair, in order.
+
+    ``masks`` maps user ids to weekly availability bits, ``busy`` to sorted
+    (start, end) timestamp lists; each booked fixture is added to ``busy``,
+    so rounds scheduled one after another respect the rest time between them.
+    """
+    length = match_length()
+    slots = -(-length // timedelta(minutes=SLOT_MINUTES))
+    length = length.total_seconds()
+    rest = getattr(settings, "LEAGUE_MIN_REST_HOURS", 20) * 3600
+    not_before = not_before.timestamp()
+    days = [first_day + timedelta(days=d) for d in range((last_day - first_day).days + 1)]
+    starts = []
+    for a, b in pairs:
+        start = None
+        shared = masks.get(a, 0) & masks.get(b, 0) if b is not None else 0
+        if shared and days:
+            start = _first_start(shared, days, slots, length, rest, busy.get(a, []), busy.get(b, []), not_before)
+        if start is not None:
+            ts = start.timestamp()
+            for uid in (a, b):
+                insort(busy.setdefault(uid, []), (ts, ts + length))
+        starts.append(start)
+    return starts
+
+
+def _masks(user_ids) -> dict:
+    rows = Profile.objects.filter(user_id__in=user_ids).values_list("user_id", "availability_mask")
+    return {uid: int.from_bytes(mask or b"", "big") for uid, mask in rows}
+
+
+def _busy(user_ids, start, end) -> dict:
+    """Accepted sessions and scheduled fixtures (any league) of ``user_ids`` overlapping [start, end), as timestamps."""
+    wanted = set(user_ids)
+    length = match_length()
+    busy = {}
+    seats = SessionParticipant.objects.filter(
+        user_id__in=user_ids,
+        active=True,
+        status=SessionParticipant.STATUS_ACCEPTED,
+        start_at__gt=start - Session.MAX_LENGTH,
+        start_at__lt=end,
+        end_at__gt=start,
+    ).values_list("user_id", "start_at", "end_at")
+    for uid, s, e in seats:
+        busy.setdefault(uid, []).append((s.timestamp(), e.timestamp()))
+    fixtures = Fixture.objects.filter(
+        Q(player1_id__in=user_ids) | Q(player2_id__in=user_ids),
+        status=Fixture.STATUS_SCHEDULED,
+        starts_at__gt=start - length,
+        starts_at__lt=end,
+    ).values_list("player1_id", "player2_id", "starts_at")
+    for p1, p2, s in fixtures:
+        for uid in (p1, p2):
+            if uid in wanted:
+                busy.setdefault(uid, []).append((s.timestamp(), (s + length).timestamp()))
+    for booked in busy.values():
+        booked.sort()
+    return busy
+
+
+def players(league):
+    """The members taking part: those who accepted."""
+    return LeagueMember.objects.filter(league=league, status=LeagueMember.STATUS_ACCEPTED)
+
+
+def ranked_members(league):
+    """Players in table order: points, wins, fewest losses, then rating."""
+    return (
+        players(league)
+        .select_related("user__profile")
+        .order_by("-points", "-won", "lost", F("user__profile__rating").desc(nulls_last=True), "user_id")
+    )
+
+
+def round_robin_rounds(players: int) -> int:
+    return players - 1 + players % 2
+
+
+def plan(league) -> list:
+    """The next fixtures as (round, player1, player2, due_on, starts_at) rows: the remaining rounds
+    of a round robin, or the next Swiss round. Only reads, so it runs before taking the write lock.
+    """
+    if league.format == League.FORMAT_ROUND_ROBIN:
+        player_ids = list(players(league).order_by("id").values_list("user_id", flat=True))
+        # The rotation is deterministic, so an interrupted generation resumes where it stopped
+        rounds = round_robin(player_ids)[league.rounds_generated:]
+    else:
+        player_ids = list(ranked_members(league).values_list("user_id", flat=True))
+        played = list(Fixture.objects.filter(league=league).values_list("player1_id", "player2_id"))
+        met = {frozenset(pair) for pair in played if pair[1] is not None}
+        had_bye = {p1 for p1, p2 in played if p2 is None}
+        pairs, bye = swiss_pairs(player_ids, met, had_bye, getattr(settings, "LEAGUE_SWISS_WINDOW", 24))
+        rounds = [pairs + ([(bye, None)] if bye is not None else [])]
+
+    first = league.rounds_generated + 1
+    now = timezone.now()
+    today = timezone.localdate(now)
+    rest = timedelta(hours=getattr(settings, "LEAGUE_MIN_REST_HOURS", 20))
+    span_start = max(round_dates(league, first)[0], today)
+    span_end = round_dates(league, first + len(rounds) - 1)[1] + timedelta(days=1)
+    masks = _masks(player_ids)
+    busy = _busy(
+        player_ids,
+        timezone.make_aware(datetime.combine(span_start, time())) - rest,
+        timezone.make_aware(datetime.combine(span_end, time())) + rest,
+    )
+
+    rows = []
+    for number, pairs in enumerate(rounds, start=first):
+        first_day, due_on = round_dates(league, number)
+        starts = schedule(pairs, max(first_day, today), due_on, masks, busy, now)
+        rows.extend((number, a, b, due_on, start) for (a, b), start in zip(pairs, starts))
+    return rows
+
+
+_FIXTURE_COLUMNS = ("league_id", "round", "player1_id", "player2_id", "due_on", "starts_at", "status")
+
+
+def batches(rows, size=5000):
+    """``plan`` rows cut into lists of whole rounds of about ``size`` rows, one write transaction each."""
+    batch = []
+    for row in rows:
+        if len(batch) >= size and row[0] != batch[-1][0]:
+            yield batch
+            batch = []
+        batch.append(row)
+    if batch:
+        yield batch
+
+
+def create(league, rows):
+    """Insert ``plan`` rows (whole rounds) and advance the league. Call inside a transaction holding the league row."""
+    connection = connections[router.db_for_write(Fixture)]
+    qn = connection.ops.quote_name
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        qn(Fixture._meta.db_table), ", ".join(qn(c) for c in _FIXTURE_COLUMNS), ", ".join(["%s"] * len(_FIXTURE_COLUMNS))
+    )
+    # Raw inserts: a round robin of 500 is 124,750 rows, where bulk_create's per-object work dominates
+    due_values = {}
+    params = []
+    for number, a, b, due_on, start in rows:
+        if due_on not in due_values:
+            due_values[due_on] = connection.ops.adapt_datefield_value(due_on)
+        params.append((
+            league.id, number, a, b, due_values[due_on],
+            connection.ops.adapt_datetimefield_value(start) if start is not None else None,
+            Fixture.STATUS_SCHEDULED if b is not None else Fixture.STATUS_BYE,
+        ))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+    if league.format == League.FORMAT_SWISS:
+        # A Swiss bye scores as a win; in a round robin everyone sits out once, so byes score nothing
+        bye_ids = [a for _, a, b, _, _ in rows if b is None]
+        LeagueMember.objects.filter(league=league, user_id__in=bye_ids).update(
+            byes=F("byes") + 1, points=F("points") + league.points_win
+        )
+    if rows:
+        league.rounds_generated = max(number for number, *_ in rows)
+        league.save(update_fields=["rounds_generated"])
+
+
+def _book_checkin(user_id, start, end):
+    """The player's CheckIn for the match, or None when they already had one that day."""
+    start, end = timezone.localtime(start), timezone.localtime(end)
+    checkin, created = CheckIn.objects.get_or_create(
+        user_id=user_id,
+        date=start.date(),
+        defaults={
+            "start_time": start.time().replace(second=0, microsecond=0),
+            "end_time": end.time().replace(second=0, microsecond=0) if end.date() == start.date() else None,
+            "duration_minutes": int((end - start).total_seconds() // 60),
+        },
+    )
+    if not created:
+        return None
+    refresh_checkin_rollup.delay_on_commit(user_id, start.year, start.month)
+    refresh_availability_mask.delay_on_commit(user_id)
+    return checkin
+
+
+def record_result(fixture, winner_id, played_at, score="", reported_by=None) -> MatchResult:
+    """Attach a pending result to the fixture; nothing counts until the opponent confirms it.
+
+    ``played_at`` is when the match ended. Call inside a transaction holding the fixture row.
+    """
+    loser_id = fixture.player2_id if winner_id == fixture.player1_id else fixture.player1_id
+    result = MatchResult.objects.create(
+        winner_id=winner_id, loser_id=loser_id, played_at=played_at, score=score, reported_by=reported_by
+    )
+    fixture.result = result
+    fixture.save(update_fields=["result"])
+    return result
+
+
+def confirm_result(fixture):
+    """Rate the fixture's just-confirmed result, add it to both standings rows and put the match
+    on both players' calendars. Call inside a transaction holding the fixture row.
+    """
+    result = fixture.result
+    with transaction.atomic():
+        rating.rate_result(result)
+        league = fixture.league
+        LeagueMember.objects.filter(league_id=league.id, user_id=result.winner_id).update(
+            played=F("played") + 1, won=F("won") + 1, points=F("points") + league.points_win
+        )
+        LeagueMember.objects.filter(league_id=league.id, user_id=result.loser_id).update(
+            played=F("played") + 1, lost=F("lost") + 1, points=F("points") + league.points_loss
+        )
+        start = result.played_at - match_length()
+        fixture.status = Fixture.STATUS_PLAYED
+        fixture.player1_checkin = _book_checkin(fixture.player1_id, start, result.played_at)
+        fixture.player2_checkin = _book_checkin(fixture.player2_id, start, result.played_at)
+        fixture.save(update_fields=["status", "player1_checkin", "player2_checkin"])
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from tennisweb_backend.api import archive, search
+import time
+
+
+class Command(BaseCommand):
+    help = "Move chat messages older than the retention window into compressed per-thread archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=None, help="Retention in months (default: CHAT_RETENTION_MONTHS)")
+        parser.add_argument("--thread", type=int, default=None, help="Only archive this thread")
+        parser.add_argument("--vacuum", action="store_true", help="Compact the database afterwards (SQLite)")
+
+    def handle(self, *args, **options):
+        if options["months"] is not None:
+            cutoff = archive.months_ago(timezone.now(), options["months"])
+        else:
+            cutoff = archive.default_cutoff()
+        if cutoff is None:
+            raise CommandError("Retention is disabled; set CHAT_RETENTION_MONTHS or pass --months")
+
+        started = time.perf_counter()
+        thread_ids = [options["thread"]] if options["thread"] else list(archive.threads_with_messages_before(cutoff))
+        moved = 0
+        for thread_id in thread_ids:
+            n = archive.archive_thread(thread_id, cutoff)
+            if n:
+                self.stdout.write(f"thread {thread_id}: archived {n} messages")
+            moved += n
+
+        if options["vacuum"] and connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                if search.fts_available():
+                    cursor.execute(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('optimize')")
+                cursor.execute("VACUUM")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} messages older than {cutoff:%Y-%m-%d} from {len(thread_ids)} threads "
+            f"({archive.default_codec()}) in {time.perf_counter() - started:.2f}s"
+        ))
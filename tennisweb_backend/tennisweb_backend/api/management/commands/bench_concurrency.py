@@ -0,0 +1,118 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from tennisweb_backend.api.serializers import VersionedTokenObtainPairSerializer
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+import asyncio
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class Command(BaseCommand):
+    help = "Compare in-process throughput of the ASGI and WSGI entry points for one endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", type=str, default="/api/profile/", help="Endpoint path to request")
+        parser.add_argument("--requests", type=int, default=500, help="Total requests per entry point")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+        parser.add_argument("--wsgi-threads", type=int, default=4, help="Worker threads for the WSGI path")
+        parser.add_argument("--username", type=str, default=None, help="User to authenticate as (default: first user)")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first() if options["username"] else User.objects.order_by("id").first()
+        if user is None:
+            raise CommandError("No user found; run seed_fake_users first")
+        token = str(VersionedTokenObtainPairSerializer.get_token(user).access_token)
+        path, query = (options["path"].split("?", 1) + [""])[:2]
+
+        rows = [
+            ("wsgi", self._run_wsgi(path, query, token, options)),
+            ("asgi", self._run_asgi(path, query, token, options)),
+        ]
+        self.stdout.write(f"{options['requests']} x GET {options['path']} as {user.username}, concurrency={options['concurrency']}")
+        self.stdout.write(f"{'server':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, (elapsed, latencies, errors) in rows:
+            rps = len(latencies) / elapsed if elapsed else 0.0
+            self.stdout.write(
+                f"{name:<8}{rps:>10.1f}{percentile(latencies, 50):>10.2f}"
+                f"{percentile(latencies, 95):>10.2f}{percentile(latencies, 99):>10.2f}{errors:>8}"
+            )
+
+    def _run_wsgi(self, path, query, token, options):
+        from tennisweb_backend.wsgi import application
+
+        def one(_):
+            environ = {}
+            setup_testing_defaults(environ)
+            environ.update({"PATH_INFO": path, "QUERY_STRING": query, "HTTP_AUTHORIZATION": f"Bearer {token}"})
+            status_holder = []
+            started = time.perf_counter()
+            b"".join(application(environ, lambda status, headers, exc_info=None: status_holder.append(status)))
+            elapsed = (time.perf_counter() - started) * 1000
+            return elapsed, not status_holder[0].startswith("2")
+
+        # Sync workers can only have as many requests in flight as they have threads
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["wsgi_threads"]) as pool:
+            results = list(pool.map(one, range(options["requests"])))
+        total = time.perf_counter() - started
+        return total, [r[0] for r in results], sum(1 for r in results if r[1])
+
+    def _run_asgi(self, path, query, token, options):
+        from tennisweb_backend.asgi import application
+
+        async def one(sem):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query.encode(),
+                "root_path": "",
+                "headers": [(b"host", b"127.0.0.1"), (b"authorization", f"Bearer {token}".encode())],
+                "client": ("127.0.0.1", 50000),
+                "server": ("127.0.0.1", 8000),
+            }
+            sent = []
+            request_sent = False
+            finished = asyncio.Event()
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # Django listens for a disconnect while the view runs
+                await finished.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+                if message["type"] == "http.response.body" and not message.get("more_body"):
+                    finished.set()
+
+            async with sem:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                elapsed = (time.perf_counter() - started) * 1000
+            status_code = next(m["status"] for m in sent if m["type"] == "http.response.start")
+            return elapsed, status_code >= 300
+
+        async def run_all():
+            sem = asyncio.Semaphore(options["concurrency"])
+            return await asyncio.gather(*(one(sem) for _ in range(options["requests"])))
+
+        started = time.perf_counter()
+        results = asyncio.run(run_all())
+        total = time.perf_counter() - started
+        return total, [r[0] for r in results], sum(1 for r in results if r[1])
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import models
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from tennisweb_backend.api.models import ChatThread, ChatMessage
+from tennisweb_backend.api.renderers import FastJSONRenderer, orjson
+from tennisweb_backend.api.middleware import brotli
+import gzip
+import time
+
+
+class Command(BaseCommand):
+    help = "Measure JSON render time and bytes on the wire for the chat history and match candidate payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="Renders per renderer")
+        parser.add_argument("--thread", type=int, default=None, help="Chat thread id (default: the largest thread)")
+        parser.add_argument("--seed-messages", type=int, default=0, help="Append this many messages to the thread first")
+        parser.add_argument("--limit", type=int, default=25, help="limit param for /match/candidates/")
+
+    def handle(self, *args, **options):
+        thread = self._thread(options)
+        if options["seed_messages"]:
+            ChatMessage.objects.bulk_create(
+                ChatMessage(thread=thread, sender_id=(thread.user1_id, thread.user2_id)[i % 2], content=f"Rally message {i} - same court tomorrow at 7pm?")
+                for i in range(options["seed_messages"])
+            )
+
+        client = APIClient()
+        client.force_authenticate(thread.user1)
+        endpoints = [
+            (f"/api/chat/threads/{thread.id}/messages/", client.get(f"/api/chat/threads/{thread.id}/messages/")),
+            ("/api/match/candidates/", client.get("/api/match/candidates/", {"limit": options["limit"]})),
+        ]
+
+        self.stdout.write(f"orjson={'yes' if orjson else 'no'} brotli={'yes' if brotli else 'no'} iterations={options['iterations']}")
+        self.stdout.write(f"{'endpoint':<36}{'stdlib ms':>11}{'fast ms':>10}{'raw B':>10}{'gzip B':>10}{'br B':>10}")
+        for path, response in endpoints:
+            if response.status_code != 200:
+                raise CommandError(f"{path} returned {response.status_code}")
+            data = response.data
+            slow_ms, body = self._time(JSONRenderer(), data, options["iterations"])
+            fast_ms, fast_body = self._time(FastJSONRenderer(), data, options["iterations"])
+            gz = len(gzip.compress(fast_body, compresslevel=6))
+            br = len(brotli.compress(fast_body, quality=4)) if brotli else "-"
+            self.stdout.write(f"{path:<36}{slow_ms:>11.3f}{fast_ms:>10.3f}{len(body):>10}{gz:>10}{br:>10}")
+
+    def _thread(self, options):
+        if options["thread"]:
+            try:
+                return ChatThread.objects.get(id=options["thread"])
+            except ChatThread.DoesNotExist:
+                raise CommandError("Thread not found")
+        thread = ChatThread.objects.annotate(n=models.Count("messages")).order_by("-n").first()
+        if thread is None:
+            users = list(User.objects.order_by("id")[:2])
+            if len(users) < 2:
+                raise CommandError("Need at least two users; run seed_fake_users first")
+            thread = ChatThread.objects.create(user1=users[0], user2=users[1])
+        return thread
+
+    def _time(self, renderer, data, iterations):
+        body = renderer.render(data)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            renderer.render(data)
+        return (time.perf_counter() - started) * 1000 / iterations, body
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections
+from tennisweb_backend.api import sharding
+from tennisweb_backend.api.models import ChatMessage, ChatThread
+from tennisweb_backend.api.routing import PRIMARY
+import time
+
+
+class Command(BaseCommand):
+    help = "Move chat threads to the shard their id hashes to (after adding shards or enabling CHAT_SHARDS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--thread", type=int, default=None, help="Only move this thread")
+        parser.add_argument("--to", default=None, help="Move to this alias instead of the hashed placement ('default' to unshard)")
+        parser.add_argument("--limit", type=int, default=None, help="Move at most this many threads")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would move")
+
+    def handle(self, *args, **options):
+        target = options["to"]
+        if target is not None and target not in {PRIMARY, *sharding.shards()}:
+            raise CommandError(f"{target!r} is neither 'default' nor in CHAT_SHARDS")
+
+        threads = ChatThread.objects.using(PRIMARY).order_by("id")
+        if options["thread"]:
+            threads = threads.filter(id=options["thread"])
+        plan = []
+        for tid, shard in threads.values_list("id", "shard").iterator(chunk_size=2000):
+            to = target or sharding.placement(tid)
+            if (shard or PRIMARY) != to:
+                plan.append((tid, shard or PRIMARY, to))
+        if options["limit"] is not None:
+            plan = plan[:options["limit"]]
+
+        if options["dry_run"]:
+            routes = {}
+            for _, source, to in plan:
+                routes[(source, to)] = routes.get((source, to), 0) + 1
+            for (source, to), n in sorted(routes.items()):
+                self.stdout.write(f"{source} -> {to}: {n} threads")
+            self.stdout.write(f"{len(plan)} threads would move")
+            return
+
+        started = time.perf_counter()
+        moved = 0
+        for tid, source, to in plan:
+            n = sharding.move_thread(tid, to)
+            self.stdout.write(f"thread {tid}: {source} -> {to}, {n} messages")
+            moved += n
+        if any(to == PRIMARY for _, _, to in plan):
+            # Rows copied back with explicit ids must not collide with the default database's own sequence
+            with connections[PRIMARY].cursor() as cursor:
+                for sql in connections[PRIMARY].ops.sequence_reset_sql(no_style(), [ChatMessage]):
+                    cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(plan)} threads ({moved} messages) in {time.perf_counter() - started:.2f}s"
+        ))
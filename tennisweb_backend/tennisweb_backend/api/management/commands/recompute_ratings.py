@@ -0,0 +1,79 @@
+from array import array
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from tennisweb_backend.api.models import MatchResult, Profile
+from tennisweb_backend.api import rating
+import time
+
+
+class Command(BaseCommand):
+    help = "Rebuild every player's Glicko-2 rating by replaying all confirmed match results in played_at order"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Results fetched per database round trip")
+        parser.add_argument("--batch-size", type=int, default=500, help="Profiles written per UPDATE batch")
+        parser.add_argument("--dry-run", action="store_true", help="Replay and report without saving")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # One slot per profile in flat arrays; results only carry user ids, mapped through `slot`
+        profile_ids = array("q")
+        previously_rated = array("q")
+        slot = {}
+        profiles = Profile.objects.order_by("id").values_list("id", "user_id", "rated_matches")
+        for pid, user_id, rated in profiles.iterator(chunk_size=options["chunk_size"]):
+            slot[user_id] = len(profile_ids)
+            profile_ids.append(pid)
+            previously_rated.append(rated)
+        n = len(profile_ids)
+        ratings = array("d", [rating.BASE_RATING]) * n
+        deviations = array("d", [rating.MAX_DEVIATION]) * n
+        volatilities = array("d", [rating.DEFAULT_VOLATILITY]) * n
+        last_played = [None] * n
+        matches = array("q", [0]) * n
+
+        replayed = skipped = 0
+        results = MatchResult.objects.filter(status=MatchResult.STATUS_CONFIRMED).order_by("played_at", "id").values_list("winner_id", "loser_id", "played_at")
+        for winner_id, loser_id, played_at in results.iterator(chunk_size=options["chunk_size"]):
+            w, l = slot.get(winner_id), slot.get(loser_id)
+            if w is None or l is None:
+                skipped += 1
+                continue
+            (ratings[w], deviations[w], volatilities[w]), (ratings[l], deviations[l], volatilities[l]) = rating.apply_result(
+                (ratings[w], deviations[w], volatilities[w], last_played[w]),
+                (ratings[l], deviations[l], volatilities[l], last_played[l]),
+                played_at,
+            )
+            last_played[w] = last_played[l] = played_at
+            matches[w] += 1
+            matches[l] += 1
+            replayed += 1
+
+        if not options["dry_run"]:
+            # Only touch profiles that have (or had) a rating, so unrated profiles keep their ETags
+            touched = [i for i in range(n) if matches[i] or previously_rated[i]]
+            self._save(touched, profile_ids, ratings, deviations, volatilities, last_played, matches, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {replayed} results for {n} profiles ({skipped} skipped) in {time.perf_counter() - started:.2f}s"
+            + (" (dry run)" if options["dry_run"] else "")
+        ))
+
+    def _save(self, touched, profile_ids, ratings, deviations, volatilities, last_played, matches, batch_size):
+        now = timezone.now()
+        fields = ["rating", "rating_deviation", "rating_volatility", "rated_matches", "last_rated_at", "updated_at"]
+        with transaction.atomic():
+            for start in range(0, len(touched), batch_size):
+                batch = [
+                    Profile(
+                        id=profile_ids[i],
+                        rating=ratings[i],
+                        rating_deviation=deviations[i],
+                        rating_volatility=volatilities[i],
+                        rated_matches=matches[i],
+                        last_rated_at=last_played[i],
+                        updated_at=now,
+                    )
+                    for i in touched[start:start + batch_size]
+                ]
+                Profile.objects.bulk_update(batch, fields)
@@ -0,0 +1,331 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.urls import NoReverseMatch, reverse
+from tennisweb_backend.api.models import (
+    ChatMember, Court, Fixture, FriendRequest, League, LeagueMember, MatchResult, SessionParticipant,
+)
+from tennisweb_backend.api.serializers import VersionedTokenObtainPairSerializer
+from tennisweb_backend.api.management.commands.bench_concurrency import percentile
+from tennisweb_backend.api.traffic import USER_FIELDS
+from urllib.parse import urlencode, urlsplit
+import asyncio
+import json
+import time
+
+
+def load_records(paths, limit=None):
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            records.extend(json.loads(line) for line in fh if line.strip())
+    # Rotated files and concurrent writers are not in start order
+    records.sort(key=lambda r: r["t"])
+    return records[:limit] if limit else records
+
+
+class UserMap:
+    """Pseudonyms onto seeded users, in order of first appearance (wrapping when there are more pseudonyms)."""
+
+    def __init__(self, users):
+        self.users = users
+        self.assigned = {}
+        self.tokens = {}
+
+    def user(self, name):
+        if name not in self.assigned:
+            self.assigned[name] = self.users[len(self.assigned) % len(self.users)]
+        return self.assigned[name]
+
+    def user_id(self, value):
+        if isinstance(value, list):
+            return [self.user_id(v) for v in value]
+        if isinstance(value, str) and "," in value:
+            return ",".join(str(self.user_id(v)) for v in value.split(","))
+        if not isinstance(value, str) or not value.startswith("p:"):
+            return value
+        return self.user(value).pk
+
+    def token(self, name):
+        user = self.user(name)
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = str(VersionedTokenObtainPairSerializer.get_token(user).access_token)
+        return self.tokens[user.pk]
+
+    def remap(self, key, value):
+        if key in USER_FIELDS:
+            return self.user_id(value)
+        if isinstance(value, dict):
+            return {k: self.remap(k, v) for k, v in value.items()}
+        return value
+
+
+class Unmappable(Exception):
+    """The replaying user has no seeded object to stand in for a captured id."""
+
+
+class ObjectMap:
+    """Captured object ids onto seeded objects the replaying user can reach, so replayed requests
+    read real rows instead of answering 404.
+
+    Each (field, captured id, user) keeps its stand-in for the whole replay, picked in order of
+    first appearance from that user's own threads, sessions, leagues and so on. Two users who shared
+    a captured thread do not share the stand-ins, so the replay keeps per-user access patterns,
+    not who talks to whom.
+    """
+
+    POOL_SIZE = 1000
+    POOLS = {
+        "thread_id": lambda user: ChatMember.objects.filter(user=user).values_list("thread_id", flat=True),
+        "session_id": lambda user: SessionParticipant.objects.filter(user=user).values_list("session_id", flat=True),
+        "league_id": lambda user: League.objects.filter(
+            Q(organizer=user) | Q(members__user=user, members__status__in=[LeagueMember.STATUS_INVITED, LeagueMember.STATUS_ACCEPTED])
+        ).distinct().values_list("id", flat=True),
+        # With its league, which the fixture URL also carries
+        "fixture_id": lambda user: Fixture.objects.filter(Q(player1=user) | Q(player2=user)).values_list("id", "league_id"),
+        "result_id": lambda user: MatchResult.objects.filter(Q(winner=user) | Q(loser=user)).values_list("id", flat=True),
+        "request_id": lambda user: FriendRequest.objects.filter(Q(to_user=user) | Q(from_user=user)).values_list("id", flat=True),
+        "court_id": lambda user: Court.objects.values_list("id", flat=True),
+    }
+    # Courts are not owned by anyone
+    SHARED = frozenset({"court_id"})
+
+    def __init__(self):
+        self.pools = {}
+        self.assigned = {}
+
+    def _pool(self, field, user):
+        key = (field, None if field in self.SHARED else user.pk)
+        if key not in self.pools:
+            self.pools[key] = list(self.POOLS[field](user).order_by()[:self.POOL_SIZE])
+        return key, self.pools[key]
+
+    def object_id(self, field, value, user):
+        if isinstance(value, list):
+            return [self.object_id(field, v, user) for v in value]
+        if value in (None, ""):
+            return value
+        if user is None and field not in self.SHARED:
+            raise Unmappable(field)
+        pool_key, pool = self._pool(field, user)
+        if not pool:
+            raise Unmappable(field)
+        taken = self.assigned.setdefault(pool_key, {})
+        # Query strings carry "7" where URLs carry 7
+        value = str(value)
+        if value not in taken:
+            taken[value] = pool[len(taken) % len(pool)]
+        return taken[value]
+
+    def remap(self, key, value, user):
+        if key in self.POOLS:
+            return self.object_id(key, value, user)
+        if isinstance(value, dict):
+            return {k: self.remap(k, v, user) for k, v in value.items()}
+        return value
+
+    def remap_kwargs(self, kwargs, user):
+        kwargs = {k: self.remap(k, v, user) for k, v in kwargs.items()}
+        if "fixture_id" in kwargs:
+            kwargs["fixture_id"], kwargs["league_id"] = kwargs["fixture_id"]
+        return kwargs
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection (enough client for Django's JSON API, no extra dependency)."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host, port):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, method, target, host, headers, body):
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{k}: {v}" for k, v in headers.items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        size = 0
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                chunk = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(chunk + 2)
+                size += chunk
+                if chunk == 0:
+                    break
+        elif "content-length" in response_headers:
+            size = int(response_headers["content-length"])
+            await self.reader.readexactly(size)
+        elif status not in (204, 304):
+            # Body runs until the server closes the connection
+            size = len(await self.reader.read())
+            response_headers["connection"] = "close"
+        reusable = response_headers.get("connection", "").lower() != "close"
+        return status, size, reusable
+
+    def close(self):
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = "Replay a capture from TrafficCaptureMiddleware against a running server and report latencies per endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Capture files (include rotated ones, e.g. traffic.ndjson traffic.ndjson.1)")
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server to replay against")
+        parser.add_argument("--speed", type=float, default=1.0, help="Speedup over captured timing (0 = send as fast as concurrency allows)")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at most")
+        parser.add_argument("--limit", type=int, default=None, help="Replay only the first N requests")
+        parser.add_argument("--prefix", default="seed_user_", help="Username prefix of the seeded users to map captured users onto")
+        parser.add_argument("--max-wait", type=int, default=None, help="Cap long-poll wait parameters at this many seconds")
+
+    def handle(self, *args, **options):
+        records = load_records(options["paths"], options["limit"])
+        if not records:
+            raise CommandError("No requests in the capture")
+        users = list(User.objects.filter(username__startswith=options["prefix"]).order_by("id"))
+        if not users:
+            raise CommandError(f"No users named {options['prefix']}*; run seed_fake_users first")
+        base = urlsplit(options["base_url"])
+        if base.scheme != "http":
+            raise CommandError("Only plain http:// servers are supported")
+
+        user_map = UserMap(users)
+        object_map = ObjectMap()
+        planned, skipped = [], {}
+        for record in records:
+            try:
+                request = self._build(record, user_map, object_map, options)
+            except Unmappable as exc:
+                reason = f"no seeded {exc.args[0].removesuffix('_id')} for the user"
+            else:
+                if request is not None:
+                    planned.append(request)
+                    continue
+                reason = "no such route"
+            skipped[reason] = skipped.get(reason, 0) + 1
+        if not planned:
+            raise CommandError("No request could be mapped onto the seeded data")
+        distinct = len(user_map.assigned)
+        self.stdout.write(
+            f"Replaying {len(planned)} requests ({sum(skipped.values())} skipped) from {distinct} captured users "
+            f"onto {min(distinct, len(users))} seeded users at speed {options['speed'] or 'max'}"
+        )
+        for reason, count in sorted(skipped.items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  skipped {count}: {reason}")
+
+        started = time.perf_counter()
+        results, lag = asyncio.run(self._replay(planned, base, options))
+        self._report(results, time.perf_counter() - started, lag)
+
+    def _build(self, record, user_map, object_map, options):
+        """(t, method, view, path, headers, body, captured ms), or None when the route is gone.
+
+        Raises Unmappable when an object id has no seeded stand-in; such requests would only 404.
+        """
+        caller = user_map.user(record["u"]) if record["u"] else None
+        kwargs = object_map.remap_kwargs({k: user_map.remap(k, v) for k, v in record["kw"].items()}, caller)
+        try:
+            path = reverse(record["view"], kwargs=kwargs)
+        except NoReverseMatch:
+            return None
+        query = {k: object_map.remap(k, user_map.remap(k, v), caller) for k, v in record["q"].items()}
+        if options["max_wait"] is not None and "wait" in query:
+            query["wait"] = [str(min(int(w), options["max_wait"])) for w in query["wait"] if w.isdigit()]
+        if query:
+            path += "?" + urlencode(query, doseq=True)
+        headers = {}
+        body = b""
+        if record["u"]:
+            headers["Authorization"] = f"Bearer {user_map.token(record['u'])}"
+        if record["body"] is not None:
+            body = json.dumps(object_map.remap(None, user_map.remap(None, record["body"]), caller)).encode()
+            headers["Content-Type"] = "application/json"
+        return record["t"], record["m"], record["view"], path, headers, body, record["ms"]
+
+    async def _replay(self, planned, base, options):
+        host, port = base.hostname, base.port or 80
+        speed = options["speed"]
+        sem = asyncio.Semaphore(options["concurrency"])
+        idle = []
+        results = []
+        lag = []
+        t0 = planned[0][0]
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def one(due, method, view, path, headers, body, captured_ms):
+            async with sem:
+                if speed:
+                    lag.append(max(0.0, loop.time() - due) * 1000)
+                conn = idle.pop() if idle else None
+                began = time.perf_counter()
+                try:
+                    if conn is None:
+                        conn = await Connection.open(host, port)
+                    status, _, reusable = await conn.request(method, path, base.netloc, headers, body)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    if conn is not None:
+                        conn.close()
+                    results.append((method, view, 0, (time.perf_counter() - began) * 1000, captured_ms))
+                    return
+                results.append((method, view, status, (time.perf_counter() - began) * 1000, captured_ms))
+                if reusable:
+                    idle.append(conn)
+                else:
+                    conn.close()
+
+        tasks = []
+        for t, method, view, path, headers, body, captured_ms in planned:
+            due = start + (t - t0) / speed if speed else start
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            tasks.append(asyncio.create_task(one(due, method, view, path, headers, body, captured_ms)))
+        await asyncio.gather(*tasks)
+        for conn in idle:
+            conn.close()
+        return results, lag
+
+    def _report(self, results, elapsed, lag):
+        groups = {}
+        for method, view, status, ms, captured_ms in results:
+            groups.setdefault((method, view), []).append((status, ms, captured_ms))
+        self.stdout.write(
+            f"{'endpoint':<34}{'count':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+            f"{'capt p50':>10}{'errors':>8}"
+        )
+        ordered = sorted(groups.items(), key=lambda item: -len(item[1]))
+        for (method, view), rows in ordered + [(("ALL", ""), [row for _, rows in ordered for row in rows])]:
+            latencies = [ms for _, ms, _ in rows]
+            errors = sum(1 for status, _, _ in rows if status == 0 or status >= 500)
+            self.stdout.write(
+                f"{(method + ' ' + view).strip():<34}{len(rows):>7}{len(rows) / elapsed:>9.1f}"
+                f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}"
+                f"{max(latencies):>9.1f}{percentile([c for _, _, c in rows], 50):>10.1f}{errors:>8}"
+            )
+        statuses = {}
+        for _, _, status, _, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        self.stdout.write("statuses: " + ", ".join(f"{s or 'failed'}={n}" for s, n in sorted(statuses.items())))
+        late = [ms for ms in lag if ms > 10]
+        if late:
+            # Behind schedule: the server (or --concurrency) cannot keep up with the captured rate
+            self.stdout.write(
+                f"{len(late)} requests started over 10 ms late (p95 {percentile(late, 95):.1f} ms); "
+                "raise --concurrency or lower --speed"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} requests in {elapsed:.2f}s"))
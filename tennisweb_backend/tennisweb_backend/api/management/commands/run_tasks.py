@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import autodiscover_modules
+from tennisweb_backend.api.taskqueue import DatabaseBackend
+import threading
+import time
+
+
+class Command(BaseCommand):
+    help = "Run background tasks queued in the database (TASK_QUEUE_BACKEND = 'database')"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2, help="Number of worker threads")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due")
+        parser.add_argument("--purge-interval", type=float, default=600.0, help="Seconds between deletions of old finished tasks")
+
+    def handle(self, *args, **options):
+        # Register @task functions from every installed app's tasks.py
+        autodiscover_modules("tasks")
+        backend = DatabaseBackend()
+        stop = threading.Event()
+        counts = {"ok": 0, "failed": 0}
+        lock = threading.Lock()
+
+        def worker():
+            while not stop.is_set():
+                close_old_connections()
+                row = backend.claim()
+                if row is None:
+                    if options["once"]:
+                        break
+                    stop.wait(options["poll_interval"])
+                    continue
+                ok = backend.process(row)
+                with lock:
+                    counts["ok" if ok else "failed"] += 1
+            close_old_connections()
+
+        threads = [threading.Thread(target=worker, name=f"task-worker-{i}", daemon=True) for i in range(max(1, options["concurrency"]))]
+        for t in threads:
+            t.start()
+        self.stdout.write(self.style.SUCCESS(f"Task worker started with {len(threads)} threads"))
+        purged_at = None
+        try:
+            while any(t.is_alive() for t in threads):
+                if purged_at is None or time.monotonic() - purged_at >= options["purge_interval"]:
+                    purged_at = time.monotonic()
+                    backend.purge()
+                    close_old_connections()
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for t in threads:
+                t.join()
+        self.stdout.write(self.style.SUCCESS(f"Processed {counts['ok']} tasks, {counts['failed']} failed attempts."))
@@ -0,0 +1,90 @@
+"""
+Compact match payloads for the LLM matcher (MatchPromptView).
+
+The AI route only needs a handful of profile attributes per player, so
+``compact_profile`` emits a fixed set of short keys and leaves out empty
+ones; ``fit_budget`` then keeps the best-scored candidates whose JSON fits
+the caller's size budget. Token counts are estimated at CHARS_PER_TOKEN
+characters per token, which is close enough for English-ish JSON to keep a
+prompt inside its limit without running a tokenizer.
+"""
+
+from django.conf import settings
+import json
+import math
+
+SCHEMA_VERSION = 1
+CHARS_PER_TOKEN = 4
+
+# Key order is part of the schema: prompts built from it stay byte-identical for identical data
+PROFILE_FIELDS = (
+    "location", "skill_level", "rating", "years_playing", "dominant_hand", "backhand_type",
+    "preferred_court_types", "preferred_match_types", "play_intentions", "preferred_languages",
+)
+
+
+def compact_profile(profile) -> dict:
+    out = {"id": profile.user_id, "username": profile.user.username}
+    values = {
+        "location": profile.location,
+        "skill_level": float(profile.skill_level) if profile.skill_level is not None else None,
+        # Only once the rating has settled enough for matching to use it
+        "rating": round(profile.rating) if profile.rated_matches >= getattr(settings, "RATING_MIN_MATCHES", 5) else None,
+        "years_playing": profile.years_playing,
+        "dominant_hand": profile.dominant_hand,
+        "backhand_type": profile.backhand_type,
+        "preferred_court_types": profile.preferred_court_types,
+        "preferred_match_types": profile.preferred_match_types,
+        "play_intentions": profile.play_intentions,
+        "preferred_languages": profile.preferred_languages,
+    }
+    for key in PROFILE_FIELDS:
+        if values[key] not in (None, "", []):
+            out[key] = values[key]
+    return out
+
+
+def compact_candidate(profile, score: float, parts: dict) -> dict:
+    return {
+        "id": profile.user_id,
+        "score": round(score, 2),
+        # Non-zero components only; they sum to the score up to rounding
+        "parts": {k: round(v, 2) for k, v in parts.items() if v},
+        "profile": compact_profile(profile),
+    }
+
+
+def _size(obj) -> int:
+    return len(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+
+
+def _budget(max_chars, used):
+    return {"max_chars": max_chars, "used_chars": used, "est_tokens": math.ceil(used / CHARS_PER_TOKEN)}
+
+
+def fit_budget(viewer: dict, candidates: list, max_chars: int) -> dict:
+    """The response body with as many leading ``candidates`` as fit in ``max_chars`` of compact JSON."""
+    body = {
+        "v": SCHEMA_VERSION,
+        "viewer": viewer,
+        "candidates": [],
+        "omitted": len(candidates),
+        # Placeholders at least as wide as the final numbers, so the real body is never larger
+        "budget": {"max_chars": max_chars, "used_chars": max_chars, "est_tokens": max_chars},
+    }
+    used = _size(body)
+    kept = []
+    for candidate in candidates:
+        size = _size(candidate) + (1 if kept else 0)
+        if used + size > max_chars:
+            break
+        kept.append(candidate)
+        used += size
+    body["candidates"] = kept
+    body["omitted"] = len(candidates) - len(kept)
+    body["budget"] = _budget(max_chars, used)
+    # Settle used_chars on the real numbers, which are no wider than the placeholders
+    while (size := _size(body)) != used:
+        used = size
+        body["budget"] = _budget(max_chars, used)
+    return body
@@ -0,0 +1,225 @@
+"""
+Delivery of uploaded media (avatars) at MEDIA_URL, in production as well as
+under DEBUG.
+
+``serve`` answers conditional requests itself, with a strong ETag from the
+file's size and mtime (or from the hash in a content-addressed name), and
+then leaves the body to the front-end server when MEDIA_SENDFILE says so:
+
+- "x-accel-redirect" (nginx): X-Accel-Redirect to MEDIA_ACCEL_PREFIX + name,
+  an ``internal`` location aliased to MEDIA_ROOT;
+- "x-sendfile" (Apache mod_xsendfile, lighttpd): X-Sendfile with the path.
+
+The front-end server then handles ranges too. Otherwise Django streams the
+file itself, and single byte ranges get a 206, so players and CDNs can
+resume and seek: under WSGI with FileResponse (wsgi.file_wrapper, i.e.
+sendfile(2) where the server has it); under ASGI, which has no such hook and
+would buffer a file object whole, in STREAM_BLOCK_SIZE reads off the event
+loop (see streaming.py). Content-addressed names are cached as immutable
+for a year; other names for MEDIA_CACHE_MAX_AGE, after which clients
+revalidate.
+"""
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from urllib.parse import quote
+from .models import Profile
+from .storage import is_content_addressed
+from .streaming import is_asgi, stream
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+import uuid
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def _storage():
+    return Profile._meta.get_field("avatar").storage
+
+
+def release(storage, name):
+    """Delete an avatar file unless a profile still points at it (content-addressed files are shared).
+
+    An identical upload may be saving a profile that points at a content-addressed file at this
+    very moment. Locally, the file is therefore first renamed away (a concurrent save then writes
+    it afresh), the references are checked again, and the file is put back if one appeared. An
+    upload committed later still finds the file missing; ``ensure_stored`` covers that side.
+    """
+    if not name or Profile.objects.filter(avatar=name).exists():
+        return
+    path = _local_path(storage, name) if is_content_addressed(name) else None
+    if path is None:
+        storage.delete(name)
+        return
+    doomed = f"{path}.{uuid.uuid4().hex}.release"
+    try:
+        os.rename(path, doomed)
+    except FileNotFoundError:
+        return
+    if Profile.objects.filter(avatar=name).exists():
+        os.replace(doomed, path)
+    else:
+        os.remove(doomed)
+
+
+def ensure_stored(storage, name, content):
+    """Once a profile pointing at ``name`` is committed, put the file back from ``content`` if a
+    concurrent ``release`` of the same content-addressed file removed it."""
+    if is_content_addressed(name) and not storage.exists(name):
+        content.seek(0)
+        # Saved from the directory above the hash prefix, the bytes land at ``name`` again
+        storage.save(posixpath.join(posixpath.dirname(posixpath.dirname(name)), posixpath.basename(name)), content)
+
+
+def _local_path(storage, name):
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def _stat(storage, name):
+    """(local path or None, size, mtime) of a stored file, or None when there is no such file."""
+    try:
+        path = _local_path(storage, name)
+        if path is not None:
+            st = os.stat(path)
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            return path, st.st_size, st.st_mtime
+        return None, storage.size(name), storage.get_modified_time(name).timestamp()
+    except (OSError, SuspiciousFileOperation, NotImplementedError):
+        return None
+
+
+def byte_range(header, size):
+    """(first, last) inclusive for a single-range header; None to send everything; False if unsatisfiable.
+
+    Malformed and multi-range headers are ignored, which RFC 9110 allows.
+    """
+    match = _RANGE.fullmatch(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return False
+        return max(size - suffix, 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        return False
+    return first, min(int(last), size - 1) if last else size - 1
+
+
+class _Slice:
+    """``length`` bytes of an open file from its current position."""
+
+    def __init__(self, fh, length):
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fh.close()
+
+
+def _blocks(fh):
+    try:
+        while block := fh.read(STREAM_BLOCK_SIZE):
+            yield block
+    finally:
+        fh.close()
+
+
+def _headers(response, name, etag, mtime, content_type):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(mtime)
+    response.headers["Content-Type"] = content_type
+    if is_content_addressed(name):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, "MEDIA_CACHE_MAX_AGE", 86400))
+    return response
+
+
+@require_safe
+def serve(request, path):
+    name = posixpath.normpath(path).lstrip("/")
+    if name in (".", "..") or name.startswith("../") or "\\" in name:
+        raise Http404("No such file")
+    storage = _storage()
+    found = _stat(storage, name)
+    if found is None:
+        raise Http404("No such file")
+    local, size, mtime = found
+    if is_content_addressed(name):
+        etag = '"%s"' % posixpath.basename(name).partition(".")[0]
+    else:
+        etag = '"%x-%x"' % (size, int(mtime * 1000))
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if response is not None:
+        return _headers(response, name, etag, mtime, content_type)
+
+    sendfile = getattr(settings, "MEDIA_SENDFILE", None)
+    if sendfile == "x-accel-redirect":
+        response = HttpResponse()
+        response.headers["X-Accel-Redirect"] = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/") + quote(name)
+        return _headers(response, name, etag, mtime, content_type)
+    if sendfile == "x-sendfile" and local is not None:
+        response = HttpResponse()
+        response.headers["X-Sendfile"] = local
+        return _headers(response, name, etag, mtime, content_type)
+
+    span = None
+    if_range = request.headers.get("If-Range")
+    if "Range" in request.headers and (if_range is None or if_range.strip() in (etag, http_date(mtime))):
+        span = byte_range(request.headers["Range"], size)
+    if span is False:
+        response = HttpResponse(status=416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if request.method == "HEAD":
+        response = HttpResponse()
+        response.headers["Content-Length"] = str(size)
+    else:
+        first, last = span if span is not None else (0, size - 1)
+        fh = storage.open(name, "rb")
+        if first:
+            fh.seek(first)
+        body = _Slice(fh, last - first + 1) if span is not None else fh
+        if is_asgi(request):
+            response = StreamingHttpResponse(stream(request, _blocks(body), thread_sensitive=False))
+        else:
+            response = FileResponse(body)
+            response.block_size = STREAM_BLOCK_SIZE
+        response.headers["Content-Length"] = str(last - first + 1)
+        if span is not None:
+            response.status_code = 206
+            response.headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    response.headers["Accept-Ranges"] = "bytes"
+    return _headers(response, name, etag, mtime, content_type)
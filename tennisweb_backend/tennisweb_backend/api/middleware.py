@@ -0,0 +1,179 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import InterfaceError, OperationalError
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+from . import routing, traffic
+from .invalidation import bus
+from .throttling import load_shedder
+
+import random
+import time
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional speedup
+    brotli = None
+
+
+re_accepts_br = _lazy_re_compile(r"\bbr\b")
+
+# Bodies worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware with a configurable size threshold and brotli support.
+
+    Responses smaller than ``RESPONSE_COMPRESSION_MIN_SIZE`` bytes or with a
+    non-text content type are left alone. Clients accepting ``br`` get
+    brotli (when the package is installed) for buffered bodies; everything
+    else, including streaming responses, falls back to gzip.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, "RESPONSE_COMPRESSION_MIN_SIZE", 1024):
+            return response
+        if not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES):
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+
+        ae = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is None or response.streaming or not re_accepts_br.search(ae):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed_content = brotli.compress(response.content, quality=getattr(settings, "RESPONSE_BROTLI_QUALITY", 4))
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(response.content))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+
+class LoadSheddingMiddleware(MiddlewareMixin):
+    """Answer 503 + Retry-After for ``load_shed = True`` views while this worker is overloaded.
+
+    Only opted-in (expensive) endpoints are counted and refused, so cheap
+    traffic such as chat polling keeps its latency when matching saturates.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(getattr(view_func, "cls", None), "load_shed", False):
+            return None
+        if load_shedder.should_shed():
+            response = JsonResponse({"detail": "Server is busy, please retry shortly."}, status=503)
+            response.headers["Retry-After"] = str(load_shedder.retry_after())
+            return response
+        request._load_shed_started = load_shedder.start()
+        return None
+
+    def process_response(self, request, response):
+        started = getattr(request, "_load_shed_started", None)
+        if started is not None:
+            load_shedder.finish(started)
+        return response
+
+
+class InvalidationMiddleware(MiddlewareMixin):
+    """Apply change events from other workers before handling a request (throttled by the bus)."""
+
+    def process_request(self, request):
+        bus.poll()
+
+
+class ReplicaRoutingMiddleware:
+    """Scope api.routing.ReplicaRouter decisions to one request.
+
+    Written as a plain sync/async middleware (not MiddlewareMixin) so the
+    routing context is set in the request's own context rather than in a
+    thread that sync_to_async would copy it from.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routing.begin(request.method)
+        try:
+            return self.get_response(request)
+        finally:
+            routing.end(token)
+
+    async def __acall__(self, request):
+        token = routing.begin(request.method)
+        try:
+            return await self.get_response(request)
+        finally:
+            routing.end(token)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, (OperationalError, InterfaceError)):
+            routing.replica_failed()
+        return None
+
+
+class TrafficCaptureMiddleware:
+    """Record sampled API requests for ``manage.py replay_traffic`` (see api/traffic.py).
+
+    Off unless TRAFFIC_CAPTURE is set; TRAFFIC_CAPTURE_SAMPLE is the fraction
+    of requests kept. Sync/async like ReplicaRoutingMiddleware, so timings
+    cover async views (including long polls) without a thread hop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "TRAFFIC_CAPTURE", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample = getattr(settings, "TRAFFIC_CAPTURE_SAMPLE", 1.0)
+        self.log = traffic.TrafficLog(
+            getattr(settings, "TRAFFIC_CAPTURE_PATH", settings.BASE_DIR / "traffic.ndjson"),
+            max_bytes=getattr(settings, "TRAFFIC_CAPTURE_MAX_BYTES", 50 * 1024 * 1024),
+            backups=getattr(settings, "TRAFFIC_CAPTURE_BACKUPS", 5),
+        )
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started_at, started = time.time(), time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, started_at, started)
+        return response
+
+    async def __acall__(self, request):
+        started_at, started = time.time(), time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, started_at, started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if random.random() < self.sample and traffic.should_capture(request):
+            request._traffic_body = traffic.read_body(request)
+        return None
+
+    def _record(self, request, response, started_at, started):
+        if not hasattr(request, "_traffic_body"):
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.log.write(traffic.shape(request, response, request._traffic_body, started_at, elapsed_ms))
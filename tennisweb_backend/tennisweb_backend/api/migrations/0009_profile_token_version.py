@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_checkin_end_time_checkin_start_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
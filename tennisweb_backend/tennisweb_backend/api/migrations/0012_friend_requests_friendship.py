@@ -0,0 +1,112 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _keep_created_at(*models_):
+    # Copy original timestamps instead of letting auto_now_add stamp "now"
+    for model in models_:
+        model._meta.get_field('created_at').auto_now_add = False
+
+
+def friends_to_friendships(apps, schema_editor):
+    """Mutual Friend pairs become Friendships; one-way rows become pending requests.
+
+    A one-way row listed the other user without their say, so it is kept as a
+    request from its owner that the other user can accept or decline.
+    """
+    db = schema_editor.connection.alias
+    Friend = apps.get_model('api', 'Friend')
+    FriendRequest = apps.get_model('api', 'FriendRequest')
+    Friendship = apps.get_model('api', 'Friendship')
+    _keep_created_at(FriendRequest, Friendship)
+
+    added = {}
+    for f in Friend.objects.using(db).iterator():
+        added[(f.user_id, f.friend_id)] = f.created_at
+    friendships = []
+    requests = []
+    for (user_id, friend_id), created_at in added.items():
+        back = added.get((friend_id, user_id))
+        if back is None:
+            requests.append(FriendRequest(from_user_id=user_id, to_user_id=friend_id, status='pending', created_at=created_at))
+        elif user_id < friend_id:
+            # Friends since the second direction was added
+            friendships.append(Friendship(user1_id=user_id, user2_id=friend_id, created_at=max(created_at, back)))
+    Friendship.objects.using(db).bulk_create(friendships, batch_size=500)
+    FriendRequest.objects.using(db).bulk_create(requests, batch_size=500)
+
+
+def friendships_to_friends(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Friend = apps.get_model('api', 'Friend')
+    FriendRequest = apps.get_model('api', 'FriendRequest')
+    Friendship = apps.get_model('api', 'Friendship')
+    _keep_created_at(Friend)
+
+    rows = []
+    for fs in Friendship.objects.using(db).iterator():
+        rows.append(Friend(user_id=fs.user1_id, friend_id=fs.user2_id, created_at=fs.created_at))
+        rows.append(Friend(user_id=fs.user2_id, friend_id=fs.user1_id, created_at=fs.created_at))
+    for fr in FriendRequest.objects.using(db).filter(status='pending').iterator():
+        rows.append(Friend(user_id=fr.from_user_id, friend_id=fr.to_user_id, created_at=fr.created_at))
+    Friend.objects.using(db).bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_checkinmonthlyrollup_task'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FriendRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('declined', 'Declined')], default='pending', max_length=8)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('responded_at', models.DateTimeField(blank=True, null=True)),
+                ('from_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend_requests_sent', to=settings.AUTH_USER_MODEL)),
+                ('to_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend_requests_received', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Friendship',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user1', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friendships_as_user1', to=settings.AUTH_USER_MODEL)),
+                ('user2', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friendships_as_user2', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='friendrequest',
+            index=models.Index(fields=['to_user', 'status'], name='api_friendr_to_user_001203_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='friendrequest',
+            unique_together={('from_user', 'to_user')},
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['user2', 'user1'], name='api_friends_user2_i_001442_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='friendship',
+            unique_together={('user1', 'user2')},
+        ),
+        migrations.RunPython(friends_to_friendships, friendships_to_friends),
+        migrations.DeleteModel(
+            name='Friend',
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_availability'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Court',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('location', models.CharField(blank=True, default='', max_length=128)),
+                ('surface', models.CharField(blank=True, choices=[('hard', 'Hard'), ('clay', 'Clay'), ('grass', 'Grass')], default='hard', max_length=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Session',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('proposed', 'Proposed'), ('accepted', 'Accepted'), ('cancelled', 'Cancelled')], default='proposed', max_length=9)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='api.court')),
+                ('organizer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='organized_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SessionParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('invited', 'Invited'), ('accepted', 'Accepted'), ('declined', 'Declined')], default='invited', max_length=8)),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('active', models.BooleanField(default=True)),
+                ('checkin', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.checkin')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='api.session')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_participations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['court', 'start_at', 'end_at'], name='api_session_court_i_1df509_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionparticipant',
+            index=models.Index(fields=['user', 'active', 'start_at'], name='api_session_user_id_ecd26d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sessionparticipant',
+            unique_together={('session', 'user')},
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_court_session'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='last_rated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rated_matches',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating',
+            field=models.FloatField(default=1500.0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_deviation',
+            field=models.FloatField(default=350.0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_volatility',
+            field=models.FloatField(default=0.06),
+        ),
+        migrations.CreateModel(
+            name='MatchResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played_at', models.DateTimeField()),
+                ('score', models.CharField(blank=True, default='', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loser', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_losses', to=settings.AUTH_USER_MODEL)),
+                ('reported_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('session', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='result', to='api.session')),
+                ('winner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_wins', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-played_at'],
+                'indexes': [models.Index(fields=['played_at', 'id'], name='api_matchre_played__2eaa57_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# SQLite only: an external-content FTS5 index over ChatMessage.content, maintained by
+# triggers so every write path (views, bulk_create, deletes) keeps it in sync.
+# Other databases fall back to substring search in api/search.py.
+CREATE_SQL = [
+    """CREATE VIRTUAL TABLE api_chatmessage_fts USING fts5(
+        content, content='api_chatmessage', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER api_chatmessage_fts_ai AFTER INSERT ON api_chatmessage BEGIN
+        INSERT INTO api_chatmessage_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER api_chatmessage_fts_ad AFTER DELETE ON api_chatmessage BEGIN
+        INSERT INTO api_chatmessage_fts(api_chatmessage_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER api_chatmessage_fts_au AFTER UPDATE OF content ON api_chatmessage BEGIN
+        INSERT INTO api_chatmessage_fts(api_chatmessage_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO api_chatmessage_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    "INSERT INTO api_chatmessage_fts(api_chatmessage_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS api_chatmessage_fts_au",
+    "DROP TRIGGER IF EXISTS api_chatmessage_fts_ad",
+    "DROP TRIGGER IF EXISTS api_chatmessage_fts_ai",
+    "DROP TABLE IF EXISTS api_chatmessage_fts",
+]
+
+
+def _fts5_available(cursor):
+    cursor.execute("PRAGMA compile_options")
+    return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not _fts5_available(cursor):
+            return
+        for sql in CREATE_SQL:
+            cursor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in DROP_SQL:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_match_ratings'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_direct_members(apps, schema_editor):
+    """Existing threads are direct: both users become members with everything so far marked read."""
+    db = schema_editor.connection.alias
+    ChatThread = apps.get_model('api', 'ChatThread')
+    ChatMember = apps.get_model('api', 'ChatMember')
+    latest = dict(
+        ChatThread.objects.using(db).annotate(last=models.Max('messages__id')).filter(last__isnull=False).values_list('id', 'last')
+    )
+    members = []
+    for thread_id, u1, u2 in ChatThread.objects.using(db).values_list('id', 'user1_id', 'user2_id').iterator():
+        last = latest.get(thread_id, 0)
+        members.append(ChatMember(thread_id=thread_id, user_id=u1, last_read_message_id=last))
+        members.append(ChatMember(thread_id=thread_id, user_id=u2, last_read_message_id=last))
+    ChatMember.objects.using(db).bulk_create(members, batch_size=1000)
+    for thread_id, last in latest.items():
+        ChatThread.objects.using(db).filter(id=thread_id).update(last_message_id=last)
+
+
+def remove_group_threads(apps, schema_editor):
+    # Group threads have no user1/user2 and cannot survive the reverse AlterField
+    apps.get_model('api', 'ChatThread').objects.using(schema_editor.connection.alias).exclude(kind='direct').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_chatmessage_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatthread',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='kind',
+            field=models.CharField(choices=[('direct', 'Direct'), ('group', 'Group'), ('channel', 'Broadcast channel')], default='direct', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='last_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='title',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='chatthread',
+            name='user1',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chat_threads_as_user1', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='chatthread',
+            name='user2',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chat_threads_as_user2', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, remove_group_threads),
+        migrations.CreateModel(
+            name='ChatMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('member', 'Member'), ('admin', 'Admin')], default='member', max_length=6)),
+                ('last_read_message_id', models.BigIntegerField(default=0)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='api.chatthread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'thread'], name='api_chatmem_user_id_086065_idx')],
+                'unique_together': {('thread', 'user')},
+            },
+        ),
+        migrations.RunPython(add_direct_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_group_chats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_message_id', models.BigIntegerField()),
+                ('last_message_id', models.BigIntegerField()),
+                ('first_created_at', models.DateTimeField()),
+                ('last_created_at', models.DateTimeField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('codec', models.CharField(choices=[('gzip', 'gzip'), ('zstd', 'zstd')], default='gzip', max_length=4)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['thread', 'first_message_id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='archived_through_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['created_at'], name='api_chatmes_created_ede6cd_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatarchive',
+            name='thread',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='api.chatthread'),
+        ),
+        migrations.AddIndex(
+            model_name='chatarchive',
+            index=models.Index(fields=['thread', 'last_message_id'], name='api_chatarc_thread__4ab377_idx'),
+        ),
+    ]
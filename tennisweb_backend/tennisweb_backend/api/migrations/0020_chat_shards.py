@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from importlib import import_module
+
+_fts = import_module("tennisweb_backend.api.migrations.0016_chatmessage_fts")
+
+
+def restore_fts_triggers(apps, schema_editor):
+    # SQLite rebuilds api_chatmessage to drop the foreign key constraints, which drops its triggers
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if "api_chatmessage_fts" not in schema_editor.connection.introspection.table_names(cursor):
+            return
+        for sql in _fts.CREATE_SQL:
+            if sql.lstrip().startswith("CREATE TRIGGER"):
+                cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_change_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.CreateModel(
+            name='ChatIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='shard',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='sender',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='sent_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='thread',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='api.chatthread'),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_chat_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='League',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('format', models.CharField(choices=[('round_robin', 'Round robin'), ('swiss', 'Swiss')], default='round_robin', max_length=11)),
+                ('starts_on', models.DateField()),
+                ('round_days', models.PositiveSmallIntegerField(default=7)),
+                ('points_win', models.PositiveSmallIntegerField(default=3)),
+                ('points_loss', models.PositiveSmallIntegerField(default=0)),
+                ('rounds_generated', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organizer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='organized_leagues', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-starts_on', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Fixture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round', models.PositiveIntegerField()),
+                ('due_on', models.DateField()),
+                ('starts_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('played', 'Played'), ('bye', 'Bye')], default='scheduled', max_length=9)),
+                ('player1', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('player1_checkin', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.checkin')),
+                ('player2', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('player2_checkin', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.checkin')),
+                ('result', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fixture', to='api.matchresult')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fixtures', to='api.league')),
+            ],
+            options={
+                'ordering': ['round', 'id'],
+                'indexes': [models.Index(fields=['league', 'round'], name='api_fixture_league__67d5f9_idx'), models.Index(fields=['player1', 'status'], name='api_fixture_player1_d9b63b_idx'), models.Index(fields=['player2', 'status'], name='api_fixture_player2_9dc9a2_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeagueMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played', models.PositiveIntegerField(default=0)),
+                ('won', models.PositiveIntegerField(default=0)),
+                ('lost', models.PositiveIntegerField(default=0)),
+                ('byes', models.PositiveIntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='api.league')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='league_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['league', '-points', '-won'], name='api_leaguem_league__0ef6fb_idx')],
+                'unique_together': {('league', 'user')},
+            },
+        ),
+    ]
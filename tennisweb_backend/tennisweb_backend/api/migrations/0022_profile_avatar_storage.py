@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:12
+
+import tennisweb_backend.api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_leagues'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=tennisweb_backend.api.storage.avatar_storage, upload_to='avatars/'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:24
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def confirm_existing(apps, schema_editor):
+    """Results recorded before confirmations existed were already rated."""
+    MatchResult = apps.get_model('api', 'MatchResult')
+    MatchResult.objects.using(schema_editor.connection.alias).update(status='confirmed', confirmed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_profile_avatar_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchresult',
+            name='confirmed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='matchresult',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('disputed', 'Disputed')], default='pending', max_length=9),
+        ),
+        migrations.RunPython(confirm_existing, migrations.RunPython.noop),
+    ]
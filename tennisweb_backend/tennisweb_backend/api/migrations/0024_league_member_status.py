@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:26
+
+from django.db import migrations, models
+
+
+def accept_existing(apps, schema_editor):
+    """Members added before invitations existed already play in their leagues."""
+    LeagueMember = apps.get_model('api', 'LeagueMember')
+    LeagueMember.objects.using(schema_editor.connection.alias).update(status='accepted')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_match_result_confirmation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaguemember',
+            name='status',
+            field=models.CharField(choices=[('invited', 'Invited'), ('accepted', 'Accepted'), ('declined', 'Declined')], default='invited', max_length=8),
+        ),
+        migrations.RunPython(accept_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 08:02
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+
+def backfill(apps, schema_editor):
+    """Months checked into before the rollup existed are only refreshed on their next change."""
+    CheckIn = apps.get_model('api', 'CheckIn')
+    CheckInMonthlyRollup = apps.get_model('api', 'CheckInMonthlyRollup')
+    alias = schema_editor.connection.alias
+    totals = (
+        CheckIn.objects.using(alias)
+        .annotate(month=TruncMonth('date'))
+        .values('user_id', 'month')
+        .annotate(sessions=models.Count('id'), minutes=models.Sum('duration_minutes'))
+        .order_by()
+    )
+    CheckInMonthlyRollup.objects.using(alias).all().delete()
+    CheckInMonthlyRollup.objects.using(alias).bulk_create(
+        [
+            CheckInMonthlyRollup(user_id=row['user_id'], month=row['month'], sessions=row['sessions'], total_minutes=row['minutes'] or 0)
+            for row in totals.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_league_member_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
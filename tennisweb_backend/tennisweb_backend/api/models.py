@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from datetime import timedelta
+from .storage import avatar_storage
 
 
 # Extend User with a one-to-one Profile model to store extra fields
@@ -11,7 +13,7 @@ class Profile(models.Model):
 	)
 
 	user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
-	avatar = models.ImageField(upload_to="avatars/", null=True, blank=True)
+	avatar = models.ImageField(upload_to="avatars/", storage=avatar_storage, null=True, blank=True)
 	bio = models.TextField(blank=True, default="")
 	# Approximate NTRP or custom rating like 3.0, 4.5 etc
 	skill_level = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
@@ -38,6 +40,24 @@ class Profile(models.Model):
 	play_intentions = models.JSONField(default=list, blank=True)        # values: ['casual','competitive']
 	preferred_languages = models.JSONField(default=list, blank=True)    # values: ['en','zh']
 
+	# Embedded in issued JWTs as the "ver" claim; bumping it revokes every outstanding token
+	token_version = models.PositiveIntegerField(default=0)
+	# Drives ETag/Last-Modified on profile endpoints
+	updated_at = models.DateTimeField(auto_now=True)
+	# Weekly free time as a 336-bit slot bitmap (see availability.py), derived from
+	# AvailabilityWindow rows and CheckIn history
+	availability_mask = models.BinaryField(default=b"", blank=True)
+	# Glicko-2 rating from recorded MatchResults (see rating.py), kept on the Glicko-1 scale
+	rating = models.FloatField(default=1500.0)
+	rating_deviation = models.FloatField(default=350.0)
+	rating_volatility = models.FloatField(default=0.06)
+	rated_matches = models.PositiveIntegerField(default=0)
+	last_rated_at = models.DateTimeField(null=True, blank=True)
+
+	@property
+	def availability_bits(self) -> int:
+		return int.from_bytes(self.availability_mask or b"", "big")
+
 	def __str__(self):
 		return f"Profile({self.user.username})"
 
@@ -50,6 +70,7 @@ class CheckIn(models.Model):
 	end_time = models.TimeField(null=True, blank=True)
 	duration_minutes = models.PositiveIntegerField(default=0)  # Duration in minutes
 	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		unique_together = ('user', 'date')
@@ -63,33 +84,390 @@ class CheckIn(models.Model):
 		return f"CheckIn(user={self.user.username}, date={self.date})"
 
 
-# Simple friend relationship (unidirectional: user -> friend)
-class Friend(models.Model):
-	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="friends")
-	friend = models.ForeignKey(User, on_delete=models.CASCADE, related_name="friended_by")
+# Recurring weekly time window a player declares as free to play
+class AvailabilityWindow(models.Model):
+	WEEKDAY_CHOICES = (
+		(0, "Monday"),
+		(1, "Tuesday"),
+		(2, "Wednesday"),
+		(3, "Thursday"),
+		(4, "Friday"),
+		(5, "Saturday"),
+		(6, "Sunday"),
+	)
+
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="availability_windows")
+	weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+	start_time = models.TimeField()
+	end_time = models.TimeField()
+
+	class Meta:
+		ordering = ["weekday", "start_time"]
+
+	def __str__(self):
+		return f"AvailabilityWindow(user={self.user_id}, {self.weekday} {self.start_time}-{self.end_time})"
+
+
+# Per-user monthly check-in totals behind /checkins/range/?summary=1, maintained in the background (see tasks.refresh_checkin_rollup)
+class CheckInMonthlyRollup(models.Model):
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="checkin_rollups")
+	month = models.DateField()  # first day of the month
+	sessions = models.PositiveIntegerField(default=0)
+	total_minutes = models.PositiveIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		unique_together = ("user", "month")
+		ordering = ["-month"]
+
+	def __str__(self):
+		return f"CheckInMonthlyRollup(user={self.user_id}, month={self.month:%Y-%m})"
+
+
+class FriendRequest(models.Model):
+	STATUS_PENDING = "pending"
+	STATUS_ACCEPTED = "accepted"
+	STATUS_DECLINED = "declined"
+	STATUS_CHOICES = (
+		(STATUS_PENDING, "Pending"),
+		(STATUS_ACCEPTED, "Accepted"),
+		(STATUS_DECLINED, "Declined"),
+	)
+
+	from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="friend_requests_sent")
+	to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="friend_requests_received")
+	status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_PENDING)
+	created_at = models.DateTimeField(auto_now_add=True)
+	responded_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		unique_together = ("from_user", "to_user")
+		ordering = ["-created_at"]
+		indexes = [models.Index(fields=["to_user", "status"])]
+
+	def __str__(self):
+		return f"FriendRequest({self.from_user_id} -> {self.to_user_id}, {self.status})"
+
+
+class Friendship(models.Model):
+	"""
+	An accepted, undirected friendship stored once per pair.
+	Like ChatThread we normalize user1_id < user2_id, so "are A and B friends"
+	is a single unique-index lookup and a user's friends are one OR query over
+	the (user1, user2) and (user2, user1) indexes.
+	"""
+	user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="friendships_as_user1")
+	user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="friendships_as_user2")
 	created_at = models.DateTimeField(auto_now_add=True)
 
 	class Meta:
-		unique_together = ("user", "friend")
+		unique_together = ("user1", "user2")
 		ordering = ["-created_at"]
+		indexes = [models.Index(fields=["user2", "user1"])]
+
+	def save(self, *args, **kwargs):
+		# Ensure user1_id < user2_id for uniqueness
+		if self.user1_id and self.user2_id and self.user1_id > self.user2_id:
+			self.user1, self.user2 = self.user2, self.user1
+		super().save(*args, **kwargs)
+
+	@staticmethod
+	def pair(a_id, b_id):
+		return (a_id, b_id) if a_id < b_id else (b_id, a_id)
+
+	@classmethod
+	def between(cls, a_id, b_id):
+		u1, u2 = cls.pair(a_id, b_id)
+		return cls.objects.filter(user1_id=u1, user2_id=u2)
+
+	@classmethod
+	def friend_ids(cls, user_id):
+		"""Flat values queryset of user_id's friends' ids."""
+		return (
+			cls.objects.filter(models.Q(user1_id=user_id) | models.Q(user2_id=user_id))
+			.annotate(other_id=models.Case(models.When(user1_id=user_id, then=models.F("user2_id")), default=models.F("user1_id")))
+			.values_list("other_id", flat=True)
+			.order_by()
+		)
+
+	def other(self, user_id):
+		return self.user2 if self.user1_id == user_id else self.user1
+
+	def __str__(self):
+		return f"Friendship({self.user1_id}, {self.user2_id})"
+
+
+class Court(models.Model):
+	SURFACE_CHOICES = (
+		("hard", "Hard"),
+		("clay", "Clay"),
+		("grass", "Grass"),
+	)
+
+	name = models.CharField(max_length=128)
+	location = models.CharField(max_length=128, blank=True, default="")
+	surface = models.CharField(max_length=5, choices=SURFACE_CHOICES, blank=True, default="hard")
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ["name"]
+
+	def __str__(self):
+		return f"Court({self.name})"
+
+
+class Session(models.Model):
+	"""
+	A proposed or booked game on a court.
+	Overlapping non-cancelled sessions on the same court are refused; the check
+	runs while holding a row lock on the Court (Court.objects.select_for_update()
+	in views.SessionListCreateView.post).
+	"""
+	STATUS_PROPOSED = "proposed"
+	STATUS_ACCEPTED = "accepted"
+	STATUS_CANCELLED = "cancelled"
+	STATUS_CHOICES = (
+		(STATUS_PROPOSED, "Proposed"),
+		(STATUS_ACCEPTED, "Accepted"),
+		(STATUS_CANCELLED, "Cancelled"),
+	)
+
+	# Bounds the interval scans: anything overlapping [start, end) starts after start - MAX_LENGTH
+	MAX_LENGTH = timedelta(hours=8)
+
+	court = models.ForeignKey(Court, on_delete=models.CASCADE, related_name="sessions")
+	organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="organized_sessions")
+	start_at = models.DateTimeField()
+	end_at = models.DateTimeField()
+	status = models.CharField(max_length=9, choices=STATUS_CHOICES, default=STATUS_PROPOSED)
+	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ["start_at"]
+		indexes = [models.Index(fields=["court", "start_at", "end_at"])]
+
+	def __str__(self):
+		return f"Session(court={self.court_id}, {self.start_at:%Y-%m-%d %H:%M}, {self.status})"
+
+
+class SessionParticipant(models.Model):
+	"""
+	A player's seat in a Session. start_at/end_at/active mirror the session so
+	per-player conflict checks are a single indexed range query on this table.
+	"""
+	STATUS_INVITED = "invited"
+	STATUS_ACCEPTED = "accepted"
+	STATUS_DECLINED = "declined"
+	STATUS_CHOICES = (
+		(STATUS_INVITED, "Invited"),
+		(STATUS_ACCEPTED, "Accepted"),
+		(STATUS_DECLINED, "Declined"),
+	)
+
+	session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="participants")
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="session_participations")
+	status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_INVITED)
+	start_at = models.DateTimeField()
+	end_at = models.DateTimeField()
+	active = models.BooleanField(default=True)  # False once the session is cancelled
+	# CheckIn created for this player when the session was accepted (removed again on cancel)
+	checkin = models.ForeignKey(CheckIn, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+	class Meta:
+		unique_together = ("session", "user")
+		indexes = [models.Index(fields=["user", "active", "start_at"])]
+
+	def __str__(self):
+		return f"SessionParticipant(session={self.session_id}, user={self.user_id}, {self.status})"
+
+
+class MatchResult(models.Model):
+	"""
+	A finished singles match, reported by one player. It only counts (and is
+	rated, in played_at order) once the other player confirms it; a disputed
+	result is kept for the record but never rated.
+	"""
+	STATUS_PENDING = "pending"
+	STATUS_CONFIRMED = "confirmed"
+	STATUS_DISPUTED = "disputed"
+	STATUS_CHOICES = (
+		(STATUS_PENDING, "Pending"),
+		(STATUS_CONFIRMED, "Confirmed"),
+		(STATUS_DISPUTED, "Disputed"),
+	)
+
+	winner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="match_wins")
+	loser = models.ForeignKey(User, on_delete=models.CASCADE, related_name="match_losses")
+	played_at = models.DateTimeField()
+	score = models.CharField(max_length=64, blank=True, default="")  # e.g. "6-4 3-6 10-8"
+	session = models.OneToOneField(Session, on_delete=models.SET_NULL, null=True, blank=True, related_name="result")
+	reported_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="+")
+	status = models.CharField(max_length=9, choices=STATUS_CHOICES, default=STATUS_PENDING)
+	confirmed_at = models.DateTimeField(null=True, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	@property
+	def confirmer_id(self):
+		"""The player whose confirmation the result waits for."""
+		return self.loser_id if self.reported_by_id == self.winner_id else self.winner_id
+
+	class Meta:
+		ordering = ["-played_at"]
+		indexes = [models.Index(fields=["played_at", "id"])]
+
+	def __str__(self):
+		return f"MatchResult({self.winner_id} beat {self.loser_id}, {self.played_at:%Y-%m-%d})"
+
+
+class League(models.Model):
+	"""
+	A group of players with fixtures and standings. Round-robin leagues get all
+	their rounds at once; Swiss leagues (ladders) get one round at a time, each
+	pairing players on similar points who have not met yet (see leagues.py).
+	"""
+	FORMAT_ROUND_ROBIN = "round_robin"
+	FORMAT_SWISS = "swiss"
+	FORMAT_CHOICES = (
+		(FORMAT_ROUND_ROBIN, "Round robin"),
+		(FORMAT_SWISS, "Swiss"),
+	)
+
+	name = models.CharField(max_length=128)
+	format = models.CharField(max_length=11, choices=FORMAT_CHOICES, default=FORMAT_ROUND_ROBIN)
+	organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="organized_leagues")
+	starts_on = models.DateField()
+	round_days = models.PositiveSmallIntegerField(default=7)  # each round is played within this many days
+	points_win = models.PositiveSmallIntegerField(default=3)
+	points_loss = models.PositiveSmallIntegerField(default=0)
+	rounds_generated = models.PositiveIntegerField(default=0)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ["-starts_on", "id"]
+
+	def __str__(self):
+		return f"League({self.name}, {self.format})"
+
+
+class LeagueMember(models.Model):
+	"""
+	A player in a League and their standings row. Players the organizer lists
+	are invited and only take part (get fixtures, appear in the table) once
+	they accept. The counters are bumped with F() updates as each confirmed
+	fixture result (or bye) comes in, so reading the table never walks the
+	fixtures.
+	"""
+	STATUS_INVITED = "invited"
+	STATUS_ACCEPTED = "accepted"
+	STATUS_DECLINED = "declined"
+	STATUS_CHOICES = (
+		(STATUS_INVITED, "Invited"),
+		(STATUS_ACCEPTED, "Accepted"),
+		(STATUS_DECLINED, "Declined"),
+	)
+
+	league = models.ForeignKey(League, on_delete=models.CASCADE, related_name="members")
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="league_memberships")
+	status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_INVITED)
+	played = models.PositiveIntegerField(default=0)
+	won = models.PositiveIntegerField(default=0)
+	lost = models.PositiveIntegerField(default=0)
+	byes = models.PositiveIntegerField(default=0)
+	points = models.PositiveIntegerField(default=0)
+	joined_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		unique_together = ("league", "user")
+		indexes = [models.Index(fields=["league", "-points", "-won"])]
+
+	def __str__(self):
+		return f"LeagueMember(league={self.league_id}, user={self.user_id}, {self.status}, points={self.points})"
+
+
+class Fixture(models.Model):
+	"""
+	One scheduled league match. player2 is empty for a bye. starts_at is the
+	suggested start from both players' availability (empty when they share no
+	free slot in the round). A reported result is attached while it awaits the
+	opponent's confirmation; the fixture is played, and the CheckIns created,
+	once it is confirmed.
+	"""
+	STATUS_SCHEDULED = "scheduled"
+	STATUS_PLAYED = "played"
+	STATUS_BYE = "bye"
+	STATUS_CHOICES = (
+		(STATUS_SCHEDULED, "Scheduled"),
+		(STATUS_PLAYED, "Played"),
+		(STATUS_BYE, "Bye"),
+	)
+
+	league = models.ForeignKey(League, on_delete=models.CASCADE, related_name="fixtures")
+	round = models.PositiveIntegerField()
+	player1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+	player2 = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+	due_on = models.DateField()  # last day of the round
+	starts_at = models.DateTimeField(null=True, blank=True)
+	status = models.CharField(max_length=9, choices=STATUS_CHOICES, default=STATUS_SCHEDULED)
+	result = models.OneToOneField(MatchResult, on_delete=models.SET_NULL, null=True, blank=True, related_name="fixture")
+	player1_checkin = models.ForeignKey(CheckIn, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+	player2_checkin = models.ForeignKey(CheckIn, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+	class Meta:
+		ordering = ["round", "id"]
+		indexes = [
+			models.Index(fields=["league", "round"]),
+			models.Index(fields=["player1", "status"]),
+			models.Index(fields=["player2", "status"]),
+		]
 
 	def __str__(self):
-		return f"Friend(user={self.user.username}, friend={self.friend.username})"
+		return f"Fixture(league={self.league_id}, round={self.round}, {self.player1_id} v {self.player2_id})"
 
 
 class ChatThread(models.Model):
 	"""
-	A chat thread between exactly two users.
-	We normalize user1_id < user2_id to enforce uniqueness.
+	A conversation. Direct threads are between exactly two users, stored in
+	user1/user2 with user1_id < user2_id so the pair is unique and lookups and
+	access checks need no membership query. Group and channel threads leave
+	user1/user2 empty and are defined by their ChatMember rows; in channels
+	only admins post. Every thread kind has ChatMember rows (for listings and
+	read cursors).
+
+	Threads and memberships always live in the default database and act as
+	the chat directory; ``shard`` names the database holding the thread's
+	ChatMessage rows when chat storage is sharded (see sharding.py).
 	"""
-	user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_threads_as_user1")
-	user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_threads_as_user2")
+	KIND_DIRECT = "direct"
+	KIND_GROUP = "group"
+	KIND_CHANNEL = "channel"
+	KIND_CHOICES = (
+		(KIND_DIRECT, "Direct"),
+		(KIND_GROUP, "Group"),
+		(KIND_CHANNEL, "Broadcast channel"),
+	)
+
+	kind = models.CharField(max_length=7, choices=KIND_CHOICES, default=KIND_DIRECT)
+	title = models.CharField(max_length=100, blank=True, default="")
+	user1 = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="chat_threads_as_user1")
+	user2 = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="chat_threads_as_user2")
+	created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+	# Id of the newest message; drives unread counts and thread-list ETags without scanning messages
+	last_message_id = models.BigIntegerField(default=0)
+	# Messages with id <= this have been moved into ChatArchive blobs (see archive.py)
+	archived_through_id = models.BigIntegerField(default=0)
+	# Database alias holding this thread's messages; "" for the default database
+	shard = models.CharField(max_length=32, blank=True, default="")
 	created_at = models.DateTimeField(auto_now_add=True)
 
 	class Meta:
 		unique_together = ("user1", "user2")
 		ordering = ["-created_at"]
 
+	@property
+	def is_direct(self) -> bool:
+		return self.kind == self.KIND_DIRECT
+
 	def save(self, *args, **kwargs):
 		# Ensure user1_id < user2_id for uniqueness
 		if self.user1_id and self.user2_id and self.user1_id > self.user2_id:
@@ -97,17 +475,135 @@ class ChatThread(models.Model):
 		super().save(*args, **kwargs)
 
 	def __str__(self):
-		return f"ChatThread({self.user1.username}, {self.user2.username})"
+		if self.is_direct:
+			return f"ChatThread({self.user1_id}, {self.user2_id})"
+		return f"ChatThread({self.kind}: {self.title})"
+
+
+class ChatMember(models.Model):
+	"""A user's membership in a ChatThread, with their read cursor."""
+	ROLE_MEMBER = "member"
+	ROLE_ADMIN = "admin"
+	ROLE_CHOICES = (
+		(ROLE_MEMBER, "Member"),
+		(ROLE_ADMIN, "Admin"),
+	)
+
+	thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name="members")
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_memberships")
+	role = models.CharField(max_length=6, choices=ROLE_CHOICES, default=ROLE_MEMBER)
+	# Highest message id this member has read; unread = messages with a larger id
+	last_read_message_id = models.BigIntegerField(default=0)
+	joined_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		unique_together = ("thread", "user")
+		indexes = [models.Index(fields=["user", "thread"])]
+
+	def __str__(self):
+		return f"ChatMember(thread={self.thread_id}, user={self.user_id}, {self.role})"
 
 
 class ChatMessage(models.Model):
-	thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name="messages")
-	sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_messages")
+	# No database constraints: on a chat shard the thread and sender rows live in the default database
+	thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name="messages", db_constraint=False)
+	sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_messages", db_constraint=False)
 	content = models.TextField()
 	created_at = models.DateTimeField(auto_now_add=True)
 
 	class Meta:
 		ordering = ["created_at"]
+		# Lets the retention job find messages past the cutoff without a table scan
+		indexes = [models.Index(fields=["created_at"])]
 
 	def __str__(self):
 		return f"Msg(t={self.thread_id}, from={self.sender.username})"
+
+
+class ChatArchive(models.Model):
+	"""
+	A compressed NDJSON blob holding a contiguous id range of one thread's
+	messages, moved out of ChatMessage by the retention job.
+	"""
+	CODEC_GZIP = "gzip"
+	CODEC_ZSTD = "zstd"
+	CODEC_CHOICES = (
+		(CODEC_GZIP, "gzip"),
+		(CODEC_ZSTD, "zstd"),
+	)
+
+	thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name="archives")
+	first_message_id = models.BigIntegerField()
+	last_message_id = models.BigIntegerField()
+	first_created_at = models.DateTimeField()
+	last_created_at = models.DateTimeField()
+	message_count = models.PositiveIntegerField()
+	codec = models.CharField(max_length=4, choices=CODEC_CHOICES, default=CODEC_GZIP)
+	data = models.BinaryField()
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		ordering = ["thread", "first_message_id"]
+		indexes = [models.Index(fields=["thread", "last_message_id"])]
+
+	def __str__(self):
+		return f"ChatArchive(t={self.thread_id}, {self.first_message_id}-{self.last_message_id})"
+
+
+class ChatIdSequence(models.Model):
+	"""
+	Single-row counter handing out ChatMessage ids while chat storage is
+	sharded, so ids stay unique across shards and threads can move between them.
+	"""
+	value = models.BigIntegerField(default=0)
+
+	def __str__(self):
+		return f"ChatIdSequence({self.value})"
+
+
+class ChangeEvent(models.Model):
+	"""
+	Change log tailed by every worker's invalidation bus (see invalidation.py).
+	Rows are short-lived; old ones are pruned by the tailing workers.
+	"""
+	topic = models.CharField(max_length=32)
+	key = models.CharField(max_length=64)
+	created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+	def __str__(self):
+		return f"ChangeEvent({self.topic}:{self.key})"
+
+
+class Task(models.Model):
+	"""
+	A queued background job for the database task backend (see taskqueue.py).
+	"""
+	STATUS_QUEUED = "queued"
+	STATUS_RUNNING = "running"
+	STATUS_DONE = "done"
+	STATUS_FAILED = "failed"
+	STATUS_CHOICES = (
+		(STATUS_QUEUED, "Queued"),
+		(STATUS_RUNNING, "Running"),
+		(STATUS_DONE, "Done"),
+		(STATUS_FAILED, "Failed"),
+	)
+
+	name = models.CharField(max_length=200)
+	args = models.JSONField(default=list, blank=True)
+	kwargs = models.JSONField(default=dict, blank=True)
+	status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+	attempts = models.PositiveSmallIntegerField(default=0)
+	max_retries = models.PositiveSmallIntegerField(default=3)
+	run_at = models.DateTimeField()
+	locked_at = models.DateTimeField(null=True, blank=True)
+	last_error = models.TextField(blank=True, default="")
+	created_at = models.DateTimeField(auto_now_add=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ["run_at"]
+		indexes = [models.Index(fields=["status", "run_at"])]
+
+	def __str__(self):
+		return f"Task({self.name}, {self.status})"
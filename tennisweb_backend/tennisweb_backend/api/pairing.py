@@ -0,0 +1,448 @@
+"""
+Pairings for a whole event at once (EventPairingView).
+
+``max_weight_matching`` is Edmonds' blossom algorithm with the primal-dual
+weight updates of Galil ("Efficient algorithms for finding maximum matching
+in graphs", 1986): out of all matchings with the most pairs it returns one
+of maximum total weight, in O(n^3). Weights must be integers; callers scale
+scores. ``singles`` applies it to the players; ``doubles`` applies it twice
+(partners, then teams onto courts) and balances each court by skill.
+"""
+
+from itertools import combinations
+
+
+def max_weight_matching(n, edges, perfect=False):
+    """Maximum-cardinality, maximum-weight matching of vertices 0..n-1.
+
+    ``edges`` are (i, j, weight) with integer weights. Returns ``mate``, a list
+    where mate[v] is v's partner or -1.
+
+    With ``perfect`` (the caller knows a perfect matching exists), the duals
+    and a first matching come from a greedy pass instead of starting every
+    dual at the maximum weight, which skips most of the stages. This is only
+    sound when the result is a perfect matching.
+    """
+    if not edges:
+        return [-1] * n
+    nedge = len(edges)
+    maxweight = max(0, max(w for _, _, w in edges))
+    # Endpoint p of edge p // 2; p ^ 1 is the other end
+    endpoint = [edges[p >> 1][p & 1] for p in range(2 * nedge)]
+    neighbend = [[] for _ in range(n)]
+    for k, (i, j, _) in enumerate(edges):
+        neighbend[i].append(2 * k + 1)
+        neighbend[j].append(2 * k)
+
+    mate = [-1] * n  # remote endpoint of the matched edge, during the run
+    # Labels: 0 free, 1 S (outer), 2 T (inner); bit 4 marks blossoms during scanBlossom
+    label = [0] * (2 * n)
+    labelend = [-1] * (2 * n)
+    inblossom = list(range(n))
+    blossomparent = [-1] * (2 * n)
+    blossomchilds = [None] * (2 * n)
+    blossombase = list(range(n)) + [-1] * n
+    blossomendps = [None] * (2 * n)
+    bestedge = [-1] * (2 * n)
+    blossombestedges = [None] * (2 * n)
+    unusedblossoms = list(range(n, 2 * n))
+    dualvar = [maxweight] * n + [0] * n
+    if perfect:
+        heaviest = [None] * n
+        for i, j, w in edges:
+            if heaviest[i] is None or w > heaviest[i]:
+                heaviest[i] = w
+            if heaviest[j] is None or w > heaviest[j]:
+                heaviest[j] = w
+        # Doubled (with weight2 below), so every dual is even and S-S slacks halve exactly
+        dualvar[:n] = [2 * h for h in heaviest]
+    allowedge = [False] * nedge
+    queue = []
+
+    # Flat copies for the hot loops: slack(k) is dualvar[edge_i[k]] + dualvar[edge_j[k]] - weight2[k]
+    edge_i = [i for i, _, _ in edges]
+    edge_j = [j for _, j, _ in edges]
+    weight2 = [(4 if perfect else 2) * w for _, _, w in edges]
+
+    def slack(k):
+        return dualvar[edge_i[k]] + dualvar[edge_j[k]] - weight2[k]
+
+    if perfect:
+        # Greedy start: lower each free vertex's dual until an edge goes tight, and take that
+        # edge if its other end is free too (duals stay feasible and even)
+        for v in range(n):
+            if mate[v] != -1:
+                continue
+            dualvar[v] = max(weight2[p >> 1] - dualvar[endpoint[p]] for p in neighbend[v])
+            for p in neighbend[v]:
+                w = endpoint[p]
+                if mate[w] == -1 and w != v and slack(p >> 1) == 0:
+                    mate[v], mate[w] = p, p ^ 1
+                    break
+
+    def blossom_leaves(b):
+        if b < n:
+            yield b
+        else:
+            for t in blossomchilds[b]:
+                if t < n:
+                    yield t
+                else:
+                    yield from blossom_leaves(t)
+
+    def assign_label(w, t, p):
+        b = inblossom[w]
+        label[w] = label[b] = t
+        labelend[w] = labelend[b] = p
+        bestedge[w] = bestedge[b] = -1
+        if t == 1:
+            queue.extend(blossom_leaves(b))
+        else:
+            base = blossombase[b]
+            assign_label(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    def scan_blossom(v, w):
+        """Base of the blossom closed by edge v-w, or -1 if it joins two trees (an augmenting path)."""
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inblossom[v]
+            if label[b] & 4:
+                base = blossombase[b]
+                break
+            path.append(b)
+            label[b] = 5
+            if labelend[b] == -1:
+                v = -1
+            else:
+                v = endpoint[labelend[b]]
+                b = inblossom[v]
+                v = endpoint[labelend[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    def add_blossom(base, k):
+        v, w, _ = edges[k]
+        bb = inblossom[base]
+        bv = inblossom[v]
+        bw = inblossom[w]
+        b = unusedblossoms.pop()
+        blossombase[b] = base
+        blossomparent[b] = -1
+        blossomparent[bb] = b
+        blossomchilds[b] = path = []
+        blossomendps[b] = endps = []
+        while bv != bb:
+            blossomparent[bv] = b
+            path.append(bv)
+            endps.append(labelend[bv])
+            v = endpoint[labelend[bv]]
+            bv = inblossom[v]
+        path.append(bb)
+        path.reverse()
+        endps.reverse()
+        endps.append(2 * k)
+        while bw != bb:
+            blossomparent[bw] = b
+            path.append(bw)
+            endps.append(labelend[bw] ^ 1)
+            w = endpoint[labelend[bw]]
+            bw = inblossom[w]
+        label[b] = 1
+        labelend[b] = labelend[bb]
+        dualvar[b] = 0
+        for v in blossom_leaves(b):
+            if label[inblossom[v]] == 2:
+                # Former T-vertices become S-vertices and get scanned
+                queue.append(v)
+            inblossom[v] = b
+        bestedgeto = [-1] * (2 * n)
+        for bv in path:
+            if blossombestedges[bv] is None:
+                nblists = [[p >> 1 for p in neighbend[v]] for v in blossom_leaves(bv)]
+            else:
+                nblists = [blossombestedges[bv]]
+            for nblist in nblists:
+                for k in nblist:
+                    i, j, _ = edges[k]
+                    if inblossom[j] == b:
+                        i, j = j, i
+                    bj = inblossom[j]
+                    if bj != b and label[bj] == 1 and (bestedgeto[bj] == -1 or slack(k) < slack(bestedgeto[bj])):
+                        bestedgeto[bj] = k
+            blossombestedges[bv] = None
+            bestedge[bv] = -1
+        blossombestedges[b] = [k for k in bestedgeto if k != -1]
+        bestedge[b] = -1
+        for k in blossombestedges[b]:
+            if bestedge[b] == -1 or slack(k) < slack(bestedge[b]):
+                bestedge[b] = k
+
+    def expand_blossom(b, endstage):
+        for s in blossomchilds[b]:
+            blossomparent[s] = -1
+            if s < n:
+                inblossom[s] = s
+            elif endstage and dualvar[s] == 0:
+                expand_blossom(s, endstage)
+            else:
+                for v in blossom_leaves(s):
+                    inblossom[v] = s
+        if not endstage and label[b] == 2:
+            # Relabel the sub-blossoms on the even-length path from the entry child to the base
+            entrychild = inblossom[endpoint[labelend[b] ^ 1]]
+            j = blossomchilds[b].index(entrychild)
+            if j & 1:
+                j -= len(blossomchilds[b])
+                jstep, endptrick = 1, 0
+            else:
+                jstep, endptrick = -1, 1
+            p = labelend[b]
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomendps[b][j - endptrick] ^ endptrick ^ 1]] = 0
+                assign_label(endpoint[p ^ 1], 2, p)
+                allowedge[blossomendps[b][j - endptrick] >> 1] = True
+                j += jstep
+                p = blossomendps[b][j - endptrick] ^ endptrick
+                allowedge[p >> 1] = True
+                j += jstep
+            bv = blossomchilds[b][j]
+            label[endpoint[p ^ 1]] = label[bv] = 2
+            labelend[endpoint[p ^ 1]] = labelend[bv] = p
+            bestedge[bv] = -1
+            j += jstep
+            while blossomchilds[b][j] != entrychild:
+                bv = blossomchilds[b][j]
+                if label[bv] == 1:
+                    j += jstep
+                    continue
+                for v in blossom_leaves(bv):
+                    if label[v] != 0:
+                        break
+                if label[v] != 0:
+                    label[v] = 0
+                    label[endpoint[mate[blossombase[bv]]]] = 0
+                    assign_label(v, 2, labelend[v])
+                j += jstep
+        label[b] = labelend[b] = -1
+        blossomchilds[b] = blossomendps[b] = None
+        blossombase[b] = -1
+        blossombestedges[b] = None
+        bestedge[b] = -1
+        unusedblossoms.append(b)
+
+    def augment_blossom(b, v):
+        """Rotate blossom ``b`` so that vertex ``v`` becomes its base, swapping matched edges on the way."""
+        t = v
+        while blossomparent[t] != b:
+            t = blossomparent[t]
+        if t >= n:
+            augment_blossom(t, v)
+        i = j = blossomchilds[b].index(t)
+        if i & 1:
+            j -= len(blossomchilds[b])
+            jstep, endptrick = 1, 0
+        else:
+            jstep, endptrick = -1, 1
+        while j != 0:
+            j += jstep
+            t = blossomchilds[b][j]
+            p = blossomendps[b][j - endptrick] ^ endptrick
+            if t >= n:
+                augment_blossom(t, endpoint[p])
+            j += jstep
+            t = blossomchilds[b][j]
+            if t >= n:
+                augment_blossom(t, endpoint[p ^ 1])
+            mate[endpoint[p]] = p ^ 1
+            mate[endpoint[p ^ 1]] = p
+        blossomchilds[b] = blossomchilds[b][i:] + blossomchilds[b][:i]
+        blossomendps[b] = blossomendps[b][i:] + blossomendps[b][:i]
+        blossombase[b] = blossombase[blossomchilds[b][0]]
+
+    def augment_matching(k):
+        v, w, _ = edges[k]
+        for s, p in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = inblossom[s]
+                if bs >= n:
+                    augment_blossom(bs, s)
+                mate[s] = p
+                if labelend[bs] == -1:
+                    break  # reached a free vertex: the root of this tree
+                t = endpoint[labelend[bs]]
+                bt = inblossom[t]
+                s = endpoint[labelend[bt]]
+                j = endpoint[labelend[bt] ^ 1]
+                if bt >= n:
+                    augment_blossom(bt, j)
+                mate[j] = labelend[bt]
+                p = labelend[bt] ^ 1
+
+    # One stage per augmentation
+    for _ in range(n):
+        label[:] = [0] * (2 * n)
+        bestedge[:] = [-1] * (2 * n)
+        blossombestedges[n:] = [None] * n
+        allowedge[:] = [False] * nedge
+        queue[:] = []
+        for v in range(n):
+            if mate[v] == -1 and label[inblossom[v]] == 0:
+                assign_label(v, 1, -1)
+
+        augmented = False
+        while True:
+            while queue and not augmented:
+                v = queue.pop()
+                dual_v = dualvar[v]
+                for p in neighbend[v]:
+                    k = p >> 1
+                    w = endpoint[p]
+                    if inblossom[v] == inblossom[w]:
+                        continue
+                    if not allowedge[k]:
+                        kslack = dual_v + dualvar[w] - weight2[k]
+                        if kslack <= 0:
+                            allowedge[k] = True
+                    if allowedge[k]:
+                        if label[inblossom[w]] == 0:
+                            assign_label(w, 2, p ^ 1)
+                        elif label[inblossom[w]] == 1:
+                            base = scan_blossom(v, w)
+                            if base >= 0:
+                                add_blossom(base, k)
+                            else:
+                                augment_matching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            label[w] = 2
+                            labelend[w] = p ^ 1
+                    elif label[inblossom[w]] == 1:
+                        b = inblossom[v]
+                        best = bestedge[b]
+                        if best == -1 or kslack < dualvar[edge_i[best]] + dualvar[edge_j[best]] - weight2[best]:
+                            bestedge[b] = k
+                    elif label[w] == 0:
+                        best = bestedge[w]
+                        if best == -1 or kslack < dualvar[edge_i[best]] + dualvar[edge_j[best]] - weight2[best]:
+                            bestedge[w] = k
+            if augmented:
+                break
+
+            # No tight edge left: change the duals by the largest step that keeps them feasible
+            deltatype = -1
+            delta = deltaedge = deltablossom = None
+            for v in range(n):
+                if label[inblossom[v]] == 0 and bestedge[v] != -1:
+                    d = slack(bestedge[v])
+                    if deltatype == -1 or d < delta:
+                        delta, deltatype, deltaedge = d, 2, bestedge[v]
+            for b in range(2 * n):
+                if blossomparent[b] == -1 and label[b] == 1 and bestedge[b] != -1:
+                    d = slack(bestedge[b]) // 2
+                    if deltatype == -1 or d < delta:
+                        delta, deltatype, deltaedge = d, 3, bestedge[b]
+            for b in range(n, 2 * n):
+                if blossombase[b] >= 0 and blossomparent[b] == -1 and label[b] == 2 and (deltatype == -1 or dualvar[b] < delta):
+                    delta, deltatype, deltablossom = dualvar[b], 4, b
+            if deltatype == -1:
+                # Maximum cardinality reached; a last dual step only tidies up
+                deltatype = 1
+                delta = max(0, min(dualvar[:n]))
+
+            for v in range(n):
+                if label[inblossom[v]] == 1:
+                    dualvar[v] -= delta
+                elif label[inblossom[v]] == 2:
+                    dualvar[v] += delta
+            for b in range(n, 2 * n):
+                if blossombase[b] >= 0 and blossomparent[b] == -1:
+                    if label[b] == 1:
+                        dualvar[b] += delta
+                    elif label[b] == 2:
+                        dualvar[b] -= delta
+
+            if deltatype == 1:
+                break
+            elif deltatype == 2:
+                allowedge[deltaedge] = True
+                i, j, _ = edges[deltaedge]
+                if label[inblossom[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif deltatype == 3:
+                allowedge[deltaedge] = True
+                i, j, _ = edges[deltaedge]
+                queue.append(i)
+            else:
+                expand_blossom(deltablossom, False)
+
+        if not augmented:
+            break
+        # End of stage: expand S-blossoms whose dual reached zero
+        for b in range(n, 2 * n):
+            if blossomparent[b] == -1 and blossombase[b] >= 0 and label[b] == 1 and dualvar[b] == 0:
+                expand_blossom(b, True)
+
+    return [endpoint[m] if m >= 0 else -1 for m in mate]
+
+
+def _pairs(mate):
+    return [(v, mate[v]) for v in range(len(mate)) if v < mate[v] < len(mate)]
+
+
+def _complete_edges(n, weight):
+    """Edges of the complete graph, weights shifted to >= 0 (which cannot change a maximum-cardinality optimum)."""
+    edges = [(i, j, weight(i, j)) for i, j in combinations(range(n), 2)]
+    low = min((w for _, _, w in edges), default=0)
+    if low < 0:
+        edges = [(i, j, w - low) for i, j, w in edges]
+    return edges
+
+
+def singles(n, weight):
+    """(pairs, byes) maximizing the summed ``weight(i, j)`` (an int) with everyone but at most one paired."""
+    edges = _complete_edges(n, weight)
+    if n % 2:
+        # A stand-in opponent makes the matching perfect; whoever draws it gets the bye
+        edges.extend((i, n, 0) for i in range(n))
+    mate = max_weight_matching(n + n % 2, edges, perfect=n > 1)[:n]
+    return _pairs(mate), [v for v in range(n) if mate[v] in (-1, n)]
+
+
+def doubles(n, weight, skill, balance_weight):
+    """(courts, byes): courts are ((a, b), (c, d)) team pairs.
+
+    Partners are chosen by ``weight`` (int), teams are put on courts by
+    ``weight`` across the net minus ``balance_weight`` per level of summed
+    ``skill`` difference, and finally each foursome is re-split into the two
+    teams with the closest summed skill (ties keep the better partnerships).
+    """
+    teams, byes = singles(n, weight)
+
+    def court_weight(a, b):
+        (p, q), (r, s) = teams[a], teams[b]
+        across = weight(p, r) + weight(p, s) + weight(q, r) + weight(q, s)
+        gap = abs(skill[p] + skill[q] - skill[r] - skill[s])
+        return across // 4 - round(balance_weight * gap)
+
+    court_pairs, idle_teams = singles(len(teams), court_weight)
+    for t in idle_teams:
+        byes.extend(teams[t])
+
+    courts = []
+    for a, b in court_pairs:
+        four = teams[a] + teams[b]
+        splits = []
+        for (p, q), (r, s) in (((0, 1), (2, 3)), ((0, 2), (1, 3)), ((0, 3), (1, 2))):
+            team1, team2 = (four[p], four[q]), (four[r], four[s])
+            gap = abs(skill[team1[0]] + skill[team1[1]] - skill[team2[0]] - skill[team2[1]])
+            splits.append((round(gap, 6), -(weight(*team1) + weight(*team2)), team1, team2))
+        _, _, team1, team2 = min(splits)
+        courts.append((team1, team2))
+    return courts, sorted(byes)
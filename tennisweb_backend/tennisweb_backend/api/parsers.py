@@ -0,0 +1,21 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from .renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser backed by orjson when it is installed (stdlib otherwise)."""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        raw = stream.read() if stream is not None else b""
+        if encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+            raw = raw.decode(encoding).encode("utf-8")
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
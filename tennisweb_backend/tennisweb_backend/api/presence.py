@@ -0,0 +1,156 @@
+"""
+Who is online, or on court, right now.
+
+Heartbeats come from chat activity (posting, long-polling a thread) and from
+POST /api/presence/ping/. Each one keeps a user "online" for PRESENCE_TTL
+seconds; a ping can also mark them "playing" until a given time, which an
+online heartbeat never overrides. Nothing touches the database: entries live
+in this process ("memory") or in a Django cache shared by every worker
+("cache"), per PRESENCE_STORE. A worker writes a user's heartbeat at most
+every PRESENCE_WRITE_INTERVAL seconds. With several workers only a shared
+store gives consistent answers (see ``is_shared``).
+
+``lookup(user_ids)`` serves a whole friend or candidate list in one step: a
+single pass over the in-memory table, or one ``get_many`` round trip.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import caches
+import heapq
+import math
+import threading
+import time
+
+ONLINE = "online"
+PLAYING = "playing"
+
+
+class MemoryPresenceStore:
+    """Expiring values plus a min-heap of expiry times, so lapsed entries are dropped in order
+    without scanning everyone. Heap items superseded by a later write are skipped when popped."""
+
+    def __init__(self):
+        self._values = {}  # key -> (expires_at, value)
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._values[key] = (now + ttl, value)
+            heapq.heappush(self._expiry, (now + ttl, key))
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, stale = heapq.heappop(self._expiry)
+                entry = self._values.get(stale)
+                if entry is not None and entry[0] == expires_at:
+                    del self._values[stale]
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = self._values
+        out = {}
+        for key in keys:
+            entry = values.get(key)
+            if entry is not None and entry[0] > now:
+                out[key] = entry[1]
+        return out
+
+
+class CachePresenceStore:
+    """Presence shared by every worker using the cache (the cache's own timeouts expire it)."""
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def set(self, key, value, ttl):
+        caches[self.alias].set(key, value, timeout=math.ceil(ttl))
+
+    def delete(self, key):
+        caches[self.alias].delete(key)
+
+    def get_many(self, keys):
+        return caches[self.alias].get_many(keys)
+
+
+# Cache backends that keep their entries inside one process
+_PER_PROCESS_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_shared() -> bool:
+    """Whether every worker process reads the same presence entries."""
+    if getattr(settings, "PRESENCE_STORE", "memory") != "cache":
+        return False
+    backend = settings.CACHES.get(getattr(settings, "PRESENCE_CACHE_ALIAS", "default"), {}).get("BACKEND", "")
+    return backend not in _PER_PROCESS_CACHES
+
+
+def _make_store():
+    if getattr(settings, "PRESENCE_STORE", "memory") == "cache":
+        return CachePresenceStore(getattr(settings, "PRESENCE_CACHE_ALIAS", "default"))
+    return MemoryPresenceStore()
+
+
+store = _make_store()
+# user id -> when this worker last wrote their heartbeat
+_written = {}
+
+
+def _seen_key(user_id):
+    return f"presence:seen:{user_id}"
+
+
+def _playing_key(user_id):
+    return f"presence:playing:{user_id}"
+
+
+def heartbeat(user_id, force=False):
+    """Mark ``user_id`` online; cheap enough to call on every chat request."""
+    user_id = int(user_id)
+    now = time.time()
+    if not force and now - _written.get(user_id, 0) < getattr(settings, "PRESENCE_WRITE_INTERVAL", 20):
+        return
+    if len(_written) > 10000:
+        _written.clear()
+    _written[user_id] = now
+    store.set(_seen_key(user_id), now, getattr(settings, "PRESENCE_TTL", 90))
+
+
+def set_playing(user_id, until: datetime):
+    heartbeat(user_id, force=True)
+    store.set(_playing_key(user_id), until.timestamp(), max(until.timestamp() - time.time(), 1))
+
+
+def clear(user_id, offline=False):
+    """End "playing"; with ``offline`` also drop the online heartbeat (e.g. on logout)."""
+    store.delete(_playing_key(user_id))
+    if offline:
+        store.delete(_seen_key(user_id))
+        _written.pop(int(user_id), None)
+
+
+def lookup(user_ids) -> dict:
+    """{user_id: {"status", "last_seen"[, "until"]}} for the users among ``user_ids`` who are online."""
+    user_ids = list(dict.fromkeys(int(uid) for uid in user_ids))
+    if not user_ids:
+        return {}
+    found = store.get_many([_seen_key(uid) for uid in user_ids] + [_playing_key(uid) for uid in user_ids])
+    out = {}
+    for uid in user_ids:
+        seen = found.get(_seen_key(uid))
+        playing = found.get(_playing_key(uid))
+        if seen is None and playing is None:
+            continue
+        entry = {"status": PLAYING if playing is not None else ONLINE}
+        entry["last_seen"] = datetime.fromtimestamp(seen, dt_timezone.utc).isoformat() if seen is not None else None
+        if playing is not None:
+            entry["until"] = datetime.fromtimestamp(playing, dt_timezone.utc).isoformat()
+        out[uid] = entry
+    return out
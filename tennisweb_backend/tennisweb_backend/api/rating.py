@@ -0,0 +1,133 @@
+"""
+Glicko-2 ratings from recorded match results.
+
+A MatchResult is rated once the player who did not report it confirms it,
+as a one-game rating period for both players; a player's deviation first
+grows with the number of RATING_PERIOD_DAYS they went without playing.
+Results confirmed out of played_at order are only placed correctly by
+``manage.py recompute_ratings``, which replays every confirmed result by
+played_at.
+
+Values are stored on Profile in the familiar Glicko-1 scale (1500 +/- 350)
+and converted to the Glicko-2 scale (mu, phi) for the update.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from .models import Profile
+import math
+
+SCALE = 173.7178
+BASE_RATING = 1500.0
+MAX_DEVIATION = 350.0
+DEFAULT_VOLATILITY = 0.06
+_EPSILON = 1e-6
+
+
+def _g(phi):
+    return 1.0 / math.sqrt(1.0 + 3.0 * phi * phi / (math.pi * math.pi))
+
+
+def inflate(rd, volatility, periods):
+    """Deviation after ``periods`` rating periods without games, capped at MAX_DEVIATION."""
+    if periods <= 0:
+        return rd
+    phi = rd / SCALE
+    return min(MAX_DEVIATION, SCALE * math.sqrt(phi * phi + volatility * volatility * periods))
+
+
+def update(rating, rd, volatility, opp_rating, opp_rd, score, tau=None):
+    """One Glicko-2 rating period with a single game; ``score`` is 1 for a win, 0 for a loss.
+
+    Returns the new (rating, rd, volatility).
+    """
+    tau = getattr(settings, "RATING_TAU", 0.5) if tau is None else tau
+    mu, phi = (rating - BASE_RATING) / SCALE, rd / SCALE
+    opp_mu, opp_phi = (opp_rating - BASE_RATING) / SCALE, opp_rd / SCALE
+
+    g = _g(opp_phi)
+    expected = 1.0 / (1.0 + math.exp(-g * (mu - opp_mu)))
+    v = 1.0 / (g * g * expected * (1.0 - expected))
+    delta = v * g * (score - expected)
+
+    # New volatility: root of f(x) by the Illinois variant of regula falsi (Glickman, step 5)
+    a = math.log(volatility * volatility)
+
+    def f(x):
+        ex = math.exp(x)
+        d = phi * phi + v + ex
+        return ex * (delta * delta - d) / (2.0 * d * d) - (x - a) / (tau * tau)
+
+    lo = a
+    if delta * delta > phi * phi + v:
+        hi = math.log(delta * delta - phi * phi - v)
+    else:
+        k = 1
+        while f(a - k * tau) < 0:
+            k += 1
+        hi = a - k * tau
+    f_lo, f_hi = f(lo), f(hi)
+    while abs(hi - lo) > _EPSILON:
+        mid = lo + (lo - hi) * f_lo / (f_hi - f_lo)
+        f_mid = f(mid)
+        if f_mid * f_hi <= 0:
+            lo, f_lo = hi, f_hi
+        else:
+            f_lo /= 2.0
+        hi, f_hi = mid, f_mid
+    new_volatility = math.exp(lo / 2.0)
+
+    phi_star = math.sqrt(phi * phi + new_volatility * new_volatility)
+    new_phi = 1.0 / math.sqrt(1.0 / (phi_star * phi_star) + 1.0 / v)
+    new_mu = mu + new_phi * new_phi * g * (score - expected)
+    return BASE_RATING + SCALE * new_mu, min(MAX_DEVIATION, SCALE * new_phi), new_volatility
+
+
+def idle_periods(last_played, played_at) -> float:
+    if last_played is None:
+        return 0.0
+    days = (played_at - last_played).total_seconds() / 86400.0
+    return max(0.0, days / getattr(settings, "RATING_PERIOD_DAYS", 30))
+
+
+def apply_result(winner, loser, played_at):
+    """Rate one game between two Glicko-1 states.
+
+    ``winner``/``loser`` are (rating, rd, volatility, last_played) tuples; returns
+    the two new (rating, rd, volatility) tuples. Shared by the incremental path
+    and the batch replay so both produce identical numbers.
+    """
+    w_rating, w_rd, w_vol, w_last = winner
+    l_rating, l_rd, l_vol, l_last = loser
+    w_rd = inflate(w_rd, w_vol, idle_periods(w_last, played_at))
+    l_rd = inflate(l_rd, l_vol, idle_periods(l_last, played_at))
+    return (
+        update(w_rating, w_rd, w_vol, l_rating, l_rd, 1.0),
+        update(l_rating, l_rd, l_vol, w_rating, w_rd, 0.0),
+    )
+
+
+def rate_result(result):
+    """Apply one MatchResult to both players' profiles."""
+    with transaction.atomic():
+        profiles = {
+            p.user_id: p
+            for p in Profile.objects.select_for_update().filter(user_id__in=[result.winner_id, result.loser_id])
+        }
+        for user_id in (result.winner_id, result.loser_id):
+            if user_id not in profiles:
+                profiles[user_id] = Profile.objects.create(user_id=user_id)
+        winner, loser = profiles[result.winner_id], profiles[result.loser_id]
+        new_states = apply_result(_state(winner), _state(loser), result.played_at)
+        for profile, (rating, rd, volatility) in zip((winner, loser), new_states):
+            profile.rating, profile.rating_deviation, profile.rating_volatility = rating, rd, volatility
+            profile.rated_matches += 1
+            if profile.last_rated_at is None or result.played_at > profile.last_rated_at:
+                profile.last_rated_at = result.played_at
+            profile.save(update_fields=[
+                "rating", "rating_deviation", "rating_volatility", "rated_matches", "last_rated_at", "updated_at",
+            ])
+
+
+def _state(profile):
+    return profile.rating, profile.rating_deviation, profile.rating_volatility, profile.last_rated_at
@@ -0,0 +1,39 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+_encoder = encoders.JSONEncoder()
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+_LINE_SEPARATORS = (b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson when it is installed.
+
+    Output matches DRF's compact, non-ASCII-escaped default. Types orjson
+    does not know natively (Decimal, lazy translation strings, querysets ...)
+    and dates and times go through DRF's own encoder, so UTC datetimes end in
+    "Z" as they do there. Data orjson refuses (integers beyond 64 bits, for
+    one), pretty-printing requests (``indent=``, browsable API) and
+    environments without orjson use the stdlib renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Keep output a strict JavaScript subset, like the stdlib renderer
+        if _LINE_SEPARATORS[0] in ret or _LINE_SEPARATORS[1] in ret:
+            ret = ret.replace(_LINE_SEPARATORS[0], b"\\u2028").replace(_LINE_SEPARATORS[1], b"\\u2029")
+        return ret
@@ -0,0 +1,207 @@
+"""
+Read-replica routing.
+
+``ReplicaRouter`` sends reads made while handling GET/HEAD/OPTIONS requests to
+one of the aliases in DATABASE_REPLICAS; everything else (writes, unsafe
+requests, management commands, tasks) uses the primary ("default").
+
+Replicas lag, so reads fall back to the primary when
+- the request has already written (``db_for_write`` was consulted) or is
+  inside ``transaction.atomic()``;
+- the authenticated user wrote in the last REPLICA_STICKY_SECONDS, so a chat
+  message or check-in shows up on the very next read. Sticky windows live in
+  this process ("memory") or a shared Django cache ("cache"), per
+  REPLICA_STICKY_STORE;
+- no replica is healthy. Each replica is probed at most every
+  REPLICA_HEALTH_INTERVAL seconds and skipped for REPLICA_RETRY_SECONDS after
+  a failed probe or a connection error during a request.
+
+One replica is picked per request (round robin) so its reads are consistent
+with each other.
+"""
+
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class _Route:
+    __slots__ = ("replica_ok", "user_id", "primary", "wrote", "alias")
+
+    def __init__(self, replica_ok):
+        self.replica_ok = replica_ok
+        self.user_id = None
+        self.primary = False
+        self.wrote = False
+        self.alias = None
+
+
+# Mutable per-request state; sync_to_async copies the context, so threads share the object
+_route = ContextVar("db_route", default=None)
+
+
+class MemoryStickyStore:
+    def __init__(self):
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def stick(self, user_id, seconds):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._until) > 10000:
+                self._until = {k: v for k, v in self._until.items() if v > now}
+            self._until[user_id] = now + seconds
+
+    def is_sticky(self, user_id):
+        return self._until.get(user_id, 0) > time.monotonic()
+
+
+class CacheStickyStore:
+    """Sticky windows shared by every worker using the cache, so the next request may land anywhere."""
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def stick(self, user_id, seconds):
+        caches[self.alias].set(f"db-sticky:{user_id}", 1, timeout=seconds)
+
+    def is_sticky(self, user_id):
+        return caches[self.alias].get(f"db-sticky:{user_id}") is not None
+
+
+class ReplicaHealth:
+    def __init__(self, aliases, interval=5.0, retry=30.0):
+        self.aliases = list(aliases)
+        self.interval = interval
+        self.retry = retry
+        self._checked_at = {}
+        self._down_until = {}
+        self._next = itertools.count()
+
+    def pick(self):
+        healthy = [alias for alias in self.aliases if self.healthy(alias)]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def healthy(self, alias) -> bool:
+        now = time.monotonic()
+        if self._down_until.get(alias, 0) > now:
+            return False
+        if now - self._checked_at.get(alias, -self.interval) < self.interval:
+            return True
+        self._checked_at[alias] = now
+        try:
+            with connections[alias].cursor() as cursor:
+                # A replica that lost its schema (or an empty SQLite file) fails here too
+                cursor.execute("SELECT 1 FROM django_migrations LIMIT 1")
+        except DatabaseError:
+            self.mark_down(alias)
+            return False
+        return True
+
+    def mark_down(self, alias):
+        logger.warning("Database replica %s is unavailable; reading from the primary", alias)
+        self._down_until[alias] = time.monotonic() + self.retry
+        try:
+            connections[alias].close()
+        except DatabaseError:
+            pass
+
+
+def _make_sticky_store():
+    if getattr(settings, "REPLICA_STICKY_STORE", "memory") == "cache":
+        return CacheStickyStore(getattr(settings, "REPLICA_STICKY_CACHE_ALIAS", "default"))
+    return MemoryStickyStore()
+
+
+sticky_store = _make_sticky_store()
+replica_health = ReplicaHealth(
+    getattr(settings, "DATABASE_REPLICAS", []),
+    interval=getattr(settings, "REPLICA_HEALTH_INTERVAL", 5.0),
+    retry=getattr(settings, "REPLICA_RETRY_SECONDS", 30.0),
+)
+
+
+def begin(method):
+    """Start routing one request; returns the token for ``end``."""
+    return _route.set(_Route(replica_ok=bool(replica_health.aliases) and method in SAFE_METHODS))
+
+
+def end(token):
+    state = _route.get()
+    _route.reset(token)
+    if state is not None and state.wrote and state.user_id is not None:
+        stick(state.user_id)
+
+
+def set_user(user_id):
+    """Called once the request's user is known; sticky users read from the primary."""
+    state = _route.get()
+    if state is None:
+        return
+    state.user_id = user_id = int(user_id)
+    if state.replica_ok and not state.primary and sticky_store.is_sticky(user_id):
+        state.primary = True
+
+
+def stick(user_id):
+    """Read ``user_id``'s requests from the primary for the next REPLICA_STICKY_SECONDS."""
+    sticky_store.stick(int(user_id), getattr(settings, "REPLICA_STICKY_SECONDS", 10))
+
+
+def reading_replica() -> bool:
+    state = _route.get()
+    return state is not None and state.alias not in (None, PRIMARY) and not (state.primary or state.wrote)
+
+
+def replica_failed():
+    """Take the request's replica out of rotation after a connection-level error."""
+    state = _route.get()
+    if state is not None and state.alias not in (None, PRIMARY):
+        replica_health.mark_down(state.alias)
+
+
+def read_alias():
+    state = _route.get()
+    if state is None or not state.replica_ok or state.primary or state.wrote:
+        return PRIMARY
+    if connections[PRIMARY].in_atomic_block:
+        return PRIMARY
+    if state.alias is None:
+        state.alias = replica_health.pick() or PRIMARY
+    return state.alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _route.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Chat shards hold messages whose threads and senders live in the primary (see sharding.py)
+        aliases = {PRIMARY, *replica_health.aliases, *getattr(settings, "CHAT_SHARDS", [])}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in replica_health.aliases:
+            return False
+        return None
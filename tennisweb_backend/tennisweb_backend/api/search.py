@@ -0,0 +1,116 @@
+"""
+Full-text search over chat messages.
+
+On SQLite the ``api_chatmessage_fts`` FTS5 table (migration 0016) indexes
+ChatMessage.content and is kept current by triggers, so messages written by
+ChatThreadMessagesView.post are searchable as soon as they commit. Matches
+are walked newest-first by rowid and stop at ``limit``, which keeps common
+terms as cheap as rare ones. Databases without the index fall back to
+``icontains`` filtering.
+
+With sharded chat storage each shard is searched with its own index and
+the per-shard pages are merged by message id.
+
+Highlights are returned as [start, end) character offsets into ``content``
+rather than markup, so clients never have to trust HTML from messages.
+"""
+
+from django.db import connections
+from .models import ChatThread, ChatMessage
+from .routing import PRIMARY
+from . import sharding
+import re
+
+FTS_TABLE = "api_chatmessage_fts"
+MAX_TERMS = 8
+_HL_START, _HL_END = "\x02", "\x03"
+_TERM_RE = re.compile(r"\w+")
+
+_fts_tables = {}
+
+
+def fts_available(alias="default") -> bool:
+    if alias not in _fts_tables:
+        connection = connections[alias]
+        _fts_tables[alias] = connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[alias]
+
+
+def terms(q: str):
+    return _TERM_RE.findall(q or "")[:MAX_TERMS]
+
+
+def fts_query(words) -> str:
+    """All words must match; the last one as a prefix so results follow the user's typing."""
+    parts = ['"%s"' % w for w in words]
+    parts[-1] += "*"
+    return " ".join(parts)
+
+
+def search_messages(user, q, limit=20, before=None):
+    """Messages in ``user``'s threads matching ``q``, newest first.
+
+    Returns [(ChatMessage, highlights)] with sender profiles loaded; pass the
+    last id back as ``before`` for the next page.
+    """
+    words = terms(q)
+    if not words:
+        return []
+    hits = []
+    for alias, thread_ids in sharding.threads_by_alias(ChatThread.objects.filter(members__user=user)).items():
+        find = _fts_hits if fts_available(alias) else _scan_hits
+        hits += [(mid, spans, alias) for mid, spans in find(words, thread_ids, limit, before, alias)]
+    # Message ids are unique across shards, so per-shard pages merge by id
+    hits = sorted(hits, key=lambda hit: hit[0], reverse=True)[:limit]
+    messages = {}
+    for alias in {alias for _, _, alias in hits}:
+        ids = [mid for mid, _, a in hits if a == alias]
+        if alias == PRIMARY:
+            messages.update(ChatMessage.objects.select_related("sender__profile").in_bulk(ids))
+        else:
+            messages.update((m.id, m) for m in sharding.attach_senders(list(ChatMessage.objects.using(alias).filter(id__in=ids))))
+    return [(messages[mid], spans) for mid, spans, _ in hits if mid in messages]
+
+
+def _fts_hits(words, thread_ids, limit, before, alias=PRIMARY):
+    sql = (
+        f"SELECT m.id, highlight({FTS_TABLE}, 0, %s, %s) FROM {FTS_TABLE} "
+        f"JOIN api_chatmessage m ON m.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s AND m.thread_id IN ({', '.join(['%s'] * len(thread_ids))})"
+    )
+    params = [_HL_START, _HL_END, fts_query(words), *thread_ids]
+    if before is not None:
+        sql += f" AND {FTS_TABLE}.rowid < %s"
+        params.append(before)
+    sql += f" ORDER BY {FTS_TABLE}.rowid DESC LIMIT %s"
+    params.append(limit)
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(mid, _spans(marked)) for mid, marked in cursor.fetchall()]
+
+
+def _spans(marked: str):
+    spans = []
+    offset = 0
+    start = None
+    for ch in marked:
+        if ch == _HL_START:
+            start = offset
+        elif ch == _HL_END:
+            spans.append([start, offset])
+        else:
+            offset += 1
+    return spans
+
+
+def _scan_hits(words, thread_ids, limit, before, alias=PRIMARY):
+    qs = ChatMessage.objects.using(alias).filter(thread_id__in=thread_ids)
+    for w in words:
+        qs = qs.filter(content__icontains=w)
+    if before is not None:
+        qs = qs.filter(id__lt=before)
+    pattern = re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE)
+    return [
+        (mid, [[m.start(), m.end()] for m in pattern.finditer(content)])
+        for mid, content in qs.order_by("-id").values_list("id", "content")[:limit]
+    ]
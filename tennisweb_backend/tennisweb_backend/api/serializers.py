@@ -1,6 +1,10 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
-from .models import Profile, CheckIn, Friend, ChatThread, ChatMessage
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .authentication import TOKEN_VERSION_CLAIM
+from .models import (
+    Profile, CheckIn, AvailabilityWindow, FriendRequest, Friendship, Court, Session, SessionParticipant, MatchResult, League, LeagueMember, Fixture, ChatThread, ChatMember, ChatMessage,
+)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -36,6 +40,17 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+class VersionedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Stamp issued tokens with the user's current token_version (copied to refreshed access tokens)."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        version = Profile.objects.filter(user=user).values_list("token_version", flat=True).first()
+        token[TOKEN_VERSION_CLAIM] = version or 0
+        return token
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField()
 
@@ -56,7 +71,11 @@ class ProfileSerializer(serializers.ModelSerializer):
             "preferred_match_types",
             "play_intentions",
             "preferred_languages",
+            "rating",
+            "rating_deviation",
+            "rated_matches",
         ]
+        read_only_fields = ["rating", "rating_deviation", "rated_matches"]
 
     def get_avatar_url(self, obj):
         request = self.context.get("request")
@@ -158,35 +177,223 @@ class CheckInSerializer(serializers.ModelSerializer):
         fields = ["date", "duration_minutes", "start_time", "end_time"]
 
 
-class FriendSerializer(serializers.ModelSerializer):
-    friend = UserBriefSerializer(read_only=True)
-    friend_id = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(), write_only=True, source="friend"
+class AvailabilityWindowSerializer(serializers.ModelSerializer):
+    start_time = serializers.TimeField(format="%H:%M")
+    end_time = serializers.TimeField(format="%H:%M")
+
+    class Meta:
+        model = AvailabilityWindow
+        fields = ["weekday", "start_time", "end_time"]
+
+    def validate(self, attrs):
+        if attrs["end_time"] <= attrs["start_time"]:
+            raise serializers.ValidationError("end_time must be after start_time (split windows that cross midnight)")
+        return attrs
+
+
+class FriendshipSerializer(serializers.ModelSerializer):
+    """Renders a Friendship from the requesting user's side as {id, friend, created_at}."""
+
+    friend = serializers.SerializerMethodField()
+    # From the view's one presence.lookup() for the whole list (null when offline)
+    presence = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Friendship
+        fields = ["id", "friend", "presence", "created_at"]
+
+    def _other(self, obj: Friendship):
+        request = self.context.get("request")
+        current_user: User | None = getattr(request, "user", None)
+        return obj.other(current_user.id if current_user else None)
+
+    def get_friend(self, obj: Friendship):
+        return UserBriefSerializer(self._other(obj), context=self.context).data
+
+    def get_presence(self, obj: Friendship):
+        return self.context.get("presence", {}).get(self._other(obj).id)
+
+
+class FriendRequestSerializer(serializers.ModelSerializer):
+    from_user = UserBriefSerializer(read_only=True)
+    to_user = UserBriefSerializer(read_only=True)
+    to_user_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(), write_only=True, source="to_user"
+    )
+
+    class Meta:
+        model = FriendRequest
+        fields = ["id", "from_user", "to_user", "to_user_id", "status", "created_at", "responded_at"]
+        read_only_fields = ["status", "responded_at"]
+
+
+class CourtSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Court
+        fields = ["id", "name", "location", "surface"]
+
+
+class SessionParticipantSerializer(serializers.ModelSerializer):
+    user = UserBriefSerializer(read_only=True)
+
+    class Meta:
+        model = SessionParticipant
+        fields = ["user", "status"]
+
+
+class SessionSerializer(serializers.ModelSerializer):
+    court = CourtSerializer(read_only=True)
+    court_id = serializers.PrimaryKeyRelatedField(queryset=Court.objects.all(), write_only=True, source="court")
+    organizer = UserBriefSerializer(read_only=True)
+    participants = SessionParticipantSerializer(many=True, read_only=True)
+    # Other players to invite; the organizer takes a seat automatically
+    participant_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, min_length=1, max_length=3)
+
+    class Meta:
+        model = Session
+        fields = [
+            "id", "court", "court_id", "organizer", "participants", "participant_ids",
+            "start_at", "end_at", "status", "created_at",
+        ]
+        read_only_fields = ["status"]
+
+    def validate(self, attrs):
+        start, end = attrs["start_at"], attrs["end_at"]
+        if end <= start:
+            raise serializers.ValidationError("end_at must be after start_at")
+        if end - start > Session.MAX_LENGTH:
+            raise serializers.ValidationError("Sessions can be at most 8 hours long")
+        return attrs
+
+    def validate_participant_ids(self, value):
+        ids = list(dict.fromkeys(value))
+        if User.objects.filter(id__in=ids).count() != len(ids):
+            raise serializers.ValidationError("Unknown user id")
+        return ids
+
+
+class MatchResultSerializer(serializers.ModelSerializer):
+    winner = UserBriefSerializer(read_only=True)
+    loser = UserBriefSerializer(read_only=True)
+    opponent_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), write_only=True, source="opponent")
+    won = serializers.BooleanField(write_only=True)
+    session_id = serializers.PrimaryKeyRelatedField(
+        queryset=Session.objects.all(), write_only=True, source="session", required=False, allow_null=True
     )
 
     class Meta:
-        model = Friend
-        fields = ["id", "friend", "friend_id", "created_at"]
+        model = MatchResult
+        fields = [
+            "id", "winner", "loser", "opponent_id", "won", "session_id", "played_at", "score",
+            "status", "reported_by", "confirmed_at", "created_at",
+        ]
+        read_only_fields = ["status", "reported_by", "confirmed_at"]
+        extra_kwargs = {"played_at": {"required": False}, "score": {"required": False}}
+
+
+class LeagueSerializer(serializers.ModelSerializer):
+    organizer = UserBriefSerializer(read_only=True)
+    # Players to invite; the organizer plays only when listed here too
+    member_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, min_length=2)
+    # The current user's invitation status (annotated by the views), null for an organizer who does not play
+    my_status = serializers.CharField(read_only=True, default=None)
+
+    class Meta:
+        model = League
+        fields = [
+            "id", "name", "format", "organizer", "member_ids", "starts_on", "round_days",
+            "points_win", "points_loss", "rounds_generated", "my_status", "created_at",
+        ]
+        read_only_fields = ["rounds_generated"]
+
+    def validate_round_days(self, value):
+        if not 1 <= value <= 28:
+            raise serializers.ValidationError("round_days must be between 1 and 28")
+        return value
+
+    def validate_member_ids(self, value):
+        ids = list(dict.fromkeys(value))
+        if len(ids) < 2:
+            raise serializers.ValidationError("A league needs at least two players")
+        if User.objects.filter(id__in=ids).count() != len(ids):
+            raise serializers.ValidationError("Unknown user id")
+        return ids
+
+
+class LeagueStandingSerializer(serializers.ModelSerializer):
+    user = UserBriefSerializer(read_only=True)
+
+    class Meta:
+        model = LeagueMember
+        fields = ["user", "played", "won", "lost", "byes", "points"]
+
+
+class FixtureSerializer(serializers.ModelSerializer):
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Fixture
+        fields = ["id", "round", "player1", "player2", "due_on", "starts_at", "status", "result"]
+
+    def get_result(self, obj):
+        if obj.result_id is None:
+            return None
+        return {
+            "id": obj.result_id,
+            "winner": obj.result.winner_id,
+            "score": obj.result.score,
+            "played_at": obj.result.played_at,
+            "status": obj.result.status,
+        }
+
+
+class FixtureResultSerializer(serializers.Serializer):
+    won = serializers.BooleanField()
+    score = serializers.CharField(max_length=64, required=False, allow_blank=True, default="")
+    played_at = serializers.DateTimeField(required=False)
 
 
 class RecommendationSerializer(serializers.Serializer):
     user = UserSerializer()
     score = serializers.FloatField()
+    presence = serializers.SerializerMethodField()
+
+    def get_presence(self, obj):
+        return self.context.get("presence", {}).get(obj["user"].id)
 
 
 class ChatThreadSerializer(serializers.ModelSerializer):
     other_user = serializers.SerializerMethodField()
+    # Annotated by the thread list; fresh threads have read everything
+    last_read_message_id = serializers.SerializerMethodField()
+    unread = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatThread
-        fields = ["id", "other_user", "created_at"]
+        fields = ["id", "kind", "title", "other_user", "last_message_id", "last_read_message_id", "unread", "created_at"]
 
     def get_other_user(self, obj: ChatThread):
+        if not obj.is_direct:
+            return None
         request = self.context.get("request")
         current_user: User | None = getattr(request, "user", None)
         other = obj.user2 if current_user and obj.user1_id == current_user.id else obj.user1
         return UserBriefSerializer(other, context=self.context).data
 
+    def get_last_read_message_id(self, obj: ChatThread):
+        return getattr(obj, "last_read_message_id", obj.last_message_id)
+
+    def get_unread(self, obj: ChatThread):
+        return getattr(obj, "unread", 0)
+
+
+class ChatMemberSerializer(serializers.ModelSerializer):
+    user = UserBriefSerializer(read_only=True)
+
+    class Meta:
+        model = ChatMember
+        fields = ["user", "role", "last_read_message_id", "joined_at"]
+
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     sender = UserBriefSerializer(read_only=True)
@@ -0,0 +1,181 @@
+"""
+Horizontal partitioning of chat messages by thread.
+
+With CHAT_SHARDS set to a list of database aliases, each thread's
+ChatMessage rows live in one of those databases. ChatThread and ChatMember
+stay in the default database and form the directory: listing a user's
+threads, access checks and read cursors never touch a shard, and
+``ChatThread.shard`` says where a thread's messages are ("" = default).
+
+New threads are placed by rendezvous hashing of the thread id
+(``placement``), so adding a shard only moves the threads that now hash to
+it; ``manage.py rebalance_chat_shards`` moves every thread whose stored shard
+differs from its placement, and ``move_thread`` moves one online.
+
+While sharded, message ids come from the ChatIdSequence row in the default
+database, so they stay unique across shards (threads keep their ids when
+moved) and increase per thread in commit order: posts lock the thread's
+directory row, which also keeps them out of the final step of a move.
+
+Shards hold no users, so messages are loaded without joins and their
+senders attached from the default database; messages of deleted users
+(which cannot cascade across databases) are skipped.
+"""
+
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, models, transaction
+from django.db.models import F, Q
+from .models import ChatIdSequence, ChatMember, ChatMessage, ChatThread
+from .routing import PRIMARY
+import hashlib
+
+_COLUMNS = ("id", "thread_id", "sender_id", "content", "created_at")
+
+
+def shards():
+    return list(getattr(settings, "CHAT_SHARDS", []))
+
+
+def enabled() -> bool:
+    return bool(shards())
+
+
+def placement(thread_id: int) -> str:
+    """Shard a thread belongs on (the default database when sharding is off)."""
+    aliases = shards()
+    if not aliases:
+        return PRIMARY
+    return max(aliases, key=lambda alias: hashlib.blake2b(f"{alias}:{thread_id}".encode(), digest_size=8).digest())
+
+
+def alias_for(thread: ChatThread) -> str:
+    return thread.shard or PRIMARY
+
+
+def shard_value(alias: str) -> str:
+    return "" if alias == PRIMARY else alias
+
+
+def threads_by_alias(threads):
+    """{alias: [thread ids]} for a ChatThread queryset."""
+    groups = {}
+    for tid, shard in threads.values_list("id", "shard"):
+        groups.setdefault(shard or PRIMARY, []).append(tid)
+    return groups
+
+
+def _highest_message_id() -> int:
+    highest = ChatThread.objects.using(PRIMARY).aggregate(m=models.Max("last_message_id"))["m"] or 0
+    for alias in {PRIMARY, *shards()}:
+        highest = max(highest, ChatMessage.objects.using(alias).aggregate(m=models.Max("id"))["m"] or 0)
+    return highest
+
+
+def next_message_id() -> int:
+    """Reserve a message id; call inside a transaction on the default database."""
+    counter = ChatIdSequence.objects.using(PRIMARY).filter(pk=1)
+    if not counter.update(value=F("value") + 1):
+        # First sharded write: continue above every id handed out so far
+        ChatIdSequence.objects.using(PRIMARY).get_or_create(pk=1, defaults={"value": _highest_message_id()})
+        counter.update(value=F("value") + 1)
+    return counter.values_list("value", flat=True).get()
+
+
+def store_message(thread: ChatThread, sender: User, content: str) -> ChatMessage:
+    with transaction.atomic(using=PRIMARY):
+        # Row lock on the directory entry (SQLite's IMMEDIATE transactions already serialize writers)
+        shard = ChatThread.objects.using(PRIMARY).select_for_update().values_list("shard", flat=True).get(id=thread.id)
+        msg = ChatMessage(id=next_message_id(), thread=thread, sender=sender, content=content)
+        msg.save(using=shard or PRIMARY, force_insert=True)
+        ChatThread.objects.using(PRIMARY).filter(id=thread.id, last_message_id__lt=msg.id).update(last_message_id=msg.id)
+        ChatMember.objects.using(PRIMARY).filter(
+            thread=thread, user=sender, last_read_message_id__lt=msg.id
+        ).update(last_read_message_id=msg.id)
+    return msg
+
+
+def attach_senders(messages, thread=None):
+    """Set ``sender`` (with profile) on messages loaded from a shard, dropping those of deleted users."""
+    senders = User.objects.select_related("profile").in_bulk({m.sender_id for m in messages})
+    out = []
+    for msg in messages:
+        sender = senders.get(msg.sender_id)
+        if sender is None:
+            continue
+        msg.sender = sender
+        if thread is not None:
+            msg.thread = thread
+        out.append(msg)
+    return out
+
+
+def count_unread(threads, chunk=100):
+    """Set ``unread`` on threads annotated with the user's ``last_read_message_id``: one grouped
+    count per shard, skipping threads whose last_message_id shows nothing new."""
+    pending = {}
+    for t in threads:
+        t.unread = 0
+        if t.last_message_id > (t.last_read_message_id or 0):
+            pending.setdefault(alias_for(t), []).append(t)
+    for alias, group in pending.items():
+        by_id = {t.id: t for t in group}
+        for i in range(0, len(group), chunk):
+            cond = reduce(or_, (Q(thread_id=t.id, id__gt=t.last_read_message_id or 0) for t in group[i:i + chunk]))
+            counts = ChatMessage.objects.using(alias).filter(cond).order_by().values("thread_id").annotate(n=models.Count("id"))
+            for row in counts:
+                by_id[row["thread_id"]].unread = row["n"]
+
+
+def _copy_messages(thread_id, source, target, after, batch_size):
+    connection = connections[target]
+    qn = connection.ops.quote_name
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        qn(ChatMessage._meta.db_table), ", ".join(qn(c) for c in _COLUMNS), ", ".join(["%s"] * len(_COLUMNS))
+    )
+    copied = 0
+    while True:
+        rows = list(
+            ChatMessage.objects.using(source).filter(thread_id=thread_id, id__gt=after)
+            .order_by("id").values_list(*_COLUMNS)[:batch_size]
+        )
+        if not rows:
+            return copied, after
+        # Rows left behind by an interrupted move are already there
+        present = set(ChatMessage.objects.using(target).filter(id__in=[r[0] for r in rows]).values_list("id", flat=True))
+        # Raw inserts keep created_at (bulk_create would reset auto_now_add fields)
+        params = [
+            (mid, tid, sender_id, content, connection.ops.adapt_datetimefield_value(created_at))
+            for mid, tid, sender_id, content, created_at in rows if mid not in present
+        ]
+        with transaction.atomic(using=target), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        copied += len(params)
+        after = rows[-1][0]
+
+
+def move_thread(thread_id: int, target: str, batch_size: int = 2000) -> int:
+    """Move one thread's messages to ``target`` while it stays readable and writable; returns the count."""
+    source = alias_for(ChatThread.objects.using(PRIMARY).get(id=thread_id))
+    if source == target:
+        return 0
+    # Bulk of the copy without blocking writers, then the tail under the directory lock
+    copied, last_id = _copy_messages(thread_id, source, target, 0, batch_size)
+    with transaction.atomic(using=PRIMARY):
+        shard = ChatThread.objects.using(PRIMARY).select_for_update().values_list("shard", flat=True).get(id=thread_id)
+        if (shard or PRIMARY) != source:
+            return 0  # moved concurrently
+        tail, _ = _copy_messages(thread_id, source, target, last_id, batch_size)
+        ChatThread.objects.using(PRIMARY).filter(id=thread_id).update(shard=shard_value(target))
+    delete_messages(thread_id, source, batch_size)
+    return copied + tail
+
+
+def delete_messages(thread_id: int, alias: str, batch_size: int = 2000):
+    while True:
+        ids = list(ChatMessage.objects.using(alias).filter(thread_id=thread_id).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return
+        ChatMessage.objects.using(alias).filter(id__in=ids).delete()
@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import user_record_cache
+from .graph import friend_graph
+from .invalidation import bus
+from .models import Profile, Friendship, CheckIn, ChatThread
+from . import sharding
+
+# Local caches follow change events from every worker, this one included
+bus.subscribe("user", user_record_cache.invalidate)
+bus.subscribe("friends", lambda key: friend_graph.forget(int(key)))
+
+
+@receiver([post_save, post_delete], sender=User)
+def publish_user_change(sender, instance, **kwargs):
+    bus.publish("user", instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def publish_profile_change(sender, instance, **kwargs):
+    # "user" covers the profile too: the auth cache holds its token_version
+    bus.publish("user", instance.user_id)
+
+
+@receiver(post_save, sender=Friendship)
+def add_friend_edge(sender, instance, created, **kwargs):
+    if created:
+        friend_graph.add_edge(instance.user1_id, instance.user2_id)
+        bus.publish("friends", instance.user1_id)
+        bus.publish("friends", instance.user2_id)
+
+
+@receiver(post_delete, sender=Friendship)
+def remove_friend_edge(sender, instance, **kwargs):
+    friend_graph.remove_edge(instance.user1_id, instance.user2_id)
+    bus.publish("friends", instance.user1_id)
+    bus.publish("friends", instance.user2_id)
+
+
+@receiver([post_save, post_delete], sender=CheckIn)
+def publish_checkin_change(sender, instance, **kwargs):
+    bus.publish("checkins", instance.user_id)
+
+
+@receiver(post_save, sender=ChatThread)
+def place_chat_thread(sender, instance, created, **kwargs):
+    if created and sharding.enabled() and not instance.shard:
+        instance.shard = sharding.shard_value(sharding.placement(instance.pk))
+        ChatThread.objects.filter(pk=instance.pk).update(shard=instance.shard)
+
+
+@receiver(post_delete, sender=ChatThread)
+def delete_sharded_messages(sender, instance, **kwargs):
+    # Messages in the default database cascade; a shard's cannot
+    if instance.shard:
+        sharding.delete_messages(instance.pk, instance.shard)
@@ -0,0 +1,52 @@
+"""
+Storage for uploaded avatars.
+
+With MEDIA_CONTENT_ADDRESSED on, Profile.avatar files are stored under the
+hash of their bytes (``avatars/3f/3fa9...c1.jpg``): identical uploads share
+one file, and a name never changes content, so media.serve lets clients
+cache it for good. Since a file may then belong to several profiles, delete
+avatars through ``media.release``, which keeps files still in use, and after
+saving a profile with a new avatar call ``media.ensure_stored``, which puts
+the file back if a release raced with the upload. Files stored before the
+setting was turned on keep their names.
+"""
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+import hashlib
+import posixpath
+import re
+
+# "<dir>/ab/ab<62 more hex digits>.<ext>" as written by ContentAddressedStorage
+_CONTENT_NAME = re.compile(r"(?:.+/)?([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.\w+)?")
+
+
+def is_content_addressed(name: str) -> bool:
+    return _CONTENT_NAME.fullmatch(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), hexdigest[:2], hexdigest + extension)
+        if self.exists(name):
+            return name
+        # A concurrent save of the same bytes gets a suffixed copy; harmless
+        return super().save(name, content, max_length)
+
+
+def avatar_storage():
+    """Storage for Profile.avatar, chosen once when the models load."""
+    if getattr(settings, "MEDIA_CONTENT_ADDRESSED", False):
+        return ContentAddressedStorage()
+    return default_storage
@@ -0,0 +1,40 @@
+"""
+Streamed bodies that stay streamed under both entry points.
+
+Django's ASGI handler consumes a synchronous iterator with
+``sync_to_async(list)``, building the whole body before the first byte goes
+out, and its WSGI handler does the same to an asynchronous one. ``stream``
+hands each handler the kind it streams natively: the iterator itself under
+WSGI, and under ASGI an async generator that pulls one chunk at a time
+through ``sync_to_async``.
+
+Chunks that read the database must stay on the request's sync thread, where
+their cursor and connection live; that is the default. Pass
+``thread_sensitive=False`` for plain file reads, which may run in parallel.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+_DONE = object()
+
+
+def is_asgi(request) -> bool:
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+async def _pull(chunks, thread_sensitive):
+    iterator = iter(chunks)
+    step = sync_to_async(next, thread_sensitive=thread_sensitive)
+    try:
+        while (chunk := await step(iterator, _DONE)) is not _DONE:
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=thread_sensitive)()
+
+
+def stream(request, chunks, thread_sensitive=True):
+    """``chunks`` (a sync iterable) in the form the current handler streams without buffering."""
+    return _pull(chunks, thread_sensitive) if is_asgi(request) else chunks
@@ -0,0 +1,201 @@
+"""
+Small background task subsystem.
+
+Declare work with ``@task`` (usually in an app's ``tasks.py``) and enqueue it
+with ``.delay(...)`` or, from inside a request/transaction, with
+``.delay_on_commit(...)`` so the job only exists once the data it reads is
+committed. Arguments must be JSON-serializable (pass ids, not instances).
+
+Backends, selected by ``TASK_QUEUE_BACKEND``:
+- "database": rows in ``api.Task`` processed by ``manage.py run_tasks``, which
+  must run next to the web workers (nothing else does); it deletes finished
+  rows after TASK_RETENTION (failed ones after TASK_FAILED_RETENTION) seconds
+- "memory": an in-process thread pool (single-process dev servers)
+- "immediate": run inline when enqueued (tests, scripts)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Task
+import logging
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_retries, retry_delay):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return get_backend().enqueue(self, list(args), kwargs)
+
+    def delay_on_commit(self, *args, **kwargs):
+        transaction.on_commit(lambda: self.delay(*args, **kwargs))
+
+    def backoff(self, attempts):
+        """Seconds to wait before retry number ``attempts`` (exponential)."""
+        return self.retry_delay * (2 ** max(0, attempts - 1))
+
+
+def task(func=None, *, name=None, max_retries=3, retry_delay=10):
+    """Register ``func`` as a background task."""
+
+    def wrap(f):
+        task_name = name or f"{f.__module__}.{f.__qualname__}"
+        tf = TaskFunction(f, task_name, max_retries, retry_delay)
+        _registry[task_name] = tf
+        return tf
+
+    return wrap(func) if func is not None else wrap
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def run_task(tf, args, kwargs):
+    """Run one attempt; returns None on success or the formatted error."""
+    try:
+        tf(*args, **kwargs)
+        return None
+    except Exception:
+        logger.exception("Task %s failed", tf.name)
+        return traceback.format_exc()
+
+
+class ImmediateBackend:
+    def enqueue(self, tf, args, kwargs):
+        return tf(*args, **kwargs)
+
+
+class MemoryBackend:
+    """Runs tasks on a process-local thread pool, retrying with backoff."""
+
+    def __init__(self, concurrency):
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="task")
+
+    def enqueue(self, tf, args, kwargs):
+        return self.executor.submit(self._run, tf, args, kwargs)
+
+    def _run(self, tf, args, kwargs):
+        for attempt in range(1, tf.max_retries + 2):
+            close_old_connections()
+            error = run_task(tf, args, kwargs)
+            if error is None:
+                break
+            if attempt <= tf.max_retries:
+                time.sleep(tf.backoff(attempt))
+        close_old_connections()
+
+
+class DatabaseBackend:
+    """Persists tasks as ``api.Task`` rows for the ``run_tasks`` worker."""
+
+    def __init__(self):
+        self._checked_at = 0.0
+
+    def enqueue(self, tf, args, kwargs, run_at=None):
+        self._warn_if_stalled()
+        return Task.objects.create(
+            name=tf.name,
+            args=args,
+            kwargs=kwargs,
+            max_retries=tf.max_retries,
+            run_at=run_at or timezone.now(),
+        )
+
+    def _warn_if_stalled(self):
+        # At most once a minute per process: a due task left queued for TASK_STALL_WARNING
+        # seconds means no worker is running, and rollups and availability masks go stale
+        if time.monotonic() - self._checked_at < 60:
+            return
+        self._checked_at = time.monotonic()
+        overdue = timezone.now() - timedelta(seconds=getattr(settings, "TASK_STALL_WARNING", 300))
+        if Task.objects.filter(status=Task.STATUS_QUEUED, run_at__lt=overdue).exists():
+            logger.warning("Background tasks are overdue; is `manage.py run_tasks` running?")
+
+    def claim(self):
+        """Atomically take the next due task, or return None.
+
+        The conditional UPDATE only succeeds for one worker per row, so it is
+        safe across processes even on SQLite (no SELECT ... FOR UPDATE).
+        Tasks left running by a dead worker are reclaimed after
+        ``TASK_LOCK_TIMEOUT`` seconds.
+        """
+        now = timezone.now()
+        stale = now - timedelta(seconds=getattr(settings, "TASK_LOCK_TIMEOUT", 600))
+        due = Task.objects.filter(
+            Q(status=Task.STATUS_QUEUED, run_at__lte=now)
+            | Q(status=Task.STATUS_RUNNING, locked_at__lt=stale)
+        ).order_by("run_at")
+        for pk, status in due.values_list("pk", "status")[:10]:
+            claimed = Task.objects.filter(pk=pk, status=status).filter(
+                Q(locked_at__isnull=True) | Q(locked_at__lt=stale)
+            ).update(status=Task.STATUS_RUNNING, locked_at=now, attempts=F("attempts") + 1)
+            if claimed:
+                return Task.objects.get(pk=pk)
+        return None
+
+    def process(self, task_row):
+        try:
+            tf = get_task(task_row.name)
+        except KeyError:
+            error = f"Unknown task {task_row.name!r}"
+            tf = None
+        else:
+            error = run_task(tf, task_row.args, task_row.kwargs)
+
+        updates = {"locked_at": None, "last_error": error or ""}
+        if error is None:
+            updates.update(status=Task.STATUS_DONE, finished_at=timezone.now())
+        elif tf is not None and task_row.attempts <= task_row.max_retries:
+            updates.update(status=Task.STATUS_QUEUED, run_at=timezone.now() + timedelta(seconds=tf.backoff(task_row.attempts)))
+        else:
+            updates.update(status=Task.STATUS_FAILED, finished_at=timezone.now())
+        Task.objects.filter(pk=task_row.pk).update(**updates)
+        return error is None
+
+    def purge(self):
+        """Delete tasks finished longer ago than the retention settings; returns how many."""
+        now = timezone.now()
+        done = now - timedelta(seconds=getattr(settings, "TASK_RETENTION", 7 * 86400))
+        failed = now - timedelta(seconds=getattr(settings, "TASK_FAILED_RETENTION", 30 * 86400))
+        deleted, _ = Task.objects.filter(
+            Q(status=Task.STATUS_DONE, finished_at__lt=done) | Q(status=Task.STATUS_FAILED, finished_at__lt=failed)
+        ).delete()
+        return deleted
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = getattr(settings, "TASK_QUEUE_BACKEND", "database")
+                if kind == "immediate":
+                    _backend = ImmediateBackend()
+                elif kind == "memory":
+                    _backend = MemoryBackend(getattr(settings, "TASK_QUEUE_CONCURRENCY", 2))
+                else:
+                    _backend = DatabaseBackend()
+    return _backend
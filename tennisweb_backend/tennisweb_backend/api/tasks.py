@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from datetime import date as dt_date
+from calendar import monthrange
+from io import BytesIO
+from pathlib import PurePosixPath
+from .models import Profile, CheckIn, CheckInMonthlyRollup
+from .taskqueue import task
+from . import availability, media
+
+
+@task(max_retries=2)
+def resize_avatar(profile_id: int):
+    """Downscale an uploaded avatar to AVATAR_MAX_SIZE px on its longest side."""
+    from PIL import Image, ImageOps
+
+    try:
+        profile = Profile.objects.get(id=profile_id)
+    except Profile.DoesNotExist:
+        return
+    if not profile.avatar:
+        return
+
+    max_size = getattr(settings, "AVATAR_MAX_SIZE", 512)
+    with profile.avatar.open("rb") as fh:
+        img = Image.open(fh)
+        img.load()
+    if max(img.size) <= max_size:
+        return
+
+    fmt = img.format or "PNG"
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_size, max_size))
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = BytesIO()
+    img.save(buf, format=fmt)
+
+    old_name = profile.avatar.name
+    path = PurePosixPath(old_name)
+    resized = ContentFile(buf.getvalue())
+    with transaction.atomic():
+        profile = Profile.objects.select_for_update().filter(id=profile_id).first()
+        if profile is None or profile.avatar.name != old_name:
+            # Replaced or removed while resizing; a new upload queued its own resize
+            return
+        profile.avatar.save(f"{path.stem}_{max_size}{path.suffix}", resized, save=False)
+        profile.save(update_fields=["avatar", "updated_at"])
+    media.ensure_stored(profile.avatar.storage, profile.avatar.name, resized)
+    media.release(profile.avatar.storage, old_name)
+
+
+@task
+def refresh_checkin_rollup(user_id: int, year: int, month: int):
+    """Recompute one user's CheckInMonthlyRollup row from their CheckIn rows."""
+    first_day = dt_date(year, month, 1)
+    last_day = dt_date(year, month, monthrange(year, month)[1])
+    totals = CheckIn.objects.filter(user_id=user_id, date__gte=first_day, date__lte=last_day).aggregate(
+        sessions=models.Count("id"), minutes=models.Sum("duration_minutes")
+    )
+    if not totals["sessions"]:
+        CheckInMonthlyRollup.objects.filter(user_id=user_id, month=first_day).delete()
+        return
+    CheckInMonthlyRollup.objects.update_or_create(
+        user_id=user_id,
+        month=first_day,
+        defaults={"sessions": totals["sessions"], "total_minutes": totals["minutes"] or 0},
+    )
+
+
+@task
+def refresh_availability_mask(user_id: int):
+    """Rebuild Profile.availability_mask after the user's check-in history changed."""
+    availability.refresh_user_mask(user_id)
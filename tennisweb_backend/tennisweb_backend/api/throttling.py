@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+import math
+import threading
+import time
+
+
+class MemoryBucketStore:
+    """Per-process bucket state: {key: (tokens, updated_at)}."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, refill_rate, now):
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            return allowed, tokens
+
+
+class CacheBucketStore:
+    """Bucket state in a Django cache backend, shared by every worker using it.
+
+    The read-modify-write is not atomic across processes, so concurrent bursts
+    may over-admit by a few requests; the bucket still bounds sustained rate.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def take(self, key, cost, capacity, refill_rate, now):
+        cache = caches[self.alias]
+        tokens, updated_at = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        # Keep entries only as long as a bucket needs to refill completely
+        cache.set(key, (tokens, now), timeout=int(capacity / refill_rate) + 1)
+        return allowed, tokens
+
+
+def _make_store():
+    if getattr(settings, "RATE_LIMIT_STORE", "memory") == "cache":
+        return CacheBucketStore(getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "default"))
+    return MemoryBucketStore()
+
+
+bucket_store = _make_store()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token-bucket throttle with per-endpoint request costs.
+
+    Views opt in with ``throttle_scope`` (a key of ``RATE_LIMIT_BUCKETS``,
+    which gives the bucket ``capacity`` and ``refill_rate`` in tokens per
+    second) and ``throttle_costs``, mapping HTTP methods to the tokens one
+    request consumes. Methods without a cost are not throttled. Buckets are
+    per user, or per client address for anonymous requests.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = getattr(view, "throttle_scope", None)
+        cost = getattr(view, "throttle_costs", {}).get(request.method, 0)
+        config = getattr(settings, "RATE_LIMIT_BUCKETS", {}).get(scope)
+        if not cost or not config:
+            return True
+
+        capacity, refill_rate = config["capacity"], config["refill_rate"]
+        ident = request.user.pk if request.user and request.user.is_authenticated else self.get_ident(request)
+        allowed, tokens = bucket_store.take(f"throttle:{scope}:{ident}", cost, capacity, refill_rate, time.time())
+        if not allowed:
+            self.wait_seconds = (min(cost, capacity) - tokens) / refill_rate
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoadShedder:
+    """Tracks in-flight requests and latency of shed-able endpoints in this process.
+
+    ``should_shed`` turns requests away once in-flight work reaches
+    ``max_inflight`` or the latency EWMA exceeds ``latency_ms``. The EWMA
+    decays with ``half_life`` seconds while no samples arrive, so a shedding
+    worker probes again instead of refusing forever, and above the latency
+    target the shed probability grows with the overshoot rather than jumping
+    straight to 100%.
+    """
+
+    def __init__(self, max_inflight, latency_ms, half_life=2.0, alpha=0.2):
+        self.max_inflight = max_inflight
+        self.latency_ms = latency_ms
+        self.half_life = half_life
+        self.alpha = alpha
+        self.inflight = 0
+        self._ewma = 0.0
+        self._sampled_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._tick = 0
+
+    def current_latency(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self._ewma * 0.5 ** ((now - self._sampled_at) / self.half_life)
+
+    def should_shed(self):
+        if self.inflight >= self.max_inflight:
+            return True
+        overshoot = self.current_latency() / self.latency_ms - 1.0
+        if overshoot <= 0:
+            return False
+        # Deterministic fraction: shed `overshoot` of requests, capped at 90% so samples keep flowing
+        with self._lock:
+            self._tick = (self._tick + 1) % 10
+            return self._tick < min(9, math.ceil(overshoot * 10))
+
+    def start(self):
+        with self._lock:
+            self.inflight += 1
+        return time.monotonic()
+
+    def finish(self, started_at):
+        now = time.monotonic()
+        with self._lock:
+            self.inflight -= 1
+            sample = (now - started_at) * 1000
+            self._ewma = self.current_latency(now) * (1 - self.alpha) + sample * self.alpha
+            self._sampled_at = now
+
+    def retry_after(self):
+        return max(1, math.ceil(self.half_life))
+
+
+load_shedder = LoadShedder(
+    max_inflight=getattr(settings, "LOAD_SHED_MAX_INFLIGHT", 16),
+    latency_ms=getattr(settings, "LOAD_SHED_LATENCY_MS", 1500),
+)
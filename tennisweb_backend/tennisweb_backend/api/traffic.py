@@ -0,0 +1,142 @@
+"""
+Anonymized traffic capture for load testing (``manage.py replay_traffic``).
+
+With TRAFFIC_CAPTURE on, ``TrafficCaptureMiddleware`` appends one NDJSON
+line per sampled API request to TRAFFIC_CAPTURE_PATH, rotated at
+TRAFFIC_CAPTURE_MAX_BYTES with TRAFFIC_CAPTURE_BACKUPS old files kept.
+Lines are written by a background thread, so requests never wait on the
+disk. A line records the request's shape, not its content:
+
+    {"t": 1760000000.123, "m": "GET", "view": "chat_thread_messages", "kw": {"thread_id": 7},
+     "q": {"after": ["120"], "wait": ["25"]}, "body": null, "u": "p:5f0c2a91",
+     "ms": 25012.4, "st": 200, "bytes": 312}
+
+- ``view`` and ``kw`` are the URL name and arguments, so replays rebuild
+  paths with ``reverse`` even after URLs change shape;
+- users are pseudonyms (keyed hash of the id), both the caller (``u``) and
+  user ids in URL arguments, parameters and bodies, so a replay can map
+  every pseudonym onto a seeded user;
+- other object ids (threads, sessions, leagues, ...) are kept as they are;
+  a replay swaps them for objects the seeded user can reach and drops
+  requests it has none for, so it keeps each user's request mix but not
+  who talks to whom;
+- strings outside PLAIN_FIELDS (chat text, bios, search terms) become
+  "x" runs of the same length, keeping payload sizes realistic.
+
+Authentication and registration requests are never recorded.
+"""
+
+from django.conf import settings
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import atexit
+import hashlib
+import json
+import logging
+import queue
+
+# Parameters and body fields naming users, pseudonymized wherever they appear
+USER_FIELDS = frozenset({
+    "user_id", "friend_id", "other_user_id", "opponent_id", "to_user_id", "from_user_id",
+    "member_ids", "participant_ids", "exclude",
+})
+# Values kept verbatim: dates, times, enums, paging and numbers that shape the request
+PLAIN_FIELDS = frozenset({
+    "date", "start_time", "end_time", "month", "from", "to", "value", "duration", "detail",
+    "action", "kind", "fmt", "after", "before", "limit", "wait", "offset", "page",
+    "max_tokens", "max_chars", "min_overlap", "start_at", "end_at", "played_at", "won", "score",
+    "court_id", "session_id", "thread_id", "message_id", "status", "role",
+})
+SKIPPED_VIEWS = frozenset({"register", "token_obtain_pair", "token_refresh", "token_revoke"})
+# Larger bodies (uploads) are recorded as null
+MAX_BODY_BYTES = 64 * 1024
+
+logger = logging.getLogger("tennisweb_backend.traffic")
+
+
+def pseudonym(user_id) -> str:
+    key = getattr(settings, "TRAFFIC_CAPTURE_SALT", None) or settings.SECRET_KEY
+    digest = hashlib.blake2b(str(user_id).encode(), key=key.encode()[:64], digest_size=4).hexdigest()
+    return f"p:{digest}"
+
+
+def _pseudonymize(value):
+    if isinstance(value, list):
+        return [_pseudonymize(v) for v in value]
+    if isinstance(value, str) and "," in value:
+        return ",".join(pseudonym(v.strip()) for v in value.split(",") if v.strip())
+    if value in (None, ""):
+        return value
+    return pseudonym(value)
+
+
+def _scrub(key, value):
+    if key in USER_FIELDS:
+        return _pseudonymize(value)
+    if isinstance(value, dict):
+        return {k: _scrub(k, v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_scrub(key, v) for v in value]
+    if isinstance(value, str) and key not in PLAIN_FIELDS:
+        return "x" * len(value)
+    return value
+
+
+def _body(request):
+    if not request.content_type.startswith("application/json"):
+        return None
+    raw = request.body
+    if not raw or len(raw) > MAX_BODY_BYTES:
+        return None
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    return _scrub(None, data) if isinstance(data, dict) else None
+
+
+def should_capture(request) -> bool:
+    match = request.resolver_match
+    return match is not None and bool(match.url_name) and match.url_name not in SKIPPED_VIEWS
+
+
+def read_body(request):
+    """The scrubbed JSON body; call before the view runs, while the body can still be read."""
+    try:
+        return _body(request)
+    except Exception:
+        return None
+
+
+def shape(request, response, body, started_at, elapsed_ms) -> dict:
+    match = request.resolver_match
+    user = getattr(request, "user", None)
+    return {
+        "t": round(started_at, 3),
+        "m": request.method,
+        "view": match.url_name,
+        "kw": {k: _scrub(k, v) for k, v in match.kwargs.items()},
+        "q": {k: _scrub(k, request.GET.getlist(k)) for k in request.GET},
+        "body": body,
+        "u": pseudonym(user.pk) if user is not None and user.is_authenticated else None,
+        "ms": round(elapsed_ms, 1),
+        "st": response.status_code,
+        "bytes": None if response.streaming else len(response.content),
+    }
+
+
+class TrafficLog:
+    """NDJSON writer: lines go through a queue to a thread owning the rotating file."""
+
+    def __init__(self, path, max_bytes, backups):
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue = queue.SimpleQueue()
+        self._listener = QueueListener(self._queue, handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+        logger.addHandler(QueueHandler(self._queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    def write(self, record: dict):
+        logger.info(json.dumps(record, separators=(",", ":")))
@@ -1,39 +1,100 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     RegisterView,
+    TokenRevokeView,
     ProfileView,
     ProfileUpdateView,
+    ExportView,
     CheckInMonthView,
+    CheckInRangeView,
     CheckInSetView,
+    AvailabilityView,
     RecommendMatchView,
     MatchCandidatesView,
+    MatchPromptView,
+    EventPairingView,
+    PresencePingView,
+    PresenceView,
     FriendListCreateView,
+    FriendSuggestionsView,
+    FriendRequestListView,
+    FriendRequestDetailView,
     FriendDeleteView,
+    CourtListCreateView,
+    SessionListCreateView,
+    SessionDetailView,
+    MatchResultListCreateView,
+    MatchResultDetailView,
+    LeagueListCreateView,
+    LeagueDetailView,
+    LeagueMembershipView,
+    LeagueRoundsView,
+    LeagueFixturesView,
+    FixtureResultView,
     UserDetailView,
     ChatThreadListCreateView,
     ChatThreadMessagesView,
+    ShardedChatThreadListCreateView,
+    ShardedChatThreadMessagesView,
+    ChatThreadReadView,
+    ChatThreadMembersView,
+    ChatSearchView,
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
+# Sharded chat storage (api/sharding.py) swaps in shard-aware thread and message views
+if getattr(settings, "CHAT_SHARDS", []):
+    chat_threads_view, chat_messages_view = ShardedChatThreadListCreateView, ShardedChatThreadMessagesView
+else:
+    chat_threads_view, chat_messages_view = ChatThreadListCreateView, ChatThreadMessagesView
+
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("token/revoke/", TokenRevokeView.as_view(), name="token_revoke"),
     path("profile/", ProfileView.as_view(), name="profile"),
     path("profile/update/", ProfileUpdateView.as_view(), name="profile_update"),
+    path("profile/export/", ExportView.as_view(), name="profile_export"),
     # Calendar check-ins
     path("checkins/", CheckInMonthView.as_view(), name="checkins_month"),
+    path("checkins/range/", CheckInRangeView.as_view(), name="checkins_range"),
     path("checkins/set/", CheckInSetView.as_view(), name="checkins_set"),
+    path("availability/", AvailabilityView.as_view(), name="availability"),
     # Matching and friends
     path("match/recommend/", RecommendMatchView.as_view(), name="match_recommend"),
     path("match/candidates/", MatchCandidatesView.as_view(), name="match_candidates"),
+    path("match/prompt/", MatchPromptView.as_view(), name="match_prompt"),
+    path("match/event/", EventPairingView.as_view(), name="match_event"),
+    path("presence/", PresenceView.as_view(), name="presence"),
+    path("presence/ping/", PresencePingView.as_view(), name="presence_ping"),
     path("friends/", FriendListCreateView.as_view(), name="friends_list_create"),
+    path("friends/requests/", FriendRequestListView.as_view(), name="friend_requests"),
+    path("friends/requests/<int:request_id>/", FriendRequestDetailView.as_view(), name="friend_request_detail"),
+    path("friends/suggestions/", FriendSuggestionsView.as_view(), name="friends_suggestions"),
     path("friends/<int:friend_id>/", FriendDeleteView.as_view(), name="friends_delete"),
+    # Courts and scheduled sessions
+    path("courts/", CourtListCreateView.as_view(), name="courts"),
+    path("sessions/", SessionListCreateView.as_view(), name="sessions"),
+    path("sessions/<int:session_id>/", SessionDetailView.as_view(), name="session_detail"),
+    path("matches/results/", MatchResultListCreateView.as_view(), name="match_results"),
+    path("matches/results/<int:result_id>/", MatchResultDetailView.as_view(), name="match_result_detail"),
+    path("leagues/", LeagueListCreateView.as_view(), name="leagues"),
+    path("leagues/<int:league_id>/", LeagueDetailView.as_view(), name="league_detail"),
+    path("leagues/<int:league_id>/membership/", LeagueMembershipView.as_view(), name="league_membership"),
+    path("leagues/<int:league_id>/rounds/", LeagueRoundsView.as_view(), name="league_rounds"),
+    path("leagues/<int:league_id>/fixtures/", LeagueFixturesView.as_view(), name="league_fixtures"),
+    path("leagues/<int:league_id>/fixtures/<int:fixture_id>/result/", FixtureResultView.as_view(), name="fixture_result"),
     path("users/<int:user_id>/", UserDetailView.as_view(), name="user_detail"),
     # Chat
-    path("chat/threads/", ChatThreadListCreateView.as_view(), name="chat_threads"),
-    path("chat/threads/<int:thread_id>/messages/", ChatThreadMessagesView.as_view(), name="chat_thread_messages"),
+    path("chat/threads/", chat_threads_view.as_view(), name="chat_threads"),
+    path("chat/threads/<int:thread_id>/messages/", chat_messages_view.as_view(), name="chat_thread_messages"),
+    path("chat/threads/<int:thread_id>/read/", ChatThreadReadView.as_view(), name="chat_thread_read"),
+    path("chat/threads/<int:thread_id>/members/", ChatThreadMembersView.as_view(), name="chat_thread_members"),
+    path("chat/threads/<int:thread_id>/members/<int:user_id>/", ChatThreadMembersView.as_view(), name="chat_thread_member"),
+    path("chat/search/", ChatSearchView.as_view(), name="chat_search"),
 ]
@@ -1,10 +1,16 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.core.cache import caches
 from django.contrib.auth.models import User
-from django.db import models
-from datetime import date as dt_date
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from datetime import date as dt_date, datetime as dt_datetime, timedelta
 from calendar import monthrange
+from functools import lru_cache
 from math import exp
 from .serializers import (
     UserSerializer,
@@ -12,12 +18,35 @@ from .serializers import (
     ProfileUpdateSerializer,
     CheckInSerializer,
     UserBriefSerializer,
-    FriendSerializer,
+    AvailabilityWindowSerializer,
+    FriendshipSerializer,
+    FriendRequestSerializer,
+    CourtSerializer,
+    SessionSerializer,
+    MatchResultSerializer,
+    LeagueSerializer,
+    LeagueStandingSerializer,
+    FixtureSerializer,
+    FixtureResultSerializer,
     RecommendationSerializer,
     ChatThreadSerializer,
+    ChatMemberSerializer,
     ChatMessageSerializer,
 )
-from .models import Profile, CheckIn, Friend, ChatThread, ChatMessage
+from .models import (
+    Profile, CheckIn, CheckInMonthlyRollup, AvailabilityWindow, FriendRequest, Friendship, Court, Session, SessionParticipant, MatchResult, League, LeagueMember, Fixture, ChatThread, ChatMember, ChatMessage,
+)
+from .async_views import AsyncAPIView
+from .authentication import revoke_tokens
+from .conditional import Validators
+from .tasks import resize_avatar, refresh_checkin_rollup, refresh_availability_mask
+from . import archive, availability, export, leagues, matchprompt, media, pairing, presence, rating, routing, search, sharding
+from .graph import friend_graph
+from .chathub import chat_hub
+from .streaming import stream
+from asgiref.sync import sync_to_async
+import hashlib
+import heapq
 import re
 import unicodedata
 
@@ -27,13 +56,35 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
     serializer_class = RegisterSerializer
 
+    def perform_create(self, serializer):
+        user = serializer.save()
+        # The account exists only on the primary until replicas catch up
+        routing.stick(user.pk)
+
 
-class ProfileView(generics.RetrieveAPIView):
-    serializer_class = UserSerializer
+class TokenRevokeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_object(self):
-        return self.request.user
+    def post(self, request):
+        """Log out everywhere: every access/refresh token issued so far stops authenticating."""
+        revoke_tokens(request.user)
+        return Response({"ok": True})
+
+
+class ProfileView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        # request.user's columns come from authentication, so the profile timestamp is the only lookup
+        profile_updated = await Profile.objects.filter(user_id=request.user.id).values_list("updated_at", flat=True).afirst()
+        u = request.user
+        validators = Validators(u.id, u.username, u.email, u.first_name, u.last_name, profile_updated, last_modified=profile_updated)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        user = await User.objects.select_related("profile").aget(id=request.user.id)
+        return validators.apply(Response(UserSerializer(user, context={"request": request}).data))
 
 
 class ProfileUpdateView(APIView):
@@ -45,6 +96,10 @@ class ProfileUpdateView(APIView):
         serializer = ProfileUpdateSerializer(profile, data=request.data, partial=True, context={"request": request})
         if serializer.is_valid():
             serializer.save()
+            upload = serializer.validated_data.get("avatar")
+            if upload:
+                transaction.on_commit(lambda: media.ensure_stored(profile.avatar.storage, profile.avatar.name, upload))
+                resize_avatar.delay_on_commit(profile.id)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -52,10 +107,40 @@ class ProfileUpdateView(APIView):
         return self.put(request, *args, **kwargs)
 
 
-class CheckInMonthView(APIView):
+class ExportView(APIView):
+    """Download everything stored about the current user.
+
+    Query params:
+      - fmt: "ndjson" (default; one {"type": <section>, ...} object per line) or "csv" (zip with one CSV per section)
+    The body is streamed while it is read from the database (see export.py); streaming.py keeps it
+    streamed under ASGI workers too.
+    """
+
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "export"
+    throttle_costs = {"GET": 1}
 
     def get(self, request):
+        fmt = request.query_params.get("fmt", "ndjson")
+        if fmt not in ("ndjson", "csv"):
+            return Response({"detail": "fmt must be 'ndjson' or 'csv'"}, status=status.HTTP_400_BAD_REQUEST)
+        user = request.user
+        stamp = timezone.now().strftime("%Y%m%d")
+        if fmt == "csv":
+            response = StreamingHttpResponse(stream(request, export.csv_zip_chunks(user)), content_type="application/zip")
+            filename = f"tennisweb-{user.username}-{stamp}.zip"
+        else:
+            response = StreamingHttpResponse(stream(request, export.ndjson_chunks(user)), content_type="application/x-ndjson")
+            filename = f"tennisweb-{user.username}-{stamp}.ndjson"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["Cache-Control"] = "private, no-store"
+        return response
+
+
+class CheckInMonthView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
         """
         Query params:
         - month: "YYYY-MM" (defaults to current month)
@@ -75,6 +160,12 @@ class CheckInMonthView(APIView):
         first_day = dt_date(year, month, 1)
         last_day = dt_date(year, month, monthrange(year, month)[1])
         qs = CheckIn.objects.filter(user=request.user, date__gte=first_day, date__lte=last_day)
+        # Row count catches deletions that a max timestamp alone would miss
+        version = await qs.aaggregate(n=models.Count("id"), last=models.Max("updated_at"))
+        validators = Validators(request.user.id, first_day, version["n"], version["last"])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
         
         # Return list of objects with date and duration
         data = [{
@@ -82,8 +173,89 @@ class CheckInMonthView(APIView):
             "duration": c.duration_minutes,
             "start_time": c.start_time.strftime("%H:%M") if c.start_time else None,
             "end_time": c.end_time.strftime("%H:%M") if c.end_time else None
-        } for c in qs]
-        return Response({"checkins": data})
+        } async for c in qs]
+        return validators.apply(Response({"checkins": data}))
+
+
+def _parse_month(value):
+    year_s, month_s = value.split("-")
+    return dt_date(int(year_s), int(month_s), 1)
+
+
+def _minute_of_day(t):
+    return t.hour * 60 + t.minute if t is not None else None
+
+
+class CheckInRangeView(AsyncAPIView):
+    """Check-ins for a span of months in one call, bit-packed for year and history views.
+
+    Query params:
+      - from, to: "YYYY-MM", inclusive (to defaults to from; at most CHECKIN_RANGE_MAX_MONTHS months)
+      - detail: "1" to add start and end times
+      - summary: "1" for monthly totals only
+    Returns { months: [{ month: "YYYY-MM", days: int, durations: [int, ...],
+                         starts: [int|null, ...], ends: [int|null, ...] }, ...] }
+    Only months with check-ins are listed. Bit d-1 of ``days`` is set when day d
+    has a check-in; the arrays run parallel to the set bits in day order.
+    Times are minutes after midnight.
+
+    With summary the months are { month: "YYYY-MM", sessions: int, total_minutes: int },
+    read from CheckInMonthlyRollup instead of the check-ins themselves, so they may
+    trail a change by one task run.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        try:
+            first_month = _parse_month(request.query_params["from"])
+            last_month = _parse_month(request.query_params.get("to") or request.query_params["from"])
+        except (KeyError, ValueError):
+            return Response({"detail": "from and to must be months formatted YYYY-MM"}, status=status.HTTP_400_BAD_REQUEST)
+        span = (last_month.year - first_month.year) * 12 + last_month.month - first_month.month + 1
+        if span < 1 or span > getattr(settings, "CHECKIN_RANGE_MAX_MONTHS", 120):
+            return Response({"detail": "to must not precede from, and the range is too long"}, status=status.HTTP_400_BAD_REQUEST)
+        detail = request.query_params.get("detail") in ("1", "true", "yes")
+        if request.query_params.get("summary") in ("1", "true", "yes"):
+            return await self._summary(request, first_month, last_month)
+
+        last_day = dt_date(last_month.year, last_month.month, monthrange(last_month.year, last_month.month)[1])
+        # Served by the (user, date) unique index
+        qs = CheckIn.objects.filter(user=request.user, date__gte=first_month, date__lte=last_day).order_by("date")
+        version = await qs.aaggregate(n=models.Count("id"), last=models.Max("updated_at"))
+        validators = Validators(request.user.id, first_month, last_month, detail, version["n"], version["last"])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        months = []
+        current = None
+        async for day, duration, start, end in qs.values_list("date", "duration_minutes", "start_time", "end_time"):
+            key = f"{day.year:04d}-{day.month:02d}"
+            if current is None or current["month"] != key:
+                current = {"month": key, "days": 0, "durations": []}
+                if detail:
+                    current["starts"], current["ends"] = [], []
+                months.append(current)
+            current["days"] |= 1 << (day.day - 1)
+            current["durations"].append(duration)
+            if detail:
+                current["starts"].append(_minute_of_day(start))
+                current["ends"].append(_minute_of_day(end))
+        return validators.apply(Response({"months": months}))
+
+    async def _summary(self, request, first_month, last_month):
+        qs = CheckInMonthlyRollup.objects.filter(user=request.user, month__gte=first_month, month__lte=last_month).order_by("month")
+        version = await qs.aaggregate(n=models.Count("id"), last=models.Max("updated_at"))
+        validators = Validators(request.user.id, first_month, last_month, "summary", version["n"], version["last"])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        months = [
+            {"month": f"{month.year:04d}-{month.month:02d}", "sessions": sessions, "total_minutes": minutes}
+            async for month, sessions, minutes in qs.values_list("month", "sessions", "total_minutes")
+        ]
+        return validators.apply(Response({"months": months}))
 
 
 class CheckInSetView(APIView):
@@ -148,6 +320,8 @@ class CheckInSetView(APIView):
                     obj.duration_minutes = 0
             
             obj.save()
+            refresh_checkin_rollup.delay_on_commit(request.user.id, check_date.year, check_date.month)
+            refresh_availability_mask.delay_on_commit(request.user.id)
             
             return Response({
                 "ok": True, 
@@ -159,120 +333,273 @@ class CheckInSetView(APIView):
             })
         else:
             CheckIn.objects.filter(user=request.user, date=check_date).delete()
+            refresh_checkin_rollup.delay_on_commit(request.user.id, check_date.year, check_date.month)
+            refresh_availability_mask.delay_on_commit(request.user.id)
             return Response({"ok": True, "date": check_date.isoformat(), "value": False})
 
 
-def _overlap_count(a, b):
-    if not a or not b:
-        return 0
-    return len(set(a) & set(b))
+class AvailabilityView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """
+        Returns { windows: [{ weekday: 0-6, start_time: "HH:MM", end_time: "HH:MM" }],
+                  free: [...] } where "free" merges declared windows with slots the
+        user regularly plays in (from check-ins), as used by matching.
+        """
+        windows = AvailabilityWindow.objects.filter(user=request.user)
+        mask = Profile.objects.filter(user=request.user).values_list("availability_mask", flat=True).first()
+        return Response({
+            "windows": AvailabilityWindowSerializer(windows, many=True).data,
+            "free": availability.mask_to_windows(int.from_bytes(mask or b"", "big")),
+        })
+
+    def put(self, request):
+        """Body: { windows: [...] } replaces all declared windows."""
+        if not isinstance(request.data, dict):
+            return Response({"detail": "Body must be an object with a windows list"}, status=status.HTTP_400_BAD_REQUEST)
+        ser = AvailabilityWindowSerializer(data=request.data.get("windows", []), many=True)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            Profile.objects.get_or_create(user=request.user)
+            AvailabilityWindow.objects.filter(user=request.user).delete()
+            AvailabilityWindow.objects.bulk_create(
+                AvailabilityWindow(user=request.user, **attrs) for attrs in ser.validated_data
+            )
+            mask = availability.refresh_user_mask(request.user.id)
+        return Response({
+            "windows": ser.data,
+            "free": availability.mask_to_windows(mask),
+        })
+
+
+def _friend_exclusion_ids(user: User) -> set:
+    """Friends plus users with a pending request from ``user``, in one indexed UNION query."""
+    pending = FriendRequest.objects.filter(from_user=user, status=FriendRequest.STATUS_PENDING).values_list("to_user_id", flat=True).order_by()
+    return set(Friendship.friend_ids(user.id).union(pending))
+
+
+# Location robust match (normalize, alias, and fuzzy compare)
+@lru_cache(maxsize=4096)
+def _normalize_loc(loc: str) -> frozenset:
+    if not loc:
+        return frozenset()
+
+    s = unicodedata.normalize("NFKD", str(loc)).encode("ascii", "ignore").decode("ascii").lower()
+    s = s.replace(".", " ")
+    s = re.sub(r"[,\-_/\\|;:]+", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+
+    # Expand common abbreviations/nicknames to canonical phrases
+    phrase_aliases = {
+        "la": "los angeles",
+        "l a": "los angeles",
+        "nyc": "new york",
+        "sf": "san francisco",
+        "sfo": "san francisco",
+        "sj": "san jose",
+        "sd": "san diego",
+        "dfw": "dallas fort worth",
+        "bay area": "san francisco bay",
+    }
+    for k, v in phrase_aliases.items():
+        s = re.sub(rf"\b{k}\b", v, s)
+
+    # Handle glued words like "losangeles", "newyork"
+    s = re.sub(r"\blosangeles\b", "los angeles", s)
+    s = re.sub(r"\bnewyork\b", "new york", s)
+    s = re.sub(r"\bsanfrancisco\b", "san francisco", s)
+    s = re.sub(r"\bsanjose\b", "san jose", s)
+    s = re.sub(r"\bsandiego\b", "san diego", s)
+
+    tokens = [t for t in s.split(" ") if t]
+
+    # Remove generic geography/country noise
+    stop = {
+        "usa", "us", "united", "states", "america", "u", "s",
+        "uk", "cn", "prc", "people", "republic",
+        "the", "of", "and",
+        "city", "county", "province", "state", "region", "district",
+        "prefecture", "municipality", "metro", "area", "greater", "metropolitan",
+    }
+    # US state abbreviations (keep 'la' for Los Angeles handling above)
+    state_abbr = {
+        "al", "ak", "az", "ar", "ca", "co", "ct", "de", "fl", "ga", "hi", "id",
+        "il", "in", "ia", "ks", "ky", "me", "md", "ma", "mi", "mn", "ms", "mo",
+        "mt", "ne", "nv", "nh", "nj", "nm", "ny", "nc", "nd", "oh", "ok", "or",
+        "pa", "ri", "sc", "sd", "tn", "tx", "ut", "vt", "va", "wa", "wv", "wi", "wy", "dc"
+    }
+
+    cleaned = []
+    for t in tokens:
+        if t in stop:
+            continue
+        if t in state_abbr:
+            continue
+        cleaned.append(t)
+
+    return frozenset(cleaned)
+
+
+def _location_similarity(a: str, b: str) -> float:
+    A = _normalize_loc(a)
+    B = _normalize_loc(b)
+    if not A or not B:
+        return 0.0
+    inter = len(A & B)
+    union = len(A | B)
+    return inter / union if union else 0.0
+
+
+def _overlap_term(weight):
+    def term(a, b):
+        return weight * (a & b).bit_count()
+    return term
+
+
+def _availability_term(a, b):
+    # Shared weekly free time (30-minute slots), saturating at 4 hours
+    free_together = (a & b).bit_count()
+    return 2.0 * min(free_together, 8) / 8 if free_together else 0.0
+
+
+@lru_cache(maxsize=4096)
+def _skill_points(diff: float) -> float:
+    return 3.0 * exp(-0.8 * diff)
+
+
+def _skill_term(a, b):
+    # Skill level proximity, from computed ratings when both players have one
+    (rating1, skill1), (rating2, skill2) = a, b
+    if rating1 is not None and rating2 is not None:
+        return _skill_points(abs(rating1 - rating2))
+    if skill1 is not None and skill2 is not None:
+        return _skill_points(abs(skill1 - skill2))
+    return 0.0
+
+
+@lru_cache(maxsize=256)
+def _age_points(diff: int) -> float:
+    return 1.5 * exp(-0.05 * diff)
+
+
+def _age_term(a, b):
+    return _age_points(abs(a - b)) if a is not None and b is not None else 0.0
+
+
+@lru_cache(maxsize=4096)
+def _location_points(a: str, b: str) -> float:
+    sim = _location_similarity(a, b)
+    # Strong match if near-identical tokens (e.g., "Los Angeles, CA, USA" vs "Los Angeles/LA");
+    # partial match if, say, the city is the same but extra geo qualifiers differ
+    return 2.0 if sim >= 0.8 else 1.0 if sim >= 0.5 else 0.0
+
+
+def _location_term(a, b):
+    return _location_points(a, b) if a and b else 0.0
+
+
+# The signals of compute_match_score, each a function of one decoded value per player
+# (see _match_features, which decodes them in this order)
+MATCH_SCORE_TERMS = (
+    ("courts", _overlap_term(2.0)),
+    ("match_types", _overlap_term(2.0)),
+    ("intentions", _overlap_term(1.5)),
+    ("languages", _overlap_term(1.0)),
+    ("availability", _availability_term),
+    ("skill", _skill_term),
+    ("age", _age_term),
+    ("location", _location_term),
+)
+MATCH_SCORE_PARTS = tuple(name for name, _ in MATCH_SCORE_TERMS)
+
 
+def _match_features(profiles) -> list:
+    """Each profile's MATCH_SCORE_TERMS inputs: preference lists as bitmasks over a vocabulary shared
+    by ``profiles``, the availability bitmap, (rating in NTRP levels or None, skill_level), age, location.
 
-def compute_match_score(p1: Profile, p2: Profile) -> float:
-    score = 0.0
-    # Overlaps
-    score += 2.0 * _overlap_count(p1.preferred_court_types, p2.preferred_court_types)
-    score += 2.0 * _overlap_count(p1.preferred_match_types, p2.preferred_match_types)
-    score += 1.5 * _overlap_count(p1.play_intentions, p2.play_intentions)
-    score += 1.0 * _overlap_count(p1.preferred_languages, p2.preferred_languages)
-    # Skill level proximity
-    if p1.skill_level is not None and p2.skill_level is not None:
+    Ratings only count under MATCH_SKILL_SOURCE = "rating", once a player has RATING_MIN_MATCHES
+    results; otherwise the self-reported skill_level is compared.
+    """
+    vocab = {}
+
+    def bits(values):
+        mask = 0
+        for v in set(values or ()):
+            mask |= 1 << vocab.setdefault(v, len(vocab))
+        return mask
+
+    rated = getattr(settings, "MATCH_SKILL_SOURCE", "self_reported") == "rating"
+    min_matches = getattr(settings, "RATING_MIN_MATCHES", 5)
+    points_per_level = getattr(settings, "RATING_POINTS_PER_LEVEL", 400.0)
+    features = []
+    for p in profiles:
         try:
-            diff = abs(float(p1.skill_level) - float(p2.skill_level))
-            score += 3.0 * exp(-0.8 * diff)
+            skill = float(p.skill_level) if p.skill_level is not None else None
         except Exception:
-            pass
-    # Age proximity
-    if p1.age is not None and p2.age is not None:
+            skill = None
         try:
-            adiff = abs(int(p1.age) - int(p2.age))
-            score += 1.5 * exp(-0.05 * adiff)
+            age = int(p.age) if p.age is not None else None
         except Exception:
-            pass
-    # Location robust match (normalize, alias, and fuzzy compare)
-    def _normalize_loc(loc: str):
-
-        if not loc:
-            return set()
-
-        s = unicodedata.normalize("NFKD", str(loc)).encode("ascii", "ignore").decode("ascii").lower()
-        s = s.replace(".", " ")
-        s = re.sub(r"[,\-_/\\|;:]+", " ", s)
-        s = re.sub(r"\s+", " ", s).strip()
-
-        # Expand common abbreviations/nicknames to canonical phrases
-        phrase_aliases = {
-            "la": "los angeles",
-            "l a": "los angeles",
-            "nyc": "new york",
-            "sf": "san francisco",
-            "sfo": "san francisco",
-            "sj": "san jose",
-            "sd": "san diego",
-            "dfw": "dallas fort worth",
-            "bay area": "san francisco bay",
-        }
-        for k, v in phrase_aliases.items():
-            s = re.sub(rf"\b{k}\b", v, s)
-
-        # Handle glued words like "losangeles", "newyork"
-        s = re.sub(r"\blosangeles\b", "los angeles", s)
-        s = re.sub(r"\bnewyork\b", "new york", s)
-        s = re.sub(r"\bsanfrancisco\b", "san francisco", s)
-        s = re.sub(r"\bsanjose\b", "san jose", s)
-        s = re.sub(r"\bsandiego\b", "san diego", s)
-
-        tokens = [t for t in s.split(" ") if t]
-
-        # Remove generic geography/country noise
-        stop = {
-            "usa", "us", "united", "states", "america", "u", "s",
-            "uk", "cn", "prc", "people", "republic",
-            "the", "of", "and",
-            "city", "county", "province", "state", "region", "district",
-            "prefecture", "municipality", "metro", "area", "greater", "metropolitan",
-        }
-        # US state abbreviations (keep 'la' for Los Angeles handling above)
-        state_abbr = {
-            "al", "ak", "az", "ar", "ca", "co", "ct", "de", "fl", "ga", "hi", "id",
-            "il", "in", "ia", "ks", "ky", "me", "md", "ma", "mi", "mn", "ms", "mo",
-            "mt", "ne", "nv", "nh", "nj", "nm", "ny", "nc", "nd", "oh", "ok", "or",
-            "pa", "ri", "sc", "sd", "tn", "tx", "ut", "vt", "va", "wa", "wv", "wi", "wy", "dc"
-        }
+            age = None
+        level = p.rating / points_per_level if rated and p.rated_matches >= min_matches else None
+        features.append((
+            bits(p.preferred_court_types), bits(p.preferred_match_types), bits(p.play_intentions),
+            bits(p.preferred_languages), p.availability_bits, (level, skill), age, p.location or None,
+        ))
+    return features
+
+
+def match_score_parts(p1: Profile, p2: Profile) -> dict:
+    """Contribution of each signal to compute_match_score; signals that do not apply are 0."""
+    f1, f2 = _match_features([p1, p2])
+    return {name: term(a, b) for (name, term), a, b in zip(MATCH_SCORE_TERMS, f1, f2)}
+
+
+# Profile columns read by match_score_parts and matchprompt.compact_profile
+_MATCH_PROFILE_FIELDS = (
+    "user", "location", "skill_level", "age", "years_playing", "dominant_hand", "backhand_type",
+    "preferred_court_types", "preferred_match_types", "play_intentions", "preferred_languages",
+    "availability_mask", "rating", "rated_matches",
+)
 
-        cleaned = []
-        for t in tokens:
-            if t in stop:
-                continue
-            if t in state_abbr:
-                continue
-            cleaned.append(t)
-
-        return set(cleaned)
-
-    def _location_similarity(a: str, b: str) -> float:
-        A = _normalize_loc(a)
-        B = _normalize_loc(b)
-        if not A or not B:
-            return 0.0
-        inter = len(A & B)
-        union = len(A | B)
-        return inter / union if union else 0.0
-
-    if p1.location and p2.location:
-        sim = _location_similarity(p1.location, p2.location)
-        # Strong match if near-identical tokens (e.g., "Los Angeles, CA, USA" vs "Los Angeles/LA")
-        if sim >= 0.8:
-            score += 2.0
-        # Partial match (e.g., same city but extra geo qualifiers differ)
-        elif sim >= 0.5:
-            score += 1.0
 
+def compute_match_score(p1: Profile, p2: Profile) -> float:
+    score = 0.0
+    for value in match_score_parts(p1, p2).values():
+        score += value
     return score
 
 
+def match_score_matrix(profiles) -> list:
+    """compute_match_score for every pair of ``profiles``, as a symmetric list of rows (diagonal 0).
+
+    Sums the same MATCH_SCORE_TERMS in the same order, so the floats are
+    identical, but each profile is decoded once by _match_features and the
+    exp and location terms are memoized, so a pair costs eight small calls.
+    200 players are about 20k pairs.
+    """
+    features = _match_features(profiles)
+    terms = [term for _, term in MATCH_SCORE_TERMS]
+    n = len(features)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        f1 = features[i]
+        row = matrix[i]
+        for j in range(i + 1, n):
+            score = 0.0
+            for term, a, b in zip(terms, f1, features[j]):
+                score += term(a, b)
+            row[j] = matrix[j][i] = score
+    return matrix
+
+
 class RecommendMatchView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "matching"
+    throttle_costs = {"GET": 3}
+    load_shed = True
 
     def get(self, request):
         user = request.user
@@ -283,8 +610,7 @@ class RecommendMatchView(APIView):
 
         # Exclusions: self, already friends, and optional query param 'exclude'
         excluded_ids = set([user.id])
-        friend_ids = set(Friend.objects.filter(user=user).values_list("friend_id", flat=True))
-        excluded_ids.update(friend_ids)
+        excluded_ids.update(_friend_exclusion_ids(user))
         extra_exclude = request.query_params.get("exclude")
         if extra_exclude:
             try:
@@ -292,23 +618,21 @@ class RecommendMatchView(APIView):
             except Exception:
                 pass
 
-        candidates = User.objects.exclude(id__in=excluded_ids)
+        # Profiles with their users in one query; users without a profile are never candidates
+        candidates = Profile.objects.exclude(user_id__in=excluded_ids).select_related("user").order_by("user_id")
         best = None
         best_score = -1.0
-        for u in candidates:
-            try:
-                p2 = u.profile
-            except Profile.DoesNotExist:
-                continue
+        for p2 in candidates.iterator(chunk_size=2000):
             s = compute_match_score(p1, p2)
             if s > best_score:
                 best_score = s
-                best = u
+                best = p2.user
 
         if not best:
             return Response({"detail": "No candidates available"}, status=status.HTTP_404_NOT_FOUND)
 
-        data = RecommendationSerializer({"user": best, "score": best_score}, context={"request": request}).data
+        context = {"request": request, "presence": presence.lookup([best.id])}
+        data = RecommendationSerializer({"user": best, "score": best_score}, context=context).data
         return Response(data)
 
 
@@ -321,11 +645,17 @@ class MatchCandidatesView(APIView):
     Query params:
       - exclude: comma-separated user IDs to exclude (same logic as RecommendMatchView)
       - limit: optional max number (default 8, max 25)
+      - min_overlap: optional minimum shared free time in minutes; candidates
+        whose availability overlaps less are skipped before scoring
     Response shape:
       { "candidates": [ {"user": <UserSerializer>, "score": float } ] }
     """
 
     permission_classes = [permissions.IsAuthenticated]
+    # Same full-table scan as RecommendMatchView plus up to 25 serializations
+    throttle_scope = "matching"
+    throttle_costs = {"GET": 5}
+    load_shed = True
 
     def get(self, request):
         user = request.user
@@ -335,8 +665,7 @@ class MatchCandidatesView(APIView):
             return Response({"detail": "Profile not found for current user"}, status=status.HTTP_400_BAD_REQUEST)
 
         excluded_ids = set([user.id])
-        friend_ids = set(Friend.objects.filter(user=user).values_list("friend_id", flat=True))
-        excluded_ids.update(friend_ids)
+        excluded_ids.update(_friend_exclusion_ids(user))
         extra_exclude = request.query_params.get("exclude")
         if extra_exclude:
             try:
@@ -354,126 +683,1303 @@ class MatchCandidatesView(APIView):
         if limit > 25:
             limit = 25
 
-        candidates_qs = User.objects.exclude(id__in=excluded_ids)
+        try:
+            min_overlap_slots = -(-int(request.query_params.get("min_overlap", 0)) // availability.SLOT_MINUTES)
+        except ValueError:
+            min_overlap_slots = 0
+        my_free = p1.availability_bits
+
+        candidates_qs = Profile.objects.exclude(user_id__in=excluded_ids).select_related("user").order_by("user_id")
         scored = []
-        for u in candidates_qs:
-            try:
-                p2 = u.profile
-            except Profile.DoesNotExist:
+        for p2 in candidates_qs.iterator(chunk_size=2000):
+            if min_overlap_slots and availability.overlap_slots(my_free, p2.availability_bits) < min_overlap_slots:
                 continue
             s = compute_match_score(p1, p2)
-            scored.append((u, s))
+            scored.append((p2.user, s))
         # Sort by score descending then truncate
         scored.sort(key=lambda x: x[1], reverse=True)
         scored = scored[:limit]
 
-        out = [RecommendationSerializer({"user": u, "score": s}, context={"request": request}).data for (u, s) in scored]
+        context = {"request": request, "presence": presence.lookup(u.id for u, _ in scored)}
+        out = [RecommendationSerializer({"user": u, "score": s}, context=context).data for (u, s) in scored]
         return Response({"candidates": out})
 
 
+class EventPairingView(APIView):
+    """Pair a whole event's attendees at once instead of one greedy /match/recommend/ per person.
+
+    Body: { "player_ids": [int, ...], "format": "singles" | "doubles" }
+    Singles maximize the summed compute_match_score over all pairs (blossom
+    matching in pairing.py); doubles pick partners the same way, then put
+    teams on courts and split each foursome so the two teams' summed
+    skill_level is as even as possible.
+    Response:
+      singles: { "format", "matches": [{ "players": [id, id], "score": float }], "byes": [id], "total_score": float }
+      doubles: { "format", "courts": [{ "teams": [[id, id], [id, id]], "skill": [float, float] }], "byes": [id] }
+    Players without a profile are listed in "missing" and left out.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "matching"
+    throttle_costs = {"POST": 10}
+    load_shed = True
+
+    def post(self, request):
+        fmt = request.data.get("format", "singles")
+        if fmt not in ("singles", "doubles"):
+            return Response({"detail": "format must be 'singles' or 'doubles'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            player_ids = list(dict.fromkeys(int(x) for x in request.data.get("player_ids") or ()))
+        except (TypeError, ValueError):
+            return Response({"detail": "player_ids must be a list of user ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(player_ids) > getattr(settings, "EVENT_MAX_PLAYERS", 256):
+            return Response({"detail": "Too many players"}, status=status.HTTP_400_BAD_REQUEST)
+
+        by_user = Profile.objects.only(*_MATCH_PROFILE_FIELDS).in_bulk(player_ids, field_name="user_id")
+        profiles = [by_user[uid] for uid in player_ids if uid in by_user]
+        ids = [p.user_id for p in profiles]
+        matrix = match_score_matrix(profiles)
+
+        def weight(i, j):
+            # pairing.py needs integers; a thousandth of a point keeps every distinction that matters
+            return round(matrix[i][j] * 1000)
+
+        out = {"format": fmt}
+        if fmt == "singles":
+            pairs, byes = pairing.singles(len(ids), weight)
+            out["matches"] = [{"players": [ids[i], ids[j]], "score": round(matrix[i][j], 3)} for i, j in pairs]
+            out["total_score"] = round(sum(matrix[i][j] for i, j in pairs), 3)
+        else:
+            known = [float(p.skill_level) for p in profiles if p.skill_level is not None]
+            # Unknown levels count as the field's average
+            average = sum(known) / len(known) if known else 0.0
+            skill = [float(p.skill_level) if p.skill_level is not None else average for p in profiles]
+            courts, byes = pairing.doubles(
+                len(ids), weight, skill, getattr(settings, "EVENT_DOUBLES_BALANCE_WEIGHT", 4.0) * 1000
+            )
+            out["courts"] = [
+                {
+                    "teams": [[ids[a], ids[b]], [ids[c], ids[d]]],
+                    "skill": [round(skill[a] + skill[b], 2), round(skill[c] + skill[d], 2)],
+                }
+                for (a, b), (c, d) in courts
+            ]
+        out["byes"] = [ids[i] for i in byes]
+        out["missing"] = [uid for uid in player_ids if uid not in by_user]
+        return Response(out)
+
+
+_PROMPT_MAX_CHARS_CAP = 64000
+
+
+class MatchPromptView(APIView):
+    """The viewer and their top candidates in the compact schema of matchprompt.py, in one call.
+
+    Made for the AI matcher: each candidate carries its score and per-component
+    breakdown, and the list is cut to fit the caller's budget. Responses are
+    cached per viewer, keyed on their profile version, friend set and the query.
+    Query params:
+      - exclude: comma-separated user IDs to exclude (as MatchCandidatesView)
+      - limit: candidates to consider (default 8, max 25)
+      - max_tokens / max_chars: size budget for the whole JSON body (default MATCH_PROMPT_MAX_TOKENS)
+      - min_overlap: minimum shared free time in minutes (as MatchCandidatesView)
+    Response shape:
+      { "v": 1, "viewer": {...}, "candidates": [ {"id", "score", "parts": {...}, "profile": {...}} ],
+        "omitted": int, "budget": {"max_chars", "used_chars", "est_tokens"} }
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "matching"
+    throttle_costs = {"GET": 3}
+    load_shed = True
+
+    def get(self, request):
+        user = request.user
+        try:
+            p1 = Profile.objects.select_related("user").get(user=user)
+        except Profile.DoesNotExist:
+            return Response({"detail": "Profile not found for current user"}, status=status.HTTP_400_BAD_REQUEST)
+        params = request.query_params
+        try:
+            limit = min(max(int(params.get("limit") or 8), 1), 25)
+        except ValueError:
+            limit = 8
+        max_chars = _PROMPT_MAX_CHARS_CAP
+        try:
+            max_chars = min(max_chars, int(params.get("max_tokens") or getattr(settings, "MATCH_PROMPT_MAX_TOKENS", 1200)) * matchprompt.CHARS_PER_TOKEN)
+            if params.get("max_chars"):
+                max_chars = min(max_chars, int(params["max_chars"]))
+        except ValueError:
+            return Response({"detail": "max_tokens and max_chars must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        # Below this not even the viewer fits; answer with an empty candidate list rather than an error
+        max_chars = max(max_chars, 256)
+        try:
+            min_overlap_slots = -(-int(params.get("min_overlap", 0)) // availability.SLOT_MINUTES)
+        except ValueError:
+            min_overlap_slots = 0
+        exclude = set()
+        try:
+            exclude.update(int(x) for x in params.get("exclude", "").split(",") if x.strip())
+        except ValueError:
+            pass
+        # Keyed on the database state the result depends on, so every worker builds the same key
+        excluded_ids = sorted({p1.user_id, *_friend_exclusion_ids(user), *exclude})
+
+        key = "match-prompt:" + hashlib.blake2b(repr((
+            user.id, p1.updated_at, excluded_ids, limit, max_chars, min_overlap_slots,
+        )).encode(), digest_size=16).hexdigest()
+        cache = caches[getattr(settings, "MATCH_PROMPT_CACHE_ALIAS", "default")]
+        cached = cache.get(key)
+        if cached is None:
+            cached = (timezone.now().isoformat(), self._build(p1, excluded_ids, limit, max_chars, min_overlap_slots))
+            cache.set(key, cached, timeout=getattr(settings, "MATCH_PROMPT_CACHE_TTL", 120))
+        generated_at, body = cached
+        validators = Validators(key, generated_at)
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        return validators.apply(Response(body))
+
+    def _build(self, p1, excluded_ids, limit, max_chars, min_overlap_slots):
+        my_free = p1.availability_bits
+        profiles = (
+            Profile.objects.exclude(user_id__in=excluded_ids)
+            .select_related("user")
+            .only("user__username", *_MATCH_PROFILE_FIELDS)
+        )
+        scored = []
+        for p2 in profiles.iterator(chunk_size=2000):
+            if min_overlap_slots and availability.overlap_slots(my_free, p2.availability_bits) < min_overlap_slots:
+                continue
+            parts = match_score_parts(p1, p2)
+            scored.append((sum(parts.values()), p2.user_id, p2, parts))
+        top = heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1]))
+        candidates = [matchprompt.compact_candidate(p2, score, parts) for score, _, p2, parts in top]
+        return matchprompt.fit_budget(matchprompt.compact_profile(p1), candidates, max_chars)
+
+
+class PresenceView(APIView):
+    """GET ?ids=1,2,3 (at most PRESENCE_LOOKUP_MAX) -> { presence: { "<id>": {status, last_seen[, until]} } }.
+
+    Only friends (and yourself) are looked up; other ids are left out like
+    offline users. Friend lists and match candidates already carry the same
+    entry as ``presence``.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            ids = [int(x) for x in request.query_params.get("ids", "").split(",") if x.strip()]
+        except ValueError:
+            return Response({"detail": "ids must be comma-separated integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > getattr(settings, "PRESENCE_LOOKUP_MAX", 200):
+            return Response({"detail": "Too many ids"}, status=status.HTTP_400_BAD_REQUEST)
+        visible = friend_graph.friends_among(request.user.id, ids)
+        if request.user.id in ids:
+            visible.append(request.user.id)
+        states = presence.lookup(visible)
+        return Response({"presence": {str(uid): entry for uid, entry in states.items()}})
+
+
+class PresencePingView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """
+        Body: { "status": "online" | "playing" | "offline", "minutes": int (optional, for playing) }
+        "playing" lasts `minutes` (default: until the end of today's check-in if it has an end time
+        still ahead, else PRESENCE_PLAYING_MINUTES); "online" ends it; "offline" hides you at once.
+        """
+        state = request.data.get("status", presence.ONLINE)
+        user_id = request.user.id
+        if state == "offline":
+            presence.clear(user_id, offline=True)
+            return Response({"presence": None})
+        if state == presence.ONLINE:
+            presence.clear(user_id)
+            presence.heartbeat(user_id, force=True)
+        elif state == presence.PLAYING:
+            now = timezone.now()
+            try:
+                minutes = int(request.data["minutes"]) if request.data.get("minutes") is not None else None
+            except (TypeError, ValueError):
+                return Response({"detail": "minutes must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if minutes is None:
+                local = timezone.localtime(now)
+                end_time = (
+                    CheckIn.objects.filter(user_id=user_id, date=local.date(), end_time__gt=local.time())
+                    .values_list("end_time", flat=True).first()
+                )
+                if end_time is not None:
+                    until = timezone.make_aware(dt_datetime.combine(local.date(), end_time))
+                else:
+                    until = now + timedelta(minutes=getattr(settings, "PRESENCE_PLAYING_MINUTES", 90))
+            elif 0 < minutes <= 24 * 60:
+                until = now + timedelta(minutes=minutes)
+            else:
+                return Response({"detail": "minutes must be between 1 and 1440"}, status=status.HTTP_400_BAD_REQUEST)
+            presence.set_playing(user_id, until)
+        else:
+            return Response({"detail": "status must be online, playing or offline"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"presence": presence.lookup([user_id]).get(user_id)})
+
+
 class FriendListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        qs = Friend.objects.filter(user=request.user).select_related("friend", "friend__profile")
-        ser = FriendSerializer(qs, many=True, context={"request": request})
+        qs = (
+            Friendship.objects.filter(models.Q(user1=request.user) | models.Q(user2=request.user))
+            .select_related("user1__profile", "user2__profile")
+        )
+        friendships = list(qs)
+        states = presence.lookup(f.other(request.user.id).id for f in friendships)
+        ser = FriendshipSerializer(friendships, many=True, context={"request": request, "presence": states})
         return Response(ser.data)
 
     def post(self, request):
-        ser = FriendSerializer(data=request.data, context={"request": request})
-        if ser.is_valid():
-            friend_user: User = ser.validated_data["friend"]
-            if friend_user.id == request.user.id:
-                return Response({"detail": "Cannot add yourself as friend"}, status=status.HTTP_400_BAD_REQUEST)
-            obj, _created = Friend.objects.get_or_create(user=request.user, friend=friend_user)
-            out = FriendSerializer(obj, context={"request": request}).data
-            return Response(out, status=status.HTTP_201_CREATED)
-        return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        """
+        Body: { "friend_id": int }
+        Sends a friend request, or accepts the other user's pending request to us.
+        """
+        ser = FriendRequestSerializer(
+            data={"to_user_id": request.data.get("friend_id", request.data.get("to_user_id"))},
+            context={"request": request},
+        )
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        other: User = ser.validated_data["to_user"]
+        if other.id == request.user.id:
+            return Response({"detail": "Cannot add yourself as friend"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if Friendship.between(request.user.id, other.id).exists():
+                return Response({"detail": "Already friends"}, status=status.HTTP_200_OK)
+            reverse = FriendRequest.objects.filter(
+                from_user=other, to_user=request.user, status=FriendRequest.STATUS_PENDING
+            ).first()
+            if reverse is not None:
+                friend_request = _accept_friend_request(reverse)
+            else:
+                friend_request, created = FriendRequest.objects.get_or_create(from_user=request.user, to_user=other)
+                if not created and friend_request.status != FriendRequest.STATUS_PENDING:
+                    # Re-sending after a decline
+                    friend_request.status = FriendRequest.STATUS_PENDING
+                    friend_request.responded_at = None
+                    friend_request.save(update_fields=["status", "responded_at"])
+        out = FriendRequestSerializer(friend_request, context={"request": request}).data
+        return Response(out, status=status.HTTP_201_CREATED)
+
+
+def _accept_friend_request(friend_request: FriendRequest) -> FriendRequest:
+    friend_request.status = FriendRequest.STATUS_ACCEPTED
+    friend_request.responded_at = timezone.now()
+    friend_request.save(update_fields=["status", "responded_at"])
+    u1, u2 = Friendship.pair(friend_request.from_user_id, friend_request.to_user_id)
+    Friendship.objects.get_or_create(user1_id=u1, user2_id=u2)
+    return friend_request
+
+
+class FriendRequestListView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Returns { incoming: [...], outgoing: [...] } pending friend requests."""
+        pending = FriendRequest.objects.filter(status=FriendRequest.STATUS_PENDING).select_related(
+            "from_user__profile", "to_user__profile"
+        )
+        ctx = {"request": request}
+        return Response({
+            "incoming": FriendRequestSerializer(pending.filter(to_user=request.user), many=True, context=ctx).data,
+            "outgoing": FriendRequestSerializer(pending.filter(from_user=request.user), many=True, context=ctx).data,
+        })
+
+
+class FriendRequestDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, request_id: int):
+        """Body: { "action": "accept" | "decline" } (recipient only)."""
+        action = request.data.get("action")
+        if action not in ("accept", "decline"):
+            return Response({"detail": "action must be 'accept' or 'decline'"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            try:
+                friend_request = FriendRequest.objects.select_for_update().get(
+                    id=request_id, to_user=request.user, status=FriendRequest.STATUS_PENDING
+                )
+            except FriendRequest.DoesNotExist:
+                return Response({"detail": "Friend request not found"}, status=status.HTTP_404_NOT_FOUND)
+            if action == "accept":
+                _accept_friend_request(friend_request)
+            else:
+                friend_request.status = FriendRequest.STATUS_DECLINED
+                friend_request.responded_at = timezone.now()
+                friend_request.save(update_fields=["status", "responded_at"])
+        out = FriendRequestSerializer(friend_request, context={"request": request}).data
+        return Response(out)
+
+    def delete(self, request, request_id: int):
+        """Withdraw a pending request (sender only)."""
+        FriendRequest.objects.filter(
+            id=request_id, from_user=request.user, status=FriendRequest.STATUS_PENDING
+        ).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FriendSuggestionsView(APIView):
+    """People you may know: second-degree connections ranked by mutual friends.
+
+    Candidates come from the cached friend graph (``graph.friend_graph``); the
+    ``SUGGESTION_POOL_SIZE`` with the most mutual friends are then scored as
+    ``compute_match_score + SUGGESTION_MUTUAL_WEIGHT * mutual_friends``.
+    Query params:
+      - limit: optional max number (default 10, max 50)
+    Response shape:
+      { "suggestions": [ {"user": <UserBriefSerializer>, "mutual_friends": int, "score": float } ] }
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 50)
+        except ValueError:
+            limit = 10
+
+        mutual = friend_graph.second_degree(user.id)
+        for uid in _friend_exclusion_ids(user):
+            mutual.pop(uid, None)
+        pool = mutual.most_common(getattr(settings, "SUGGESTION_POOL_SIZE", 200))
+        if not pool:
+            return Response({"suggestions": []})
+
+        try:
+            p1 = Profile.objects.get(user=user)
+        except Profile.DoesNotExist:
+            p1 = None
+        weight = getattr(settings, "SUGGESTION_MUTUAL_WEIGHT", 2.0)
+        users = {u.id: u for u in User.objects.filter(id__in=[uid for uid, _ in pool]).select_related("profile")}
+        scored = []
+        for uid, n in pool:
+            u = users.get(uid)
+            if u is None:
+                continue
+            try:
+                base = compute_match_score(p1, u.profile) if p1 is not None else 0.0
+            except Profile.DoesNotExist:
+                base = 0.0
+            scored.append((u, n, base + weight * n))
+        scored.sort(key=lambda x: x[2], reverse=True)
+
+        out = [
+            {"user": UserBriefSerializer(u, context={"request": request}).data, "mutual_friends": n, "score": s}
+            for (u, n, s) in scored[:limit]
+        ]
+        return Response({"suggestions": out})
 
 
 class FriendDeleteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, friend_id: int):
-        Friend.objects.filter(user=request.user, friend_id=friend_id).delete()
+        """Unfriend; also clears requests between the pair so either side can ask again."""
+        with transaction.atomic():
+            Friendship.between(request.user.id, friend_id).delete()
+            FriendRequest.objects.filter(
+                models.Q(from_user=request.user, to_user_id=friend_id) | models.Q(from_user_id=friend_id, to_user=request.user)
+            ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UserDetailView(APIView):
+_LIVE_SESSION_STATUSES = (Session.STATUS_PROPOSED, Session.STATUS_ACCEPTED)
+
+
+def _session_queryset():
+    return Session.objects.select_related("court", "organizer__profile").prefetch_related(
+        models.Prefetch("participants", queryset=SessionParticipant.objects.select_related("user__profile"))
+    )
+
+
+def _court_is_busy(court_id: int, start, end, exclude_session_id=None) -> bool:
+    """Whether a proposed or accepted session already holds the court during [start, end)."""
+    qs = Session.objects.filter(
+        court_id=court_id,
+        status__in=_LIVE_SESSION_STATUSES,
+        start_at__gt=start - Session.MAX_LENGTH,
+        start_at__lt=end,
+        end_at__gt=start,
+    )
+    if exclude_session_id is not None:
+        qs = qs.exclude(id=exclude_session_id)
+    return qs.exists()
+
+
+def _busy_players(user_ids, start, end, exclude_session_id=None) -> list:
+    """Users among ``user_ids`` with an accepted seat in a live session overlapping [start, end)."""
+    qs = SessionParticipant.objects.filter(
+        user_id__in=user_ids,
+        active=True,
+        status=SessionParticipant.STATUS_ACCEPTED,
+        start_at__gt=start - Session.MAX_LENGTH,
+        start_at__lt=end,
+        end_at__gt=start,
+    )
+    if exclude_session_id is not None:
+        qs = qs.exclude(session_id=exclude_session_id)
+    return sorted(set(qs.values_list("user_id", flat=True)))
+
+
+def _book_session_checkins(session: Session):
+    """Put an accepted session on every player's calendar (existing check-ins for the day are left alone)."""
+    start, end = timezone.localtime(session.start_at), timezone.localtime(session.end_at)
+    defaults = {
+        "start_time": start.time().replace(second=0, microsecond=0),
+        "end_time": end.time().replace(second=0, microsecond=0) if end.date() == start.date() else None,
+        "duration_minutes": int((end - start).total_seconds() // 60),
+    }
+    for seat in session.participants.all():
+        checkin, created = CheckIn.objects.get_or_create(user_id=seat.user_id, date=start.date(), defaults=defaults)
+        if created:
+            seat.checkin = checkin
+            seat.save(update_fields=["checkin"])
+            refresh_checkin_rollup.delay_on_commit(seat.user_id, start.year, start.month)
+            refresh_availability_mask.delay_on_commit(seat.user_id)
+
+
+def _cancel_session(session: Session):
+    session.status = Session.STATUS_CANCELLED
+    session.save(update_fields=["status", "updated_at"])
+    session.participants.update(active=False)
+    booked = list(session.participants.filter(checkin__isnull=False).values_list("user_id", "checkin__date"))
+    CheckIn.objects.filter(id__in=session.participants.filter(checkin__isnull=False).values("checkin_id")).delete()
+    for user_id, day in booked:
+        refresh_checkin_rollup.delay_on_commit(user_id, day.year, day.month)
+        refresh_availability_mask.delay_on_commit(user_id)
+
+
+class CourtListCreateView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(CourtSerializer(Court.objects.all(), many=True).data)
+
+    def post(self, request):
+        ser = CourtSerializer(data=request.data)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        ser.save()
+        return Response(ser.data, status=status.HTTP_201_CREATED)
+
+
+class SessionListCreateView(APIView):
+    """Sessions the current user has a seat in.
+
+    Proposing a session holds the court for [start_at, end_at) until it is
+    cancelled; the court row is locked while checking for overlaps so two
+    concurrent proposals for the same slot cannot both succeed. Players are
+    only refused for overlapping sessions they have already accepted.
+    Query params (GET):
+      - all: "1" to include past and cancelled sessions (default: upcoming, not cancelled)
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        qs = _session_queryset().filter(participants__user=request.user)
+        if request.query_params.get("all") not in ("1", "true", "yes"):
+            qs = qs.filter(end_at__gte=timezone.now(), status__in=_LIVE_SESSION_STATUSES)
+        return Response(SessionSerializer(qs, many=True, context={"request": request}).data)
+
+    def post(self, request):
+        """Body: { "court_id": int, "start_at": ISO datetime, "end_at": ISO datetime, "participant_ids": [int] }"""
+        ser = SessionSerializer(data=request.data, context={"request": request})
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = ser.validated_data
+        start, end = data["start_at"], data["end_at"]
+        invited = [uid for uid in data["participant_ids"] if uid != request.user.id]
+        if not invited:
+            return Response({"detail": "Invite at least one other player"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            court = Court.objects.select_for_update().get(id=data["court"].id)
+            if _court_is_busy(court.id, start, end):
+                return Response({"detail": "Court is already booked for that time"}, status=status.HTTP_409_CONFLICT)
+            busy = _busy_players([request.user.id, *invited], start, end)
+            if busy:
+                return Response(
+                    {"detail": "Some players already have a session at that time", "user_ids": busy},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            session = Session.objects.create(court=court, organizer=request.user, start_at=start, end_at=end)
+            SessionParticipant.objects.bulk_create(
+                SessionParticipant(
+                    session=session,
+                    user_id=uid,
+                    status=SessionParticipant.STATUS_ACCEPTED if uid == request.user.id else SessionParticipant.STATUS_INVITED,
+                    start_at=start,
+                    end_at=end,
+                )
+                for uid in [request.user.id, *invited]
+            )
+        out = SessionSerializer(_session_queryset().get(id=session.id), context={"request": request}).data
+        return Response(out, status=status.HTTP_201_CREATED)
+
+
+class SessionDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, session_id: int):
+        session = _session_queryset().filter(id=session_id, participants__user=request.user).first()
+        if session is None:
+            return Response({"detail": "Session not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(SessionSerializer(session, context={"request": request}).data)
+
+    def post(self, request, session_id: int):
+        """
+        Body: { "action": "accept" | "decline" | "cancel" }
+        The session becomes accepted (and lands on everyone's calendar) once every
+        player has accepted; a decline or cancel by any player cancels it.
+        """
+        action = request.data.get("action")
+        if action not in ("accept", "decline", "cancel"):
+            return Response({"detail": "action must be 'accept', 'decline' or 'cancel'"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            try:
+                session = Session.objects.select_for_update().get(
+                    id=session_id, participants__user=request.user, status__in=_LIVE_SESSION_STATUSES
+                )
+                seat = session.participants.get(user=request.user)
+            except (Session.DoesNotExist, SessionParticipant.DoesNotExist):
+                return Response({"detail": "Session not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            if action == "accept":
+                if seat.status != SessionParticipant.STATUS_ACCEPTED:
+                    if _busy_players([request.user.id], session.start_at, session.end_at, exclude_session_id=session.id):
+                        return Response({"detail": "You already have a session at that time"}, status=status.HTTP_409_CONFLICT)
+                    seat.status = SessionParticipant.STATUS_ACCEPTED
+                    seat.save(update_fields=["status"])
+                pending = session.participants.exclude(status=SessionParticipant.STATUS_ACCEPTED).exists()
+                if not pending and session.status != Session.STATUS_ACCEPTED:
+                    session.status = Session.STATUS_ACCEPTED
+                    session.save(update_fields=["status", "updated_at"])
+                    _book_session_checkins(session)
+            else:
+                if action == "decline":
+                    seat.status = SessionParticipant.STATUS_DECLINED
+                    seat.save(update_fields=["status"])
+                _cancel_session(session)
+        out = SessionSerializer(_session_queryset().get(id=session.id), context={"request": request}).data
+        return Response(out)
+
+
+class MatchResultListCreateView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Results the current user played in, pending and disputed ones included, newest first (limit param, default 20, max 100)."""
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        qs = MatchResult.objects.filter(
+            models.Q(winner=request.user) | models.Q(loser=request.user)
+        ).select_related("winner__profile", "loser__profile")[:limit]
+        return Response(MatchResultSerializer(qs, many=True, context={"request": request}).data)
+
+    def post(self, request):
+        """
+        Body: { "opponent_id": int, "won": bool, "played_at": ISO datetime (optional, default now),
+                "score": str (optional), "session_id": int (optional) }
+        Records a singles result as pending; ratings change once the opponent confirms it
+        with POST /matches/results/<id>/.
+        """
+        ser = MatchResultSerializer(data=request.data, context={"request": request})
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = ser.validated_data
+        opponent = data["opponent"]
+        if opponent.id == request.user.id:
+            return Response({"detail": "Cannot record a match against yourself"}, status=status.HTTP_400_BAD_REQUEST)
+        session = data.get("session")
+        if session is not None:
+            players = set(session.participants.filter(status=SessionParticipant.STATUS_ACCEPTED).values_list("user_id", flat=True))
+            if session.status != Session.STATUS_ACCEPTED or players != {request.user.id, opponent.id}:
+                return Response({"detail": "Session is not an accepted singles session between you two"}, status=status.HTTP_400_BAD_REQUEST)
+
+        winner, loser = (request.user, opponent) if data["won"] else (opponent, request.user)
+        try:
+            # The session column is unique: of two concurrent reports, one fails here
+            with transaction.atomic():
+                result = MatchResult.objects.create(
+                    winner=winner,
+                    loser=loser,
+                    played_at=data.get("played_at") or (session.end_at if session else timezone.now()),
+                    score=data.get("score", ""),
+                    session=session,
+                    reported_by=request.user,
+                )
+        except IntegrityError:
+            return Response({"detail": "A result was already recorded for this session"}, status=status.HTTP_409_CONFLICT)
+        result = MatchResult.objects.select_related("winner__profile", "loser__profile").get(id=result.id)
+        return Response(MatchResultSerializer(result, context={"request": request}).data, status=status.HTTP_201_CREATED)
+
+
+class MatchResultDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, result_id: int):
+        """
+        Body: { "action": "confirm" | "dispute" }, from the player who did not report the result.
+        Confirming rates it (and for a league fixture updates the standings and books both
+        players' check-ins); disputing keeps it unrated and frees its session or fixture for a new report.
+        """
+        action = request.data.get("action") if isinstance(request.data, dict) else None
+        if action not in ("confirm", "dispute"):
+            return Response({"detail": "action must be confirm or dispute"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            result = (
+                MatchResult.objects.select_for_update()
+                .filter(models.Q(winner=request.user) | models.Q(loser=request.user), id=result_id)
+                .first()
+            )
+            if result is None:
+                return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+            if result.confirmer_id != request.user.id:
+                return Response({"detail": "Only your opponent can confirm this result"}, status=status.HTTP_403_FORBIDDEN)
+            if result.status != MatchResult.STATUS_PENDING:
+                return Response({"detail": f"Result is already {result.status}"}, status=status.HTTP_409_CONFLICT)
+            fixture = Fixture.objects.select_for_update().select_related("league").filter(result=result).first()
+            if action == "confirm":
+                result.status = MatchResult.STATUS_CONFIRMED
+                result.confirmed_at = timezone.now()
+                result.save(update_fields=["status", "confirmed_at"])
+                if fixture is not None:
+                    fixture.result = result
+                    leagues.confirm_result(fixture)
+                else:
+                    rating.rate_result(result)
+            else:
+                result.status = MatchResult.STATUS_DISPUTED
+                result.session = None
+                result.save(update_fields=["status", "session"])
+                if fixture is not None:
+                    fixture.result = None
+                    fixture.save(update_fields=["result"])
+        result = MatchResult.objects.select_related("winner__profile", "loser__profile").get(id=result.id)
+        return Response(MatchResultSerializer(result, context={"request": request}).data)
+
+
+def _leagues_for(user):
+    """Leagues ``user`` organizes, plays in or is invited to, with their membership status as my_status."""
+    return (
+        League.objects.select_related("organizer__profile")
+        .filter(
+            models.Q(organizer=user)
+            | models.Q(members__user=user, members__status__in=[LeagueMember.STATUS_INVITED, LeagueMember.STATUS_ACCEPTED])
+        )
+        .annotate(my_status=models.Subquery(
+            LeagueMember.objects.filter(league=models.OuterRef("pk"), user=user).values("status")[:1]
+        ))
+        .distinct()
+    )
+
+
+def _league_for(user, league_id: int):
+    """The league if ``user`` organizes, plays in or is invited to it, else None."""
+    return _leagues_for(user).filter(id=league_id).first()
+
+
+class LeagueListCreateView(APIView):
+    """Leagues the current user organizes or plays in."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(LeagueSerializer(_leagues_for(request.user), many=True, context={"request": request}).data)
+
+    def post(self, request):
+        """
+        Body: { "name": str, "format": "round_robin" | "swiss", "starts_on": date,
+                "member_ids": [int], "round_days": int (default 7),
+                "points_win": int (default 3), "points_loss": int (default 0) }
+        The listed players are invited and play once they accept with
+        POST /leagues/<id>/membership/; the organizer, if listed, plays from the start.
+        Fixtures are created separately with POST /leagues/<id>/rounds/.
+        """
+        ser = LeagueSerializer(data=request.data, context={"request": request})
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        member_ids = ser.validated_data.pop("member_ids")
+        if len(member_ids) > getattr(settings, "LEAGUE_MAX_MEMBERS", 512):
+            return Response({"detail": "Too many players"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            league = ser.save(organizer=request.user)
+            LeagueMember.objects.bulk_create(
+                LeagueMember(
+                    league=league,
+                    user_id=uid,
+                    status=LeagueMember.STATUS_ACCEPTED if uid == request.user.id else LeagueMember.STATUS_INVITED,
+                )
+                for uid in member_ids
+            )
+        league = _league_for(request.user, league.id)
+        return Response(LeagueSerializer(league, context={"request": request}).data, status=status.HTTP_201_CREATED)
+
+
+class LeagueMembershipView(APIView):
+    """Answer an invitation to a league.
+
+    Body: { "action": "accept" | "decline" }. A round robin's fixtures are all
+    generated at once, so it takes no new players after that; a Swiss league
+    does, starting them on zero points. Players with fixtures cannot decline.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, league_id: int):
+        action = request.data.get("action") if isinstance(request.data, dict) else None
+        if action not in ("accept", "decline"):
+            return Response({"detail": "action must be accept or decline"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            member = (
+                LeagueMember.objects.select_for_update()
+                .select_related("league")
+                .filter(league_id=league_id, user=request.user)
+                .first()
+            )
+            if member is None:
+                return Response({"detail": "League not found"}, status=status.HTTP_404_NOT_FOUND)
+            league = member.league
+            if action == "accept":
+                if member.status != LeagueMember.STATUS_ACCEPTED:
+                    if league.format == League.FORMAT_ROUND_ROBIN and league.rounds_generated:
+                        return Response({"detail": "The fixtures were already generated"}, status=status.HTTP_409_CONFLICT)
+                    member.status = LeagueMember.STATUS_ACCEPTED
+                    member.save(update_fields=["status"])
+            elif member.status != LeagueMember.STATUS_DECLINED:
+                if Fixture.objects.filter(models.Q(player1=request.user) | models.Q(player2=request.user), league=league).exists():
+                    return Response({"detail": "You already have fixtures in this league"}, status=status.HTTP_409_CONFLICT)
+                member.status = LeagueMember.STATUS_DECLINED
+                member.save(update_fields=["status"])
+        league = _league_for(request.user, league_id)
+        if league is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(LeagueSerializer(league, context={"request": request}).data)
+
+
+class LeagueDetailView(APIView):
+    """The league and its table.
+
+    Response: { ...league, "standings": [{ "rank", "user", "played", "won", "lost", "byes", "points" }] }
+    Only players who accepted are listed. Rows are ordered by points, wins, fewest losses, then rating; they are kept
+    up to date as results are recorded, so this is a single indexed read.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, league_id: int):
+        league = _league_for(request.user, league_id)
+        if league is None:
+            return Response({"detail": "League not found"}, status=status.HTTP_404_NOT_FOUND)
+        out = LeagueSerializer(league, context={"request": request}).data
+        rows = LeagueStandingSerializer(leagues.ranked_members(league), many=True, context={"request": request}).data
+        out["standings"] = [{"rank": rank, **row} for rank, row in enumerate(rows, start=1)]
+        return Response(out)
+
+
+class LeagueRoundsView(APIView):
+    """Generate fixtures (organizer only).
+
+    Only players who accepted their invitation get fixtures.
+    Round robin: every remaining round at once, one round per round_days from starts_on.
+    Swiss: the next round, paired from the current table without rematches
+    where possible. Body: { "force": bool } starts it even though the previous
+    round still has unplayed fixtures (they stay open).
+    Each fixture gets the earliest start both players are usually free for, at
+    least LEAGUE_MIN_REST_HOURS from their other fixtures and sessions; the
+    rest have "starts_at": null.
+    Response: { "rounds": [first, last], "fixtures": int, "unscheduled": int, "byes": int }
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, league_id: int):
+        league = League.objects.filter(id=league_id, organizer=request.user).first()
+        if league is None:
+            return Response({"detail": "League not found"}, status=status.HTTP_404_NOT_FOUND)
+        player_count = leagues.players(league).count()
+        if player_count < 2:
+            return Response({"detail": "Fewer than two players have accepted"}, status=status.HTTP_409_CONFLICT)
+        if league.format == League.FORMAT_ROUND_ROBIN:
+            if league.rounds_generated >= leagues.round_robin_rounds(player_count):
+                return Response({"detail": "All rounds were already generated"}, status=status.HTTP_409_CONFLICT)
+        elif request.data.get("force") not in (True, "1", "true"):
+            open_count = Fixture.objects.filter(
+                league=league, round=league.rounds_generated, status=Fixture.STATUS_SCHEDULED
+            ).count()
+            if open_count:
+                return Response(
+                    {"detail": f"Round {league.rounds_generated} still has unplayed fixtures", "open": open_count},
+                    status=status.HTTP_409_CONFLICT,
+                )
+        first = league.rounds_generated + 1
+        # Pairing and scheduling only read. The inserts go in short transactions of whole rounds, so
+        # other writers wait for one batch at most; a request that fails midway is resumed by the next
+        rows = leagues.plan(league)
+        expected = league.rounds_generated
+        for batch in leagues.batches(rows):
+            with transaction.atomic():
+                locked = League.objects.select_for_update().get(id=league.id)
+                if locked.rounds_generated != expected:
+                    return Response({"detail": "Fixtures were generated concurrently"}, status=status.HTTP_409_CONFLICT)
+                leagues.create(locked, batch)
+                expected = locked.rounds_generated
+        return Response(
+            {
+                "rounds": [first, expected],
+                "fixtures": len(rows),
+                "unscheduled": sum(1 for _, _, b, _, start in rows if b is not None and start is None),
+                "byes": sum(1 for _, _, b, _, _ in rows if b is None),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class LeagueFixturesView(APIView):
+    """
+    Query params:
+      - round: only this round
+      - mine: "1" for the current user's fixtures only
+      - limit: default 500, max 2000 (ordered by round)
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, league_id: int):
+        league = _league_for(request.user, league_id)
+        if league is None:
+            return Response({"detail": "League not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limit = min(max(int(request.query_params.get("limit", 500)), 1), 2000)
+        except ValueError:
+            limit = 500
+        qs = Fixture.objects.filter(league=league).select_related("result")
+        round_param = request.query_params.get("round")
+        if round_param:
+            try:
+                qs = qs.filter(round=int(round_param))
+            except ValueError:
+                return Response({"detail": "round must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get("mine") in ("1", "true", "yes"):
+            qs = qs.filter(models.Q(player1=request.user) | models.Q(player2=request.user))
+        return Response(FixtureSerializer(qs[:limit], many=True).data)
+
+
+class FixtureResultView(APIView):
+    """Report a fixture's result; either player can.
+
+    Body: { "won": bool, "score": str (optional), "played_at": ISO datetime (optional) }
+    played_at is when the match finished; it defaults to the scheduled start
+    plus LEAGUE_MATCH_MINUTES when that has passed, else now. The result is
+    pending until the opponent confirms it with POST /matches/results/<id>/,
+    which rates the match, updates both standings rows and adds the match to
+    both players' check-ins.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, league_id: int, fixture_id: int):
+        ser = FixtureResultSerializer(data=request.data)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = ser.validated_data
+        now = timezone.now()
+        with transaction.atomic():
+            fixture = (
+                Fixture.objects.select_for_update()
+                .select_related("league")
+                .filter(models.Q(player1=request.user) | models.Q(player2=request.user), id=fixture_id, league_id=league_id)
+                .first()
+            )
+            if fixture is None:
+                return Response({"detail": "Fixture not found"}, status=status.HTTP_404_NOT_FOUND)
+            if fixture.status != Fixture.STATUS_SCHEDULED or fixture.result_id is not None:
+                return Response({"detail": "This fixture already has a result"}, status=status.HTTP_409_CONFLICT)
+            played_at = data.get("played_at")
+            if played_at is None:
+                planned_end = fixture.starts_at + leagues.match_length() if fixture.starts_at else None
+                played_at = planned_end if planned_end is not None and planned_end <= now else now
+            elif played_at > now:
+                return Response({"detail": "played_at is in the future"}, status=status.HTTP_400_BAD_REQUEST)
+            opponent_id = fixture.player2_id if fixture.player1_id == request.user.id else fixture.player1_id
+            winner_id = request.user.id if data["won"] else opponent_id
+            leagues.record_result(fixture, winner_id, played_at, data["score"], reported_by=request.user)
+        fixture = Fixture.objects.select_related("result").get(id=fixture.id)
+        return Response(FixtureSerializer(fixture).data, status=status.HTTP_201_CREATED)
+
+
+class UserDetailView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, user_id: int):
+    async def get(self, request, user_id: int):
+        version = await (
+            User.objects.filter(id=user_id)
+            .values_list("username", "email", "first_name", "last_name", "profile__updated_at")
+            .afirst()
+        )
+        if version is None:
+            return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        validators = Validators(user_id, *version, last_modified=version[-1])
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
         try:
-            user = User.objects.get(id=user_id)
+            user = await User.objects.select_related("profile").aget(id=user_id)
         except User.DoesNotExist:
             return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
         data = UserSerializer(user, context={"request": request}).data
-        return Response(data)
+        return validators.apply(Response(data))
 
 
-def _get_or_create_thread(current_user: User, other_user: User) -> ChatThread:
+async def _get_or_create_thread(current_user: User, other_user: User) -> ChatThread:
     # Normalize order
     u1, u2 = (current_user, other_user) if current_user.id < other_user.id else (other_user, current_user)
-    thread, _ = ChatThread.objects.get_or_create(user1=u1, user2=u2)
+    thread, created = await ChatThread.objects.aget_or_create(user1=u1, user2=u2)
+    if created:
+        await ChatMember.objects.abulk_create(
+            [ChatMember(thread=thread, user=u1), ChatMember(thread=thread, user=u2)], ignore_conflicts=True
+        )
+    # An existing row comes back with bare FKs; attach the users we already hold
+    thread.user1, thread.user2 = u1, u2
     return thread
 
 
-class ChatThreadListCreateView(APIView):
+async def _thread_for_member(thread_id: int, user: User):
+    """(thread, membership, error response). Direct threads are checked on user1/user2 without
+    touching ChatMember; membership is then None."""
+    try:
+        thread = await ChatThread.objects.aget(id=thread_id)
+    except ChatThread.DoesNotExist:
+        return None, None, Response({"detail": "Thread not found"}, status=status.HTTP_404_NOT_FOUND)
+    if thread.is_direct:
+        if user.id in (thread.user1_id, thread.user2_id):
+            return thread, None, None
+        return None, None, Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    member = await ChatMember.objects.filter(thread=thread, user=user).afirst()
+    if member is None:
+        return None, None, Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    return thread, member, None
+
+
+class ChatThreadListCreateView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
-        qs = ChatThread.objects.filter(models.Q(user1=request.user) | models.Q(user2=request.user)).select_related("user1", "user2")
-        ser = ChatThreadSerializer(qs, many=True, context={"request": request})
-        return Response(ser.data)
-
-    def post(self, request):
+    async def get(self, request):
+        qs = ChatThread.objects.filter(members__user=request.user)
+        # The list renders the other participant's brief profile, so their edits must change the ETag too;
+        # new messages move Max(last_message_id) and reading moves the sum of this user's cursors
+        version = await qs.aaggregate(
+            n=models.Count("id"),
+            last=models.Max("created_at"),
+            p1=models.Max("user1__profile__updated_at"),
+            p2=models.Max("user2__profile__updated_at"),
+            msg=models.Max("last_message_id"),
+            read=models.Sum("members__last_read_message_id"),
+        )
+        validators = Validators(
+            request.user.id, version["n"], version["last"], version["p1"], version["p2"], version["msg"], version["read"]
+        )
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        qs = qs.annotate(last_read_message_id=models.F("members__last_read_message_id"))
+        threads = await self._with_unread(qs.select_related("user1__profile", "user2__profile"))
+        ser = ChatThreadSerializer(threads, many=True, context={"request": request})
+        return validators.apply(Response(ser.data))
+
+    async def _with_unread(self, qs):
+        unread = (
+            ChatMessage.objects.filter(thread=models.OuterRef("pk"), id__gt=models.OuterRef("last_read_message_id"))
+            .order_by()
+            .values("thread")
+            .annotate(n=models.Count("id"))
+            .values("n")
+        )
+        return [t async for t in qs.annotate(unread=Coalesce(models.Subquery(unread), 0))]
+
+    async def post(self, request):
+        """
+        Body: { "other_user_id": int } for a direct thread (returns the existing one if any), or
+              { "kind": "group" | "channel", "title": str, "member_ids": [int] } for a group
+        conversation; the creator becomes its admin. Only admins post in channels.
+        """
+        kind = request.data.get("kind", ChatThread.KIND_DIRECT)
+        if kind in (ChatThread.KIND_GROUP, ChatThread.KIND_CHANNEL):
+            return await self._create_group(request, kind)
         other_user_id = request.data.get("other_user_id")
         try:
-            other = User.objects.get(id=int(other_user_id))
+            other = await User.objects.select_related("profile").aget(id=int(other_user_id))
         except Exception:
             return Response({"detail": "Invalid other_user_id"}, status=status.HTTP_400_BAD_REQUEST)
         if other.id == request.user.id:
             return Response({"detail": "Cannot start chat with yourself"}, status=status.HTTP_400_BAD_REQUEST)
-        thread = _get_or_create_thread(request.user, other)
+        thread = await _get_or_create_thread(request.user, other)
+        # The serializer only renders the other participant, whose profile is already loaded
         data = ChatThreadSerializer(thread, context={"request": request}).data
         return Response(data, status=status.HTTP_201_CREATED)
 
+    async def _create_group(self, request, kind):
+        title = str(request.data.get("title", "")).strip()[:100]
+        if not title:
+            return Response({"detail": "title is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            member_ids = {int(x) for x in request.data.get("member_ids", [])}
+        except (TypeError, ValueError):
+            return Response({"detail": "member_ids must be a list of user ids"}, status=status.HTTP_400_BAD_REQUEST)
+        member_ids.discard(request.user.id)
+        found = [uid async for uid in User.objects.filter(id__in=member_ids).values_list("id", flat=True)]
+        if len(found) != len(member_ids):
+            return Response({"detail": "Unknown user id in member_ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(found) > getattr(settings, "CHAT_GROUP_MAX_MEMBERS", 500):
+            return Response({"detail": "Too many members"}, status=status.HTTP_400_BAD_REQUEST)
+
+        thread = await ChatThread.objects.acreate(kind=kind, title=title, created_by=request.user)
+        await ChatMember.objects.abulk_create(
+            [ChatMember(thread=thread, user=request.user, role=ChatMember.ROLE_ADMIN)]
+            + [ChatMember(thread=thread, user_id=uid) for uid in found]
+        )
+        data = ChatThreadSerializer(thread, context={"request": request}).data
+        return Response(data, status=status.HTTP_201_CREATED)
 
-class ChatThreadMessagesView(APIView):
+
+class ChatThreadMessagesView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    # Only posting costs tokens; polling stays unthrottled
+    throttle_scope = "chat"
+    throttle_costs = {"POST": 1}
 
-    def get(self, request, thread_id: int):
-        try:
-            thread = ChatThread.objects.select_related("user1", "user2").get(id=thread_id)
-        except ChatThread.DoesNotExist:
-            return Response({"detail": "Thread not found"}, status=status.HTTP_404_NOT_FOUND)
-        if request.user.id not in (thread.user1_id, thread.user2_id):
-            return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    async def get(self, request, thread_id: int):
+        """
+        Without since/after/before/limit: every message in the hot table, preceded by the newest
+        archived ones when there are fewer than 50, so a thread whose history was archived
+        does not open empty; page further back with before.
+        Query params:
+          - since: ISO datetime; only messages created after it
+          - after: message id; only messages with a larger id
+          - wait: with since/after, seconds (max 25) to hold the request open until a message arrives
+          - before / limit: page backwards instead; the `limit` (default 50, max 200) messages
+            before message id `before` (default: newest), read from the archive once past the hot table
+        """
+        thread, _, error = await _thread_for_member(thread_id, request.user)
+        if error is not None:
+            return error
+        # An open chat (and above all a long poll) is the clearest sign of someone being online
+        presence.heartbeat(request.user.id)
+        if request.query_params.get("before") or request.query_params.get("limit"):
+            return await self._page(request, thread)
 
         since = request.query_params.get("since")
-        qs = ChatMessage.objects.filter(thread=thread)
+        filters = {}
         if since:
             try:
                 from django.utils.dateparse import parse_datetime
                 dt = parse_datetime(since)
                 if dt is not None:
-                    qs = qs.filter(created_at__gt=dt)
+                    filters["created_at__gt"] = dt
             except Exception:
                 pass
-        ser = ChatMessageSerializer(qs, many=True, context={"request": request})
+        after = request.query_params.get("after")
+        if after and after.isdigit():
+            filters["id__gt"] = int(after)
+        messages = await self._fetch(self._queryset(thread).filter(**filters), thread)
+        if not (since or after) and thread.archived_through_id and len(messages) < 50:
+            cursor = messages[0].id if messages else thread.archived_through_id + 1
+            older = await sync_to_async(archive.archived_messages)(thread, cursor, 50 - len(messages))
+            messages = older[::-1] + messages
+
+        try:
+            wait = min(max(float(request.query_params.get("wait", 0)), 0.0), 25.0)
+        except ValueError:
+            wait = 0.0
+        if not messages and wait and (since or after):
+            if await chat_hub.wait(thread.id, wait) is not None:
+                messages = await self._fetch(self._queryset(thread, fresh=True).filter(**filters), thread)
+        ser = ChatMessageSerializer(messages, many=True, context={"request": request})
         return Response(ser.data)
 
-    def post(self, request, thread_id: int):
+    async def _page(self, request, thread):
         try:
-            thread = ChatThread.objects.get(id=thread_id)
-        except ChatThread.DoesNotExist:
-            return Response({"detail": "Thread not found"}, status=status.HTTP_404_NOT_FOUND)
-        if request.user.id not in (thread.user1_id, thread.user2_id):
-            return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+            limit = min(max(int(request.query_params.get("limit") or 50), 1), 200)
+            before = int(request.query_params["before"]) if request.query_params.get("before") else None
+        except ValueError:
+            return Response({"detail": "before and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        qs = self._queryset(thread).order_by("-id")
+        if before is not None:
+            qs = qs.filter(id__lt=before)
+        messages = await self._fetch(qs[:limit], thread)
+        if len(messages) < limit and thread.archived_through_id:
+            cursor = messages[-1].id if messages else min(before or thread.archived_through_id + 1, thread.archived_through_id + 1)
+            messages += await sync_to_async(archive.archived_messages)(thread, cursor, limit - len(messages))
+        messages.reverse()
+        ser = ChatMessageSerializer(messages, many=True, context={"request": request})
+        return Response(ser.data)
+
+    async def post(self, request, thread_id: int):
+        thread, member, error = await _thread_for_member(thread_id, request.user)
+        if error is not None:
+            return error
+        if thread.kind == ChatThread.KIND_CHANNEL and member.role != ChatMember.ROLE_ADMIN:
+            return Response({"detail": "Only channel admins can post"}, status=status.HTTP_403_FORBIDDEN)
         content = request.data.get("content", "").strip()
         if not content:
             return Response({"detail": "Message content required"}, status=status.HTTP_400_BAD_REQUEST)
-        msg = ChatMessage.objects.create(thread=thread, sender=request.user, content=content)
-        data = ChatMessageSerializer(msg, context={"request": request}).data
+        msg = await self._store(thread, request.user, content)
+        chat_hub.publish(thread.id, msg.id)
+        presence.heartbeat(request.user.id)
+        # request.user comes from authentication without its profile; let the serializer load it off the event loop
+        data = await sync_to_async(lambda: ChatMessageSerializer(msg, context={"request": request}).data)()
         return Response(data, status=status.HTTP_201_CREATED)
 
+    def _queryset(self, thread, fresh=False):
+        qs = ChatMessage.objects.filter(thread=thread).select_related("sender__profile")
+        # After a wake-up the message was just committed on the primary; a replica may not have it yet
+        return qs.using(routing.PRIMARY) if fresh else qs
+
+    async def _fetch(self, qs, thread):
+        return [m async for m in qs]
+
+    async def _store(self, thread, sender, content):
+        # One row per message whatever the member count; the FTS index follows via triggers
+        msg = await ChatMessage.objects.acreate(thread=thread, sender=sender, content=content)
+        await ChatThread.objects.filter(id=thread.id, last_message_id__lt=msg.id).aupdate(last_message_id=msg.id)
+        await ChatMember.objects.filter(
+            thread=thread, user=sender, last_read_message_id__lt=msg.id
+        ).aupdate(last_read_message_id=msg.id)
+        return msg
+
+
+class ShardedChatThreadListCreateView(ChatThreadListCreateView):
+    """ChatThreadListCreateView for CHAT_SHARDS: threads come from the directory in the default
+    database and unread counts from one grouped query per shard (see sharding.py)."""
+
+    async def _with_unread(self, qs):
+        threads = [t async for t in qs]
+        await sync_to_async(sharding.count_unread)(threads)
+        return threads
+
+
+class ShardedChatThreadMessagesView(ChatThreadMessagesView):
+    """ChatThreadMessagesView for CHAT_SHARDS: messages are read from and written to the thread's
+    shard, with ids from the shared sequence and senders attached from the default database."""
+
+    def _queryset(self, thread, fresh=False):
+        return ChatMessage.objects.using(sharding.alias_for(thread)).filter(thread_id=thread.id)
+
+    async def _fetch(self, qs, thread):
+        messages = [m async for m in qs]
+        return await sync_to_async(sharding.attach_senders)(messages, thread)
+
+    async def _store(self, thread, sender, content):
+        return await sync_to_async(sharding.store_message)(thread, sender, content)
+
+
+class ChatThreadReadView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def post(self, request, thread_id: int):
+        """Body: { "message_id": int (optional, default: newest) } moves the read cursor forward."""
+        thread, _, error = await _thread_for_member(thread_id, request.user)
+        if error is not None:
+            return error
+        try:
+            message_id = min(int(request.data.get("message_id") or thread.last_message_id), thread.last_message_id)
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid message_id"}, status=status.HTTP_400_BAD_REQUEST)
+        await ChatMember.objects.filter(
+            thread=thread, user=request.user, last_read_message_id__lt=message_id
+        ).aupdate(last_read_message_id=message_id)
+        return Response({"thread_id": thread.id, "last_read_message_id": message_id})
+
+
+class ChatThreadMembersView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request, thread_id: int):
+        thread, _, error = await _thread_for_member(thread_id, request.user)
+        if error is not None:
+            return error
+        members = [m async for m in ChatMember.objects.filter(thread=thread).select_related("user__profile").order_by("joined_at")]
+        return Response(ChatMemberSerializer(members, many=True, context={"request": request}).data)
+
+    async def post(self, request, thread_id: int):
+        """Body: { "user_id": int } adds a member (group admins only)."""
+        thread, member, error = await _thread_for_member(thread_id, request.user)
+        if error is not None:
+            return error
+        if thread.is_direct or member.role != ChatMember.ROLE_ADMIN:
+            return Response({"detail": "Only group admins can add members"}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            user = await User.objects.select_related("profile").aget(id=int(request.data.get("user_id")))
+        except Exception:
+            return Response({"detail": "Invalid user_id"}, status=status.HTTP_400_BAD_REQUEST)
+        # New members start with the existing history already read
+        added, created = await ChatMember.objects.aget_or_create(
+            thread=thread, user=user, defaults={"last_read_message_id": thread.last_message_id}
+        )
+        added.user = user
+        data = ChatMemberSerializer(added, context={"request": request}).data
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    async def delete(self, request, thread_id: int, user_id: int):
+        """Leave a group (user_id = yourself) or remove a member (admins)."""
+        thread, member, error = await _thread_for_member(thread_id, request.user)
+        if error is not None:
+            return error
+        if thread.is_direct:
+            return Response({"detail": "Cannot leave a direct thread"}, status=status.HTTP_400_BAD_REQUEST)
+        if user_id != request.user.id and member.role != ChatMember.ROLE_ADMIN:
+            return Response({"detail": "Only group admins can remove members"}, status=status.HTTP_403_FORBIDDEN)
+        await ChatMember.objects.filter(thread=thread, user_id=user_id).adelete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChatSearchView(AsyncAPIView):
+    """Full-text search over messages in the current user's threads (see search.py).
+    Messages moved to the archive (see archive.py) are no longer found.
+
+    Query params:
+      - q: search text; every word must match, the last one as a prefix
+      - limit: optional page size (default 20, max 50)
+      - before: message id cursor from the previous page's "next_before"
+    Response shape:
+      { "results": [ {<ChatMessageSerializer>, "thread_id": int, "highlights": [[start, end], ...] } ],
+        "next_before": int | null }
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        q = request.query_params.get("q", "").strip()
+        if not search.terms(q):
+            return Response({"detail": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), 50)
+            before = int(request.query_params["before"]) if request.query_params.get("before") else None
+        except ValueError:
+            return Response({"detail": "limit and before must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        hits = await sync_to_async(search.search_messages)(request.user, q, limit=limit, before=before)
+        results = [
+            {**ChatMessageSerializer(msg, context={"request": request}).data, "thread_id": msg.thread_id, "highlights": spans}
+            for msg, spans in hits
+        ]
+        return Response({
+            "results": results,
+            "next_before": hits[-1][0].id if len(hits) == limit else None,
+        })
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "tennisweb_backend.api.middleware.TrafficCaptureMiddleware",
+    "tennisweb_backend.api.middleware.CompressionMiddleware",
+    "tennisweb_backend.api.middleware.LoadSheddingMiddleware",
+    "tennisweb_backend.api.middleware.InvalidationMiddleware",
+    "tennisweb_backend.api.middleware.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -82,9 +88,44 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Every transaction.atomic() block takes SQLite's write lock at BEGIN, read-only ones included, so
+        # check-then-insert transactions (court booking, whose select_for_update is a no-op on SQLite)
+        # serialize instead of failing with "database is locked" on upgrade; atomic blocks queue on each other
+        "OPTIONS": {"transaction_mode": "IMMEDIATE"},
     }
 }
 
+# Read replicas (api.routing.ReplicaRouter): GET/HEAD requests read from these aliases unless the
+# user wrote in the last REPLICA_STICKY_SECONDS or no replica passes its health probe. Set
+# TENNISWEB_REPLICA_DB to a copy of db.sqlite3 to try it locally.
+DATABASE_REPLICAS = []
+if os.environ.get("TENNISWEB_REPLICA_DB"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["TENNISWEB_REPLICA_DB"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append("replica")
+
+DATABASE_ROUTERS = ["tennisweb_backend.api.routing.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = 10
+# "memory" keeps sticky windows per worker; "cache" shares them through CACHES[REPLICA_STICKY_CACHE_ALIAS]
+REPLICA_STICKY_STORE = "memory"
+REPLICA_HEALTH_INTERVAL = 5.0
+REPLICA_RETRY_SECONDS = 30.0
+
+# Sharded chat storage (api.sharding): aliases in DATABASES holding ChatMessage rows, one shard per
+# thread; empty keeps messages in "default". Shards need `migrate --database <alias>`.
+# TENNISWEB_CHAT_SHARDS=N adds N local SQLite shards to try it.
+CHAT_SHARDS = []
+for _i in range(int(os.environ.get("TENNISWEB_CHAT_SHARDS", 0))):
+    DATABASES[f"chat_shard_{_i}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"chat_shard_{_i}.sqlite3",
+        "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+    }
+    CHAT_SHARDS.append(f"chat_shard_{_i}")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,12 +173,155 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Django REST framework & CORS settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "tennisweb_backend.api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "tennisweb_backend.api.throttling.TokenBucketThrottle",
+    ),
+    # orjson-backed when installed, stdlib json otherwise
+    "DEFAULT_RENDERER_CLASSES": (
+        "tennisweb_backend.api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "tennisweb_backend.api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+}
+
+# Token buckets for TokenBucketThrottle: views pick a scope and per-method token costs
+RATE_LIMIT_BUCKETS = {
+    "matching": {"capacity": 30, "refill_rate": 0.5},
+    "chat": {"capacity": 20, "refill_rate": 1.0},
+    # Full data exports: a few back to back, then one per 10 minutes
+    "export": {"capacity": 3, "refill_rate": 1 / 600},
 }
+# "memory" keeps buckets per worker process; "cache" shares them through CACHES[RATE_LIMIT_CACHE_ALIAS]
+RATE_LIMIT_STORE = "memory"
+
+# Per-worker load shedding for views with load_shed = True (api.middleware.LoadSheddingMiddleware)
+LOAD_SHED_MAX_INFLIGHT = 16
+LOAD_SHED_LATENCY_MS = 1500
+
+# People-you-may-know (FriendSuggestionsView): how many second-degree candidates get
+# profile-scored, and the score added per mutual friend
+SUGGESTION_POOL_SIZE = 200
+SUGGESTION_MUTUAL_WEIGHT = 2.0
+
+# Check-in history counted as availability: slots played in at least MIN_COUNT times in the last DAYS days
+AVAILABILITY_HISTORY_DAYS = 90
+AVAILABILITY_HISTORY_MIN_COUNT = 2
+
+# Largest member list accepted when creating a group chat or broadcast channel
+CHAT_GROUP_MAX_MEMBERS = 500
+
+# Chat retention (`manage.py archive_chats`): messages older than this many months move into
+# compressed per-thread ChatArchive blobs of up to CHAT_ARCHIVE_BLOB_MESSAGES messages; None disables it
+CHAT_RETENTION_MONTHS = 12
+CHAT_ARCHIVE_BLOB_MESSAGES = 1000
+# "zstd" needs the optional zstandard package, otherwise archives are gzip
+CHAT_ARCHIVE_CODEC = "zstd"
+
+# Cross-worker cache invalidation (api.invalidation): "database" (ChangeEvent table), "redis"
+# (stream at INVALIDATION_REDIS_URL) or "local" (single process/tests). Workers apply other
+# workers' changes at most POLL_INTERVAL seconds late; log rows live for LOG_RETENTION seconds.
+# Each worker remembers versions for the MAX_VERSIONS most recently changed keys.
+INVALIDATION_BACKEND = "database"
+INVALIDATION_POLL_INTERVAL = 1.0
+INVALIDATION_LOG_RETENTION = 3600
+INVALIDATION_MAX_VERSIONS = 50000
+
+# Glicko-2 ratings (api.rating): system constant tau, and days per rating period for deviation growth while idle
+RATING_TAU = 0.5
+RATING_PERIOD_DAYS = 30
+# compute_match_score's skill term: "self_reported" uses Profile.skill_level; "rating" uses the computed
+# rating for players with at least RATING_MIN_MATCHES results, RATING_POINTS_PER_LEVEL points per NTRP level
+MATCH_SKILL_SOURCE = "self_reported"
+RATING_MIN_MATCHES = 5
+RATING_POINTS_PER_LEVEL = 400.0
+
+# GET /api/match/prompt/: default size budget (tokens at 4 chars each) and how long a viewer's
+# result is reused; the cache key includes their profile's updated_at and the ids excluded (friends, pending requests)
+MATCH_PROMPT_MAX_TOKENS = 1200
+MATCH_PROMPT_CACHE_TTL = 120
+MATCH_PROMPT_CACHE_ALIAS = "default"
+
+# Background tasks (api.taskqueue): "database" rows run by `manage.py run_tasks`,
+# "memory" for an in-process thread pool, "immediate" to run inline
+TASK_QUEUE_BACKEND = "database"
+TASK_QUEUE_CONCURRENCY = 2
+# Seconds before a task left "running" by a dead worker is picked up again
+TASK_LOCK_TIMEOUT = 600
+# Seconds run_tasks keeps finished and failed task rows, and after which a queued task counts as
+# overdue (logged as a warning: without a run_tasks worker nothing runs them)
+TASK_RETENTION = 7 * 86400
+TASK_FAILED_RETENTION = 30 * 86400
+TASK_STALL_WARNING = 300
+
+# POST /api/match/event/: largest attendee list, and how many match-score points one NTRP level of
+# difference between the two teams on a doubles court costs when teams are put on courts
+EVENT_MAX_PLAYERS = 256
+EVENT_DOUBLES_BALANCE_WEIGHT = 4.0
+
+# Leagues (api.leagues): largest league, how long a fixture is booked for, the gap kept between a
+# player's fixtures and sessions, and how far down the table a Swiss pairing looks for an opponent
+LEAGUE_MAX_MEMBERS = 512
+LEAGUE_MATCH_MINUTES = 90
+LEAGUE_MIN_REST_HOURS = 20
+LEAGUE_SWISS_WINDOW = 24
+
+# Online presence (api.presence): a heartbeat keeps a user online for PRESENCE_TTL seconds and is
+# written at most every WRITE_INTERVAL per worker; "playing" pings last PLAYING_MINUTES by default.
+# PRESENCE_STORE "memory" is per process; "cache" shares it through the PRESENCE_CACHE_ALIAS cache,
+# by default files every worker on this host reads (point it at Redis or Memcached across hosts).
+# gunicorn.conf.py refuses to start several workers unless the store is shared.
+PRESENCE_STORE = "cache"
+PRESENCE_CACHE_ALIAS = "presence"
+PRESENCE_TTL = 90
+PRESENCE_WRITE_INTERVAL = 20
+PRESENCE_PLAYING_MINUTES = 90
+PRESENCE_LOOKUP_MAX = 200
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "presence": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "presence",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
+# Longest span GET /api/checkins/range/ serves in one call
+CHECKIN_RANGE_MAX_MONTHS = 120
+
+# Uploaded avatars are downscaled in the background to this many pixels on the longest side
+AVATAR_MAX_SIZE = 512
+
+# Request capture for `manage.py replay_traffic` (api.traffic): off by default. Keeps the SAMPLE
+# fraction of API requests as anonymized NDJSON, rotating at MAX_BYTES with BACKUPS old files;
+# user pseudonyms are keyed with SALT (SECRET_KEY when unset)
+TRAFFIC_CAPTURE = os.environ.get("TENNISWEB_TRAFFIC_CAPTURE") == "1"
+TRAFFIC_CAPTURE_SAMPLE = 1.0
+TRAFFIC_CAPTURE_PATH = BASE_DIR / "traffic.ndjson"
+TRAFFIC_CAPTURE_MAX_BYTES = 50 * 1024 * 1024
+TRAFFIC_CAPTURE_BACKUPS = 5
+TRAFFIC_CAPTURE_SALT = None
+
+# Response compression (api.middleware.CompressionMiddleware)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+RESPONSE_BROTLI_QUALITY = 4
+
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "tennisweb_backend.api.serializers.VersionedTokenObtainPairSerializer",
+}
+
+# Seconds an authenticated user's row is served from the in-process cache
+# before being re-read (bounds how long a deactivated user keeps access)
+AUTH_USER_CACHE_TTL = 10
 
 # Allow local development origins (adjust in production)
 CORS_ALLOW_ALL_ORIGINS = True
@@ -146,3 +330,12 @@ CORS_ALLOW_ALL_ORIGINS = True
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Media delivery (api.media): MEDIA_SENDFILE hands file bodies to the front-end server, either
+# "x-accel-redirect" (nginx, with an internal location at ACCEL_PREFIX aliased to MEDIA_ROOT) or
+# "x-sendfile"; unset, Django streams them itself. Non content-addressed files are cached CACHE_MAX_AGE s.
+MEDIA_SENDFILE = os.environ.get("TENNISWEB_MEDIA_SENDFILE") or None
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+MEDIA_CACHE_MAX_AGE = 24 * 3600
+# Store new avatars under the hash of their bytes, sharing one file between identical uploads (api.storage)
+MEDIA_CONTENT_ADDRESSED = os.environ.get("TENNISWEB_MEDIA_CONTENT_ADDRESSED") == "1"
+
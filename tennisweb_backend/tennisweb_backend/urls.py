@@ -15,14 +15,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from tennisweb_backend.api import media
+from urllib.parse import urlsplit
+import re
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("tennisweb_backend.api.urls")),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded files, in production too (api/media.py); not needed when MEDIA_URL points at another host
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns += [
+        re_path(r"^%s(?P<path>.+)$" % re.escape(settings.MEDIA_URL.lstrip("/")), media.serve, name="media"),
+    ]
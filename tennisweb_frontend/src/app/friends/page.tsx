@@ -2,8 +2,8 @@
 
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import Link from 'next/link';
-import { createOrGetThread, deleteFriend, fetchFriends } from '@/lib/api';
-import type { FriendItem } from '@/lib/types';
+import { cancelFriendRequest, createOrGetThread, deleteFriend, fetchFriendRequests, fetchFriends, respondFriendRequest } from '@/lib/api';
+import type { FriendItem, FriendRequests } from '@/lib/types';
 import { useRouter } from 'next/navigation';
 import { useEffect } from 'react';
 import { useAuth } from '@/components/AuthProvider';
@@ -20,17 +20,65 @@ export default function FriendsPage() {
   }, [loading, isAuthenticated, router]);
   const { data, isLoading, isError } = useQuery<FriendItem[]>({ queryKey: ['friends'], queryFn: fetchFriends, enabled: isAuthenticated });
 
+  const requestsQuery = useQuery<FriendRequests>({ queryKey: ['friend-requests'], queryFn: fetchFriendRequests, enabled: isAuthenticated });
+
   const removeMutation = useMutation({
     mutationFn: (friendUserId: number) => deleteFriend(friendUserId),
     onSuccess: () => qc.invalidateQueries({ queryKey: ['friends'] }),
   });
 
+  const respondMutation = useMutation({
+    mutationFn: ({ requestId, action }: { requestId: number; action: 'accept' | 'decline' }) => respondFriendRequest(requestId, action),
+    onSuccess: () => {
+      qc.invalidateQueries({ queryKey: ['friend-requests'] });
+      qc.invalidateQueries({ queryKey: ['friends'] });
+    },
+  });
+
+  const cancelMutation = useMutation({
+    mutationFn: (requestId: number) => cancelFriendRequest(requestId),
+    onSuccess: () => qc.invalidateQueries({ queryKey: ['friend-requests'] }),
+  });
+
+  const incoming = requestsQuery.data?.incoming ?? [];
+  const outgoing = requestsQuery.data?.outgoing ?? [];
+
   if (!isAuthenticated) {
     return <div className="mx-auto max-w-3xl p-6">Redirecting to Login…</div>;
   }
 
   return (
     <div className="mx-auto max-w-3xl p-6">
+      {incoming.length > 0 && (
+        <section className="mb-6">
+          <h2 className="text-lg font-semibold mb-3">Friend Requests</h2>
+          <ul className="space-y-3">
+            {incoming.map((req) => (
+              <li key={req.id} className="flex items-center gap-4 rounded-lg border border-gray-200 p-4 bg-white">
+                <Link href={`/users/${req.from_user.id}`} className="flex-1 font-medium hover:text-indigo-600 transition-colors">
+                  {req.from_user.profile?.display_name || req.from_user.username}
+                  <span className="ml-2 text-sm text-gray-500 font-normal">@{req.from_user.username}</span>
+                </Link>
+                <button
+                  onClick={() => respondMutation.mutate({ requestId: req.id, action: 'accept' })}
+                  className="inline-flex items-center justify-center rounded-md bg-indigo-600 px-3 py-1.5 text-sm font-semibold text-white hover:bg-indigo-500 disabled:opacity-50"
+                  disabled={respondMutation.isPending}
+                >
+                  Accept
+                </button>
+                <button
+                  onClick={() => respondMutation.mutate({ requestId: req.id, action: 'decline' })}
+                  className="inline-flex items-center justify-center rounded-md border border-gray-300 px-3 py-1.5 text-sm font-semibold text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+                  disabled={respondMutation.isPending}
+                >
+                  Decline
+                </button>
+              </li>
+            ))}
+          </ul>
+        </section>
+      )}
+
       <h1 className="text-2xl font-bold mb-4">Your Friends</h1>
       {isLoading && <div>Loading…</div>}
       {isError && <div className="text-red-600">Failed to load friends.</div>}
@@ -80,6 +128,29 @@ export default function FriendsPage() {
           ))}
         </ul>
       )}
+
+      {outgoing.length > 0 && (
+        <section className="mt-6">
+          <h2 className="text-lg font-semibold mb-3">Sent Requests</h2>
+          <ul className="space-y-3">
+            {outgoing.map((req) => (
+              <li key={req.id} className="flex items-center gap-4 rounded-lg border border-gray-200 p-4 bg-white">
+                <Link href={`/users/${req.to_user.id}`} className="flex-1 font-medium hover:text-indigo-600 transition-colors">
+                  {req.to_user.profile?.display_name || req.to_user.username}
+                  <span className="ml-2 text-sm text-gray-500 font-normal">Pending</span>
+                </Link>
+                <button
+                  onClick={() => cancelMutation.mutate(req.id)}
+                  className="inline-flex items-center justify-center rounded-md border border-gray-300 px-3 py-1.5 text-sm font-semibold text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+                  disabled={cancelMutation.isPending}
+                >
+                  Cancel
+                </button>
+              </li>
+            ))}
+          </ul>
+        </section>
+      )}
     </div>
   );
 }
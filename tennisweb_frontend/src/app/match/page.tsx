@@ -41,8 +41,9 @@ export default function MatchPage() {
   const addFriendMutation = useMutation({
     mutationFn: (friendId: number) => addFriend(friendId),
     onSuccess: () => {
-      // refresh friends cache
+      // A request, or an accepted one when they had asked us first
       qc.invalidateQueries({ queryKey: ['friends'] });
+      qc.invalidateQueries({ queryKey: ['friend-requests'] });
     },
   });
 
@@ -176,7 +177,7 @@ export default function MatchPage() {
                   className="inline-flex items-center justify-center rounded-md bg-indigo-600 px-4 py-2 text-sm font-semibold text-white shadow-sm hover:bg-indigo-500 disabled:opacity-50"
                   disabled={addFriendMutation.isPending}
                 >
-                  Save to Friends
+                  Add Friend
                 </button>
                 <button
                   onClick={() => handleNext(algoQuery.data.user.id)}
@@ -261,7 +262,7 @@ export default function MatchPage() {
                   className="inline-flex items-center justify-center rounded-md bg-purple-600 px-4 py-2 text-sm font-semibold text-white shadow-sm hover:bg-purple-500 disabled:opacity-50"
                   disabled={addFriendMutation.isPending}
                 >
-                  Save to Friends
+                  Add Friend
                 </button>
                 <button
                   onClick={() => handleNext(aiQuery.data.user.id)}
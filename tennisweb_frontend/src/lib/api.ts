@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Player, Match, UserWithProfile, Profile, CheckInMonth, Recommendation, FriendItem, ChatThread, ChatMessage, AIRecommendationResult } from './types';
+import { Player, Match, UserWithProfile, Profile, CheckInMonth, Recommendation, FriendItem, FriendRequestItem, FriendRequests, ChatThread, ChatMessage, AIRecommendationResult } from './types';
 
 const api = axios.create({
   baseURL: process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api',
@@ -181,9 +181,24 @@ export const fetchAIRecommendation = async (excludeIds: number[] = [], limit = 8
   return (await res.json()) as AIRecommendationResult;
 };
 
-export const addFriend = async (friendId: number): Promise<FriendItem> => {
+// Sends a friend request, or accepts theirs if they already sent one
+export const addFriend = async (friendId: number): Promise<FriendRequestItem> => {
   const res = await api.post(`/friends/`, { friend_id: friendId });
-  return res.data as FriendItem;
+  return res.data as FriendRequestItem;
+};
+
+export const fetchFriendRequests = async (): Promise<FriendRequests> => {
+  const res = await api.get(`/friends/requests/`);
+  return res.data as FriendRequests;
+};
+
+export const respondFriendRequest = async (requestId: number, action: 'accept' | 'decline'): Promise<FriendRequestItem> => {
+  const res = await api.post(`/friends/requests/${requestId}/`, { action });
+  return res.data as FriendRequestItem;
+};
+
+export const cancelFriendRequest = async (requestId: number): Promise<void> => {
+  await api.delete(`/friends/requests/${requestId}/`);
 };
 
 export const fetchFriends = async (): Promise<FriendItem[]> => {
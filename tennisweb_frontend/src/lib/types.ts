@@ -91,6 +91,21 @@ export interface FriendItem {
   created_at: string;
 }
 
+// A friendship starts as a request the other user accepts or declines
+export interface FriendRequestItem {
+  id: number;
+  from_user: BriefUser;
+  to_user: BriefUser;
+  status: 'pending' | 'accepted' | 'declined';
+  created_at: string;
+  responded_at: string | null;
+}
+
+export interface FriendRequests {
+  incoming: FriendRequestItem[];
+  outgoing: FriendRequestItem[];
+}
+
 // Chat
 export interface ChatThread {
   id: number;